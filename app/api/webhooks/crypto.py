@@ -9,6 +9,7 @@ from aiogram import Bot
 from app.config import settings
 from app.db import get_session_maker
 from app.services.crypto_service import process_crypto_webhook
+from app.telegram_gateway import install as install_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +19,7 @@ router = APIRouter(prefix="/webhook", tags=["webhook"])
 @asynccontextmanager
 async def _get_bot():
     """Create bot instance for sending notifications (webhook runs in separate process)."""
-    bot = Bot(token=settings.bot_token) if settings.bot_token else None
+    bot = install_gateway(Bot(token=settings.bot_token)) if settings.bot_token else None
     try:
         yield bot
     finally:
@@ -0,0 +1,105 @@
+"""Telegram webhook — updates fed to the dispatcher in the web process (BOT_MODE=webhook).
+
+Each uvicorn worker builds its own bot and dispatcher on startup. An update
+is acknowledged as soon as it is parsed and a processing slot is free; the
+handler then runs in the background, at most WEBHOOK_CONCURRENCY at a time
+per worker. Run several workers behind the load balancer to scale out; state
+shared between them lives in Postgres (FSM storage, RATE_LIMIT_BACKEND).
+"""
+
+import asyncio
+import hmac
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from fastapi import APIRouter, Request, Response
+
+from app.config import settings
+from app.fsm_storage import PostgresStorage
+from app.services import process_stats_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/webhook", tags=["webhook"])
+
+WEBHOOK_PATH = "/webhook/telegram"
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+DRAIN_TIMEOUT = 30.0  # seconds to let in-flight updates finish on shutdown
+
+_bot: Bot | None = None
+_dp: Dispatcher | None = None
+_slots: asyncio.Semaphore | None = None
+_tasks: set[asyncio.Task] = set()
+_stats_task: asyncio.Task | None = None
+
+
+def webhook_url() -> str:
+    return settings.webhook_base_url.rstrip("/") + WEBHOOK_PATH
+
+
+async def start() -> None:
+    """Build this worker's bot and dispatcher. No-op unless BOT_MODE=webhook."""
+    global _bot, _dp, _slots, _stats_task
+    if settings.bot_mode != "webhook" or _dp is not None:
+        return
+    if not settings.webhook_secret:
+        logger.error("BOT_MODE=webhook needs WEBHOOK_SECRET; Telegram webhook disabled")
+        return
+    from app.main import _create_bot_and_dp
+
+    _bot, _dp = _create_bot_and_dp()
+    if isinstance(_dp.storage, PostgresStorage):
+        await _dp.storage.start()
+    _slots = asyncio.Semaphore(max(1, settings.webhook_concurrency))
+    # Handlers run here in webhook mode, so this worker's caches are worth reporting
+    _stats_task = asyncio.create_task(process_stats_service.publish_forever("web"))
+    logger.info("Telegram webhook ready, concurrency=%d", settings.webhook_concurrency)
+
+
+async def stop() -> None:
+    """Let in-flight updates finish, then release the bot session and storage."""
+    global _bot, _dp, _stats_task
+    if _dp is None:
+        return
+    if _stats_task is not None:
+        _stats_task.cancel()
+        _stats_task = None
+    if _tasks:
+        _, pending = await asyncio.wait(set(_tasks), timeout=DRAIN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+    await _dp.storage.close()
+    await _bot.session.close()
+    _bot = _dp = None
+
+
+async def _process(update: Update) -> None:
+    try:
+        await _dp.feed_update(_bot, update)
+    except Exception:
+        logger.exception("Update %s failed", update.update_id)
+    finally:
+        _slots.release()
+
+
+@router.post("/telegram")
+async def telegram_webhook(request: Request) -> Response:
+    """Verify the secret token, queue the update, answer 200 before it is handled."""
+    if _dp is None:
+        return Response(status_code=404)
+    if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), settings.webhook_secret):
+        return Response(status_code=403)
+    try:
+        update = Update.model_validate(await request.json(), context={"bot": _bot})
+    except ValueError as e:  # malformed JSON or a payload that is not an Update
+        logger.warning("Telegram webhook invalid update: %s", e)
+        return Response(status_code=400)
+
+    # Waiting for a slot holds the response back, so Telegram slows down
+    # instead of this worker queueing unbounded work
+    await _slots.acquire()
+    task = asyncio.create_task(_process(update))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return Response(status_code=200)
@@ -23,10 +23,23 @@ class Settings(BaseSettings):
     crypto_api_key: str = ""
     crypto_project_id: str = ""  # 2328.io project UUID — set via CRYPTO_PROJECT_ID env var
     webhook_base_url: str = ""  # e.g. https://your-app.railway.app
+    bot_mode: str = "polling"  # "webhook": Telegram posts updates to the web app at /webhook/telegram
+    webhook_secret: str = ""  # secret_token Telegram echoes in every webhook request (required for webhook mode)
+    webhook_concurrency: int = 32  # updates handled at once per web worker
     admin_id: int = 6214188086  # Telegram user ID for admin access
     referral_secret: str = ""  # HMAC secret for referral link signing
     rub_usd_rate: float = 100.0  # RUB per 1 USD, override via RUB_USD_RATE env var
     trial_days: int = 3  # Free trial premium days for new users
+    metrics_workers: int = 0  # >0: nightly metrics recalc in a process pool of this size
+    metrics_shard_size: int = 500  # users per shard / chunk of the nightly metrics recalc
+    achievement_check_concurrency: int = 8  # queued achievement checks evaluated at once
+    rate_limit_backend: str = "memory"  # "postgres" shares rate-limit buckets across bot replicas
+    fsm_storage: str = "postgres"  # "memory": FSM state per process, lost on restart
+    fsm_state_ttl_hours: int = 24  # conversations untouched this long are dropped
+    premium_expiry_interval_minutes: int = 15  # how often expiry warnings are looked for
+    outbound_rate: float = 30.0  # messages per second sent by one bot process
+    outbound_chat_rate: float = 1.0  # messages per second to one chat, sustained
+    outbound_chat_burst: int = 3  # messages one chat may receive back to back
 
     @field_validator("database_url", mode="before")
     @classmethod
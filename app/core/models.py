@@ -24,6 +24,8 @@ class User(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
     is_active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
+    motivation_seed: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    motivation_cursor: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     invited_by: Mapped["User | None"] = relationship("User", remote_side="User.id")
     habits: Mapped[list["Habit"]] = relationship("Habit", back_populates="user", cascade="all, delete-orphan")
@@ -3,6 +3,7 @@
 import logging
 from collections.abc import AsyncGenerator
 
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.config import settings
@@ -70,6 +71,10 @@ async def init_db() -> None:
     await _migrate_audit_columns(engine)
     await _migrate_trial_columns(engine)
     await _migrate_streak_recovery_columns(engine)
+    await _migrate_reminder_index_columns(engine)
+    await _migrate_motivation_rotation(engine)
+    await _migrate_metrics_archive_columns(engine)
+    await _migrate_achievement_check_columns(engine)
     await _ensure_indexes(engine)
     from app.db_seed import seed_achievements
     await seed_achievements()
@@ -85,8 +90,21 @@ async def _ensure_indexes(engine) -> None:
         "CREATE INDEX IF NOT EXISTS idx_users_last_game_at ON users (last_game_at)",
         "CREATE INDEX IF NOT EXISTS idx_payments_external_id ON payments (external_payment_id)",
         "CREATE INDEX IF NOT EXISTS idx_payments_crypto_network ON payments (crypto_network)",
-        "CREATE INDEX IF NOT EXISTS idx_users_premium_until ON users (premium_until)",
+        # Open crypto invoices only: the expiry sweep's scan stays small as payments accumulate
+        (
+            "CREATE INDEX IF NOT EXISTS idx_payments_crypto_open_expires ON payments (expires_at) "
+            "WHERE provider = 'crypto' AND status IN ('check', 'pending')"
+        ),
+        # Covers the expiry notifier's keyset scan (premium_until, id) without heap reads
+        (
+            "CREATE INDEX IF NOT EXISTS idx_users_premium_until_cover ON users (premium_until, id) "
+            "INCLUDE (telegram_id, language_code)"
+        ),
+        "DROP INDEX IF EXISTS idx_users_premium_until",
         "CREATE INDEX IF NOT EXISTS idx_admin_audit_log_admin_id ON admin_audit_log (admin_id)",
+        "CREATE INDEX IF NOT EXISTS ix_habit_times_next_fire_at ON habit_times (next_fire_at)",
+        "CREATE INDEX IF NOT EXISTS ix_habit_logs_user_date ON habit_logs (user_id, log_date)",
+        "CREATE INDEX IF NOT EXISTS ix_habit_logs_log_date ON habit_logs (log_date)",
     ]
     async with engine.begin() as conn:
         for sql in indexes:
@@ -211,6 +229,72 @@ async def _migrate_streak_recovery_columns(engine) -> None:
                 logger.warning("Migration users.%s skipped: %s", name, e)
 
 
+async def _migrate_reminder_index_columns(engine) -> None:
+    """Add habit_times.next_fire_at (reminder index). Rows are backfilled by the reminder job."""
+    from sqlalchemy import text
+    async with engine.begin() as conn:
+        try:
+            await conn.execute(text(
+                "ALTER TABLE habit_times ADD COLUMN IF NOT EXISTS next_fire_at TIMESTAMP WITH TIME ZONE"
+            ))
+        except SQLAlchemyError as e:
+            logger.warning("Migration habit_times.next_fire_at skipped: %s", e)
+
+
+async def _migrate_motivation_rotation(engine) -> None:
+    """Per-user phrase rotation columns replace the append-only motivation_usage log."""
+    from sqlalchemy import text
+    statements = [
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS motivation_seed INTEGER",
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS motivation_cursor INTEGER NOT NULL DEFAULT 0",
+        "DROP TABLE IF EXISTS motivation_usage",
+    ]
+    async with engine.begin() as conn:
+        for sql in statements:
+            try:
+                await conn.execute(text(sql))
+            except SQLAlchemyError as e:
+                logger.warning("Migration motivation rotation skipped (%s): %s", sql, e)
+
+
+async def _migrate_metrics_archive_columns(engine) -> None:
+    """Metrics archive aggregate, as-of date for incremental updates, unlocked-achievement mask
+    and the catalog fingerprint it was built against."""
+    from sqlalchemy import text
+    statements = [
+        "ALTER TABLE user_metrics ADD COLUMN IF NOT EXISTS archived_through DATE",
+        "ALTER TABLE user_metrics ADD COLUMN IF NOT EXISTS archived_completions INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE user_metrics ADD COLUMN IF NOT EXISTS archived_perfect_days INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE user_metrics ADD COLUMN IF NOT EXISTS archived_last_perfect DATE",
+        "ALTER TABLE user_metrics ADD COLUMN IF NOT EXISTS archived_perfect_run INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE user_metrics ADD COLUMN IF NOT EXISTS metrics_date DATE",
+        "ALTER TABLE user_metrics ADD COLUMN IF NOT EXISTS achievements_mask BIGINT",
+        "ALTER TABLE user_metrics ADD COLUMN IF NOT EXISTS achievements_catalog BIGINT",
+    ]
+    async with engine.begin() as conn:
+        for sql in statements:
+            try:
+                await conn.execute(text(sql))
+            except SQLAlchemyError as e:
+                logger.warning("Migration metrics archive skipped (%s): %s", sql, e)
+
+
+async def _migrate_achievement_check_columns(engine) -> None:
+    """Lease, retry counter and version of queued achievement checks."""
+    from sqlalchemy import text
+    statements = [
+        "ALTER TABLE achievement_checks ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE achievement_checks ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE achievement_checks ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ",
+    ]
+    async with engine.begin() as conn:
+        for sql in statements:
+            try:
+                await conn.execute(text(sql))
+            except SQLAlchemyError as e:
+                logger.warning("Migration achievement checks skipped (%s): %s", sql, e)
+
+
 async def close_db() -> None:
     global _engine
     if _engine is not None:
@@ -0,0 +1,195 @@
+"""Postgres FSM storage — durable conversation state with a local write-back cache.
+
+State and data live in the fsm_states table, so habit creation and admin
+flows survive restarts and any bot process can continue them. Reads are
+served from a per-process cache; writes only touch the cache and are flushed
+once per update (FSMFlushMiddleware), as one upsert for all keys changed.
+
+Each flush NOTIFYs the keys it wrote and every process LISTENs, dropping its
+cached copy of keys written elsewhere. While the listener is down the cache
+is only trusted within an update: clean entries are dropped after each
+flush, so the next update re-reads the row.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import timedelta
+from typing import Any
+from uuid import uuid4
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from app.database import get_engine, get_session_maker
+from app.services import fsm_service
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_SIZE = 10_000
+LISTEN_RETRY_INTERVAL = 60.0  # seconds between attempts to restore the listener
+
+
+class _Entry:
+    __slots__ = ("data", "state", "touched", "version")
+
+    def __init__(self, state: str | None, data: dict[str, Any]) -> None:
+        self.state = state
+        self.data = data
+        self.touched = time.monotonic()
+        self.version = 0  # bumped on every write, so a flush knows what it covered
+
+
+class _Load:
+    """Loads of one key in flight, and the invalidations that arrived meanwhile."""
+
+    __slots__ = ("generation", "readers")
+
+    def __init__(self) -> None:
+        self.readers = 0
+        self.generation = 0
+
+
+def storage_key(key: StorageKey) -> str:
+    """Row key for an aiogram StorageKey."""
+    return ":".join(
+        str(part)
+        for part in (
+            key.bot_id,
+            key.chat_id,
+            key.user_id,
+            key.thread_id or "",
+            key.business_connection_id or "",
+            key.destiny,
+        )
+    )
+
+
+class PostgresStorage(BaseStorage):
+    def __init__(self, ttl: timedelta, cache_size: int = CACHE_MAX_SIZE) -> None:
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, _Entry] = OrderedDict()
+        self._dirty: dict[str, _Entry] = {}
+        self._loads: dict[str, _Load] = {}
+        self._origin = uuid4().hex[:12]
+        self._listen_conn = None
+        self._next_listen_attempt = 0.0
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def listening(self) -> bool:
+        return self._listen_conn is not None
+
+    async def start(self) -> None:
+        """LISTEN for writes by other processes. On failure the cache stays per-update."""
+        self._next_listen_attempt = time.monotonic() + LISTEN_RETRY_INTERVAL
+        try:
+            conn = await get_engine().connect()
+            raw = (await conn.get_raw_connection()).driver_connection
+            await raw.add_listener(fsm_service.NOTIFY_CHANNEL, self._on_notify)
+            raw.add_termination_listener(self._on_listener_lost)
+        except Exception:
+            logger.warning("FSM cache invalidation unavailable, caching per update only", exc_info=True)
+            return
+        self._listen_conn = conn
+        self._drop_clean()
+
+    def _on_notify(self, _conn, _pid, _channel, payload: str) -> None:
+        origin, keys = fsm_service.parse_notification(payload)
+        if origin != self._origin:
+            for k in keys:
+                self._cache.pop(k, None)
+                if k in self._loads:
+                    self._loads[k].generation += 1
+
+    def _on_listener_lost(self, _conn) -> None:
+        logger.warning("FSM cache invalidation listener lost, caching per update only")
+        self._listen_conn = None
+        self._drop_clean()
+
+    def _drop_clean(self) -> None:
+        self._cache.clear()
+        for load in self._loads.values():
+            load.generation += 1
+
+    async def _entry(self, key: StorageKey) -> tuple[str, _Entry]:
+        k = storage_key(key)
+        entry = self._dirty.get(k) or self._cache.get(k)
+        if entry is not None and time.monotonic() - entry.touched < self.ttl.total_seconds():
+            if k in self._cache:
+                self._cache.move_to_end(k)
+            return k, entry
+        load = self._loads.setdefault(k, _Load())
+        load.readers += 1
+        generation = load.generation
+        try:
+            async with get_session_maker()() as session:
+                state, data = await fsm_service.load(session, k, self.ttl)
+        finally:
+            load.readers -= 1
+            if not load.readers:
+                del self._loads[k]
+        entry = _Entry(state, data)
+        # Invalidated while loading: the row read may predate that write, so serve it
+        # to this update only
+        if load.generation == generation:
+            self._cache[k] = entry
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return k, entry
+
+    def _mark_dirty(self, k: str, entry: _Entry) -> None:
+        entry.touched = time.monotonic()
+        entry.version += 1
+        self._dirty[k] = entry
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k, entry = await self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(k, entry)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        _, entry = await self._entry(key)
+        return entry.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        k, entry = await self._entry(key)
+        entry.data = dict(data)
+        self._mark_dirty(k, entry)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, entry = await self._entry(key)
+        return entry.data.copy()
+
+    async def flush(self) -> None:
+        """Write every changed key in one transaction and notify other processes."""
+        async with self._flush_lock:
+            if self._dirty:
+                batch = {k: (e, e.version, e.state, e.data) for k, e in self._dirty.items()}
+                try:
+                    async with get_session_maker()() as session:
+                        await fsm_service.save_many(session, [(k, s, d) for k, (_, _, s, d) in batch.items()])
+                        await fsm_service.notify(session, self._origin, list(batch))
+                        await session.commit()
+                except Exception:
+                    # Kept dirty: the next flush retries, reads keep seeing the new values
+                    logger.warning("FSM flush failed for %d keys", len(batch), exc_info=True)
+                    return
+                for k, (entry, version, _, _) in batch.items():
+                    # Written again while we were saving: leave it for the next flush
+                    if self._dirty.get(k) is entry and entry.version == version:
+                        del self._dirty[k]
+            if not self.listening:
+                self._drop_clean()
+                if time.monotonic() >= self._next_listen_attempt:
+                    await self.start()
+
+    async def close(self) -> None:
+        self._next_listen_attempt = float("inf")
+        await self.flush()
+        if self._listen_conn is not None:
+            conn, self._listen_conn = self._listen_conn, None
+            await conn.close()
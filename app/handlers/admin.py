@@ -8,11 +8,12 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import ADMIN_ID
-from app.db import get_session_maker
 from app.services import admin_service, audit_service, user_service
-from app.texts import _normalize_lang, t
+from app.services.user_service import UserSnapshot
+from app.texts import t
 from app.keyboards.admin import (
     admin_back_keyboard,
     admin_discount_confirm_keyboard,
@@ -47,19 +48,11 @@ def _now_utc() -> datetime:
 
 
 @router.message(Command("admin"))
-async def admin_entry(message: Message) -> None:
+async def admin_entry(message: Message, lang: str) -> None:
     tid = message.from_user.id if message.from_user else None
     if not _is_admin(tid):
-        sm = get_session_maker()
-        async with sm() as session:
-            user = await user_service.get_by_telegram_id(session, tid or 0)
-            lang = user.language_code if user else "ru"
         await message.answer(t(lang, "admin_denied"))
         return
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, ADMIN_ID)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
     await message.answer(
         t(lang, "admin_panel"),
         reply_markup=admin_main_keyboard(lang),
@@ -67,16 +60,11 @@ async def admin_entry(message: Message) -> None:
 
 
 @router.callback_query(F.data == "admin_back")
-async def admin_back(cb: CallbackQuery, state: FSMContext) -> None:
+async def admin_back(cb: CallbackQuery, state: FSMContext, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
     await state.clear()
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
     await cb.message.edit_text(
         t(lang, "admin_panel"),
         reply_markup=admin_main_keyboard(lang),
@@ -84,23 +72,18 @@ async def admin_back(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.callback_query(F.data == "admin_stats")
-async def admin_stats(cb: CallbackQuery) -> None:
+async def admin_stats(cb: CallbackQuery, session: AsyncSession, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        total_users = await session.scalar(select(func.count()).select_from(User))
-        now = _now_utc()
-        active_subs = await session.scalar(
-            select(func.count()).where(
-                User.premium_until.isnot(None),
-                User.premium_until > now,
-            )
+    total_users = await session.scalar(select(func.count()).select_from(User))
+    now = _now_utc()
+    active_subs = await session.scalar(
+        select(func.count()).where(
+            User.premium_until.isnot(None),
+            User.premium_until > now,
         )
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
+    )
     await cb.message.edit_text(
         f"{t(lang, 'admin_stats_title')}\n\n"
         f"{t(lang, 'admin_stats_users')}: {total_users or 0}\n"
@@ -110,15 +93,10 @@ async def admin_stats(cb: CallbackQuery) -> None:
 
 
 @router.callback_query(F.data == "admin_users")
-async def admin_users(cb: CallbackQuery, state: FSMContext) -> None:
+async def admin_users(cb: CallbackQuery, state: FSMContext, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
     await state.set_state(AdminStates.search_user)
     await cb.message.edit_text(
         t(lang, "admin_search_prompt"),
@@ -127,30 +105,23 @@ async def admin_users(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.message(AdminStates.search_user, F.text)
-async def admin_search_user(message: Message, state: FSMContext) -> None:
+async def admin_search_user(message: Message, state: FSMContext, session: AsyncSession, lang: str) -> None:
     if not _is_admin(message.from_user.id if message.from_user else None):
         return
     query = (message.text or "").strip().replace("@", "")
     if not query:
         return
-    tid = message.from_user.id if message.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        if query.isdigit():
-            result = await session.execute(select(User).where(User.telegram_id == int(query)))
-        else:
-            result = await session.execute(select(User).where(User.username == query))
-        user = result.scalar_one_or_none()
-        if not user:
-            admin_user = await user_service.get_by_telegram_id(session, tid)
-            lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
-            await message.answer(t(lang, "admin_user_not_found"), reply_markup=admin_back_keyboard(lang))
-            return
-        habits_count = await session.scalar(
-            select(func.count()).select_from(Habit).where(Habit.user_id == user.id, Habit.is_active == True)
-        )
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
+    if query.isdigit():
+        result = await session.execute(select(User).where(User.telegram_id == int(query)))
+    else:
+        result = await session.execute(select(User).where(User.username == query))
+    user = result.scalar_one_or_none()
+    if not user:
+        await message.answer(t(lang, "admin_user_not_found"), reply_markup=admin_back_keyboard(lang))
+        return
+    habits_count = await session.scalar(
+        select(func.count()).select_from(Habit).where(Habit.user_id == user.id, Habit.is_active == True)
+    )
     sub_status = t(lang, "admin_sub_no")
     if user.premium_until:
         pu = user.premium_until
@@ -173,16 +144,11 @@ async def admin_search_user(message: Message, state: FSMContext) -> None:
 
 
 @router.callback_query(F.data.startswith("admin_grant:"))
-async def admin_grant(cb: CallbackQuery, state: FSMContext) -> None:
+async def admin_grant(cb: CallbackQuery, state: FSMContext, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
     tg_id = int(cb.data.split(":")[1])
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
     await state.update_data(admin_grant_tg_id=tg_id)
     await state.set_state(AdminStates.grant_duration)
     await cb.message.edit_text(
@@ -192,7 +158,7 @@ async def admin_grant(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.message(AdminStates.grant_duration, F.text)
-async def admin_apply_grant(message: Message, state: FSMContext) -> None:
+async def admin_apply_grant(message: Message, state: FSMContext, session: AsyncSession, lang: str) -> None:
     if not _is_admin(message.from_user.id if message.from_user else None):
         return
     data = await state.get_data()
@@ -202,42 +168,38 @@ async def admin_apply_grant(message: Message, state: FSMContext) -> None:
         return
     duration = parse_admin_duration(message.text or "")
     tid = message.from_user.id if message.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
     if not duration:
         await message.answer(t(lang, "admin_invalid_format"))
         return
-    async with sm() as session:
-        result = await session.execute(select(User).where(User.telegram_id == tg_id))
-        user = result.scalar_one_or_none()
-        if not user:
-            await message.answer(t(lang, "admin_user_not_found"))
-            await state.clear()
-            return
-        now = _now_utc()
-        if user.premium_until:
-            pu = user.premium_until
-            if pu.tzinfo is None:
-                pu = pu.replace(tzinfo=timezone.utc)
-            if pu > now:
-                user.premium_until = pu + duration
-            else:
-                user.premium_until = now + duration
+    result = await session.execute(select(User).where(User.telegram_id == tg_id))
+    user = result.scalar_one_or_none()
+    if not user:
+        await message.answer(t(lang, "admin_user_not_found"))
+        await state.clear()
+        return
+    now = _now_utc()
+    if user.premium_until:
+        pu = user.premium_until
+        if pu.tzinfo is None:
+            pu = pu.replace(tzinfo=timezone.utc)
+        if pu > now:
+            user.premium_until = pu + duration
         else:
             user.premium_until = now + duration
-        await audit_service.log_admin_action(
-            session, tid, "grant_premium", target_user_id=tg_id,
-            details=f"duration={message.text}",
-        )
-        await session.commit()
+    else:
+        user.premium_until = now + duration
+    await audit_service.log_admin_action(
+        session, tid, "grant_premium", target_user_id=tg_id,
+        details=f"duration={message.text}",
+    )
+    await session.commit()
+    user_service.invalidate(tg_id)
     await message.answer(t(lang, "admin_grant_ok"))
     await state.clear()
 
 
 @router.callback_query(F.data.startswith("admin_discount:"))
-async def admin_discount_start(cb: CallbackQuery, state: FSMContext) -> None:
+async def admin_discount_start(cb: CallbackQuery, state: FSMContext, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
@@ -245,11 +207,6 @@ async def admin_discount_start(cb: CallbackQuery, state: FSMContext) -> None:
     if len(parts) < 2:
         return
     tg_id = int(parts[1])
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
     await state.update_data(admin_discount_tg_id=tg_id)
     await state.clear()
     await cb.message.edit_text(
@@ -259,7 +216,7 @@ async def admin_discount_start(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.callback_query(F.data.startswith("admin_discount_pct:"))
-async def admin_discount_pct(cb: CallbackQuery, state: FSMContext) -> None:
+async def admin_discount_pct(cb: CallbackQuery, state: FSMContext, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
@@ -267,11 +224,6 @@ async def admin_discount_pct(cb: CallbackQuery, state: FSMContext) -> None:
     if len(parts) < 3:
         return
     tg_id, percent = int(parts[1]), int(parts[2])
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
     await cb.message.edit_text(
         t(lang, "admin_discount_duration_prompt"),
         reply_markup=admin_discount_duration_keyboard(tg_id, percent, lang),
@@ -279,16 +231,11 @@ async def admin_discount_pct(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.callback_query(F.data.startswith("admin_discount_pct_manual:"))
-async def admin_discount_pct_manual(cb: CallbackQuery, state: FSMContext) -> None:
+async def admin_discount_pct_manual(cb: CallbackQuery, state: FSMContext, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
     tg_id = int(cb.data.split(":")[1])
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
     await state.update_data(admin_discount_tg_id=tg_id)
     await state.set_state(AdminStates.discount_percent_manual)
     await cb.message.edit_text(
@@ -298,7 +245,7 @@ async def admin_discount_pct_manual(cb: CallbackQuery, state: FSMContext) -> Non
 
 
 @router.message(AdminStates.discount_percent_manual, F.text)
-async def admin_discount_percent_manual_input(message: Message, state: FSMContext) -> None:
+async def admin_discount_percent_manual_input(message: Message, state: FSMContext, lang: str) -> None:
     if not _is_admin(message.from_user.id if message.from_user else None):
         return
     data = await state.get_data()
@@ -311,18 +258,8 @@ async def admin_discount_percent_manual_input(message: Message, state: FSMContex
         if percent < 1 or percent > 99:
             raise ValueError("out of range")
     except (ValueError, TypeError):
-        tid = message.from_user.id if message.from_user else 0
-        sm = get_session_maker()
-        async with sm() as session:
-            admin_user = await user_service.get_by_telegram_id(session, tid)
-            lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
         await message.answer(t(lang, "admin_invalid_format"))
         return
-    tid = message.from_user.id if message.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
     await state.clear()
     await message.answer(
         t(lang, "admin_discount_duration_prompt"),
@@ -331,7 +268,7 @@ async def admin_discount_percent_manual_input(message: Message, state: FSMContex
 
 
 @router.callback_query(F.data.startswith("admin_discount_dur:"))
-async def admin_discount_dur(cb: CallbackQuery, state: FSMContext) -> None:
+async def admin_discount_dur(cb: CallbackQuery, state: FSMContext, session: AsyncSession, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
@@ -339,13 +276,8 @@ async def admin_discount_dur(cb: CallbackQuery, state: FSMContext) -> None:
     if len(parts) < 4:
         return
     tg_id, percent, days = int(parts[1]), int(parts[2]), int(parts[3])
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        result = await session.execute(select(User).where(User.telegram_id == tg_id))
-        target_user = result.scalar_one_or_none()
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
+    result = await session.execute(select(User).where(User.telegram_id == tg_id))
+    target_user = result.scalar_one_or_none()
     if not target_user:
         await cb.message.edit_text(t(lang, "admin_user_not_found"), reply_markup=admin_back_keyboard(lang))
         return
@@ -359,7 +291,7 @@ async def admin_discount_dur(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.callback_query(F.data.startswith("admin_discount_dur_manual:"))
-async def admin_discount_dur_manual(cb: CallbackQuery, state: FSMContext) -> None:
+async def admin_discount_dur_manual(cb: CallbackQuery, state: FSMContext, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
@@ -367,11 +299,6 @@ async def admin_discount_dur_manual(cb: CallbackQuery, state: FSMContext) -> Non
     if len(parts) < 3:
         return
     tg_id, percent = int(parts[1]), int(parts[2])
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
     await state.update_data(admin_discount_tg_id=tg_id, admin_discount_percent=percent)
     await state.set_state(AdminStates.discount_duration_manual)
     await cb.message.edit_text(
@@ -381,7 +308,7 @@ async def admin_discount_dur_manual(cb: CallbackQuery, state: FSMContext) -> Non
 
 
 @router.message(AdminStates.discount_duration_manual, F.text)
-async def admin_discount_duration_manual_input(message: Message, state: FSMContext) -> None:
+async def admin_discount_duration_manual_input(message: Message, state: FSMContext, session: AsyncSession, lang: str) -> None:
     if not _is_admin(message.from_user.id if message.from_user else None):
         return
     data = await state.get_data()
@@ -395,20 +322,10 @@ async def admin_discount_duration_manual_input(message: Message, state: FSMConte
         if days < 1 or days > 365:
             raise ValueError("out of range")
     except (ValueError, TypeError):
-        tid = message.from_user.id if message.from_user else 0
-        sm = get_session_maker()
-        async with sm() as session:
-            admin_user = await user_service.get_by_telegram_id(session, tid)
-            lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
         await message.answer(t(lang, "admin_invalid_format"))
         return
-    tid = message.from_user.id if message.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        result = await session.execute(select(User).where(User.telegram_id == tg_id))
-        target_user = result.scalar_one_or_none()
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
+    result = await session.execute(select(User).where(User.telegram_id == tg_id))
+    target_user = result.scalar_one_or_none()
     await state.clear()
     if not target_user:
         await message.answer(t(lang, "admin_user_not_found"), reply_markup=admin_back_keyboard(lang))
@@ -423,7 +340,9 @@ async def admin_discount_duration_manual_input(message: Message, state: FSMConte
 
 
 @router.callback_query(F.data.startswith("admin_discount_confirm:"))
-async def admin_discount_confirm(cb: CallbackQuery, state: FSMContext) -> None:
+async def admin_discount_confirm(
+    cb: CallbackQuery, state: FSMContext, session: AsyncSession, user_snapshot: UserSnapshot | None, lang: str
+) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
@@ -432,36 +351,29 @@ async def admin_discount_confirm(cb: CallbackQuery, state: FSMContext) -> None:
         return
     tg_id, percent, days = int(parts[1]), int(parts[2]), int(parts[3])
     tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        result = await session.execute(select(User).where(User.telegram_id == tg_id))
-        target_user = result.scalar_one_or_none()
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
+    result = await session.execute(select(User).where(User.telegram_id == tg_id))
+    target_user = result.scalar_one_or_none()
     if not target_user:
         await cb.message.edit_text(t(lang, "admin_user_not_found"), reply_markup=admin_back_keyboard(lang))
         return
-    async with sm() as session:
-        admin_result = await session.execute(select(User).where(User.telegram_id == tid))
-        admin_user = admin_result.scalar_one_or_none()
-        if admin_user:
-            from app.services.discount_service import grant_discount
-            await grant_discount(session, target_user.id, percent, days, admin_user.id)
-            await audit_service.log_admin_action(
-                session, tid, "grant_discount", target_user_id=tg_id,
-                details=f"percent={percent} days={days}",
+    if user_snapshot:
+        from app.services.discount_service import grant_discount
+        await grant_discount(session, target_user.id, percent, days, user_snapshot.id)
+        await audit_service.log_admin_action(
+            session, tid, "grant_discount", target_user_id=tg_id,
+            details=f"percent={percent} days={days}",
+        )
+        await session.commit()
+        try:
+            from datetime import datetime, timezone, timedelta
+            until = (datetime.now(timezone.utc) + timedelta(days=days)).strftime("%d.%m.%Y")
+            user_lang = target_user.language_code if target_user.language_code in ("ru", "en", "ar") else "ru"
+            await cb.bot.send_message(
+                chat_id=tg_id,
+                text=t(user_lang, "discount_granted_notify", percent=percent, until=until),
             )
-            await session.commit()
-            try:
-                from datetime import datetime, timezone, timedelta
-                until = (datetime.now(timezone.utc) + timedelta(days=days)).strftime("%d.%m.%Y")
-                user_lang = target_user.language_code if target_user.language_code in ("ru", "en", "ar") else "ru"
-                await cb.bot.send_message(
-                    chat_id=tg_id,
-                    text=t(user_lang, "discount_granted_notify", percent=percent, until=until),
-                )
-            except Exception:
-                pass
+        except Exception:
+            pass
     await cb.message.edit_text(
         t(lang, "admin_discount_granted"),
         reply_markup=admin_back_keyboard(lang),
@@ -469,36 +381,28 @@ async def admin_discount_confirm(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.callback_query(F.data.startswith("admin_revoke:"))
-async def admin_revoke(cb: CallbackQuery) -> None:
+async def admin_revoke(cb: CallbackQuery, session: AsyncSession, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
     tg_id = int(cb.data.split(":")[1])
     tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        await session.execute(
-            update(User).where(User.telegram_id == tg_id).values(premium_until=None)
-        )
-        await audit_service.log_admin_action(session, tid, "revoke_premium", target_user_id=tg_id)
-        await session.commit()
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
+    await session.execute(
+        update(User).where(User.telegram_id == tg_id).values(premium_until=None)
+    )
+    await audit_service.log_admin_action(session, tid, "revoke_premium", target_user_id=tg_id)
+    await session.commit()
+    user_service.invalidate(tg_id)
     await cb.message.answer(t(lang, "admin_sub_revoked"))
 
 
 @router.callback_query(F.data.startswith("admin_delete_this:"))
-async def admin_delete_this_user(cb: CallbackQuery, state: FSMContext) -> None:
+async def admin_delete_this_user(cb: CallbackQuery, state: FSMContext, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         await cb.answer(t("ru", "admin_denied"), show_alert=True)
         return
     await cb.answer()
     tg_id = int(cb.data.split(":")[1])
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
     await state.update_data(admin_delete_tg_id=tg_id)
     await state.set_state(AdminStates.delete_user_confirm)
     await cb.message.edit_text(
@@ -508,16 +412,11 @@ async def admin_delete_this_user(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.callback_query(F.data == "admin_delete_user")
-async def admin_delete_user_start(cb: CallbackQuery, state: FSMContext) -> None:
+async def admin_delete_user_start(cb: CallbackQuery, state: FSMContext, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         await cb.answer(t("ru", "admin_denied"), show_alert=True)
         return
     await cb.answer()
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
     await state.set_state(AdminStates.delete_user_tg_id)
     await cb.message.edit_text(
         t(lang, "admin_delete_prompt"),
@@ -526,14 +425,9 @@ async def admin_delete_user_start(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.message(AdminStates.delete_user_tg_id, F.text)
-async def admin_delete_user_tg_id(message: Message, state: FSMContext) -> None:
+async def admin_delete_user_tg_id(message: Message, state: FSMContext, lang: str) -> None:
     if not _is_admin(message.from_user.id if message.from_user else None):
         return
-    tid = message.from_user.id if message.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
 
     tg_id_str = (message.text or "").strip()
     if not tg_id_str.isdigit():
@@ -548,14 +442,10 @@ async def admin_delete_user_tg_id(message: Message, state: FSMContext) -> None:
 
 
 @router.message(AdminStates.delete_user_confirm, F.text)
-async def admin_delete_user_execute(message: Message, state: FSMContext) -> None:
+async def admin_delete_user_execute(message: Message, state: FSMContext, session: AsyncSession, lang: str) -> None:
     if not _is_admin(message.from_user.id if message.from_user else None):
         return
     tid = message.from_user.id if message.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
 
     confirm_keyword = t(lang, "admin_delete_confirm_keyword")
     if (message.text or "").strip() != confirm_keyword:
@@ -573,30 +463,22 @@ async def admin_delete_user_execute(message: Message, state: FSMContext) -> None
 
     success = await admin_service.delete_user_full_by_tg_id(tg_id)
     if success:
-        sm = get_session_maker()
-        async with sm() as session:
-            await audit_service.log_admin_action(session, tid, "delete_user", target_user_id=tg_id)
-            await session.commit()
+        await audit_service.log_admin_action(session, tid, "delete_user", target_user_id=tg_id)
+        await session.commit()
         await message.answer(t(lang, "admin_delete_done"))
     else:
         await message.answer(t(lang, "admin_delete_not_found"))
 
 
 @router.callback_query(F.data == "admin_habits")
-async def admin_habits(cb: CallbackQuery) -> None:
+async def admin_habits(cb: CallbackQuery, session: AsyncSession, user_snapshot: UserSnapshot | None, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        result = await session.execute(select(User).where(User.telegram_id == tid))
-        user = result.scalar_one_or_none()
-        lang = _normalize_lang(user.language_code) if user else "ru"
-        if not user:
-            await cb.message.edit_text(t(lang, "admin_user_not_found"), reply_markup=admin_back_keyboard(lang))
-            return
-        habits = await habit_service.get_user_habits(session, user.id)
+    if not user_snapshot:
+        await cb.message.edit_text(t(lang, "admin_user_not_found"), reply_markup=admin_back_keyboard(lang))
+        return
+    habits = await habit_service.get_user_habits(session, user_snapshot.id)
     if not habits:
         await cb.message.edit_text(
             t(lang, "admin_no_habits"),
@@ -611,18 +493,13 @@ async def admin_habits(cb: CallbackQuery) -> None:
 
 
 @router.callback_query(F.data.startswith("admin_delete_habit:"))
-async def admin_delete_habit(cb: CallbackQuery) -> None:
+async def admin_delete_habit(cb: CallbackQuery, session: AsyncSession, lang: str) -> None:
     if not _is_admin(cb.from_user.id if cb.from_user else None):
         return
     await cb.answer()
     habit_id = int(cb.data.split(":")[1])
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        habit = await habit_service.get_by_id(session, habit_id)
-        if habit:
-            await habit_service.delete_habit(session, habit)
-            await session.commit()
-        admin_user = await user_service.get_by_telegram_id(session, tid)
-        lang = _normalize_lang(admin_user.language_code) if admin_user else "ru"
+    habit = await habit_service.get_by_id(session, habit_id)
+    if habit:
+        await habit_service.delete_habit(session, habit)
+        await session.commit()
     await cb.message.answer(t(lang, "admin_habit_deleted"))
@@ -8,7 +8,7 @@ from sqlalchemy import select
 from app.db import get_session_maker
 from app.keyboards import main_menu
 from app.models import User
-from app.services import users
+from app.services import user_service, users
 from app.texts import t
 
 router = Router(name="callbacks")
@@ -19,11 +19,7 @@ async def cb_back_main(cb: CallbackQuery, state: FSMContext) -> None:
     await cb.answer()
     await state.clear()
     tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        r = await session.execute(select(User).where(User.telegram_id == tid))
-        user = r.scalar_one_or_none()
-        lang = user.language_code if user else "en"
+    lang = await user_service.get_language(tid, default="en")
     await cb.message.edit_text(t(lang, "main_title"), reply_markup=main_menu(lang))
 
 
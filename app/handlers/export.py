@@ -6,9 +6,9 @@ import logging
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import BufferedInputFile, CallbackQuery, Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_session_maker
-from app.services import user_service
+from app.models import User
 from app.services.export_service import export_user_data
 from app.texts import t
 
@@ -18,18 +18,14 @@ router = Router(name="export")
 
 
 @router.message(Command("export"))
-async def cmd_export(message: Message) -> None:
+async def cmd_export(message: Message, session: AsyncSession, user: User | None, lang: str) -> None:
     """Export all user data as a JSON file."""
     tid = message.from_user.id if message.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        if not user:
-            return
-        lang = user.language_code if user.language_code in ("ru", "en", "ar") else "ru"
+    if not user:
+        return
 
-        await message.answer(t(lang, "export_preparing"))
-        json_data = await export_user_data(session, user)
+    await message.answer(t(lang, "export_preparing"))
+    json_data = await export_user_data(session, user)
 
     file = BufferedInputFile(
         json_data.encode("utf-8"),
@@ -39,18 +35,14 @@ async def cmd_export(message: Message) -> None:
 
 
 @router.callback_query(F.data == "export_data")
-async def cb_export(cb: CallbackQuery) -> None:
+async def cb_export(cb: CallbackQuery, session: AsyncSession, user: User | None, lang: str) -> None:
     """Export via settings menu button."""
     await cb.answer()
     tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        if not user:
-            return
-        lang = user.language_code if user.language_code in ("ru", "en", "ar") else "ru"
-
-        json_data = await export_user_data(session, user)
+    if not user:
+        return
+
+    json_data = await export_user_data(session, user)
 
     file = BufferedInputFile(
         json_data.encode("utf-8"),
@@ -7,8 +7,10 @@ from aiogram import Bot, Router, F
 from aiogram.filters import Command
 from aiogram.types import CallbackQuery, Message
 
-from app.db import get_session_maker
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.keyboards import main_menu
+from app.models import User
 from app.services import user_service
 from app.texts import t
 
@@ -43,73 +45,70 @@ def _can_play(user) -> tuple[bool, str | None]:
     return True, None
 
 
-async def _run_game(bot: Bot, chat_id: int, tid: int) -> None:
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        if not user:
-            return
-        lang = user.language_code if user.language_code in ("ru", "en", "ar") else "ru"
-        can_play, cooldown_msg = _can_play(user)
-        if not can_play:
-            await bot.send_message(chat_id, cooldown_msg)
-            return
-
-        dice_msg = await bot.send_dice(chat_id=chat_id, emoji="🎳")
-        value = dice_msg.dice.value if dice_msg.dice else 0
-
-        now = _now()
-        user.last_game_at = now
-
-        if value == STRIKE_VALUE:
-            user.game_wins = (user.game_wins or 0) + 1
-            if user.premium_until:
-                pu = user.premium_until
-                if pu.tzinfo is None:
-                    pu = pu.replace(tzinfo=timezone.utc)
-                if pu > now:
-                    user.premium_until = pu + timedelta(days=REWARD_DAYS)
-                else:
-                    user.premium_until = now + timedelta(days=REWARD_DAYS)
+async def _run_game(bot: Bot, chat_id: int, session: AsyncSession, user: User | None, lang: str) -> None:
+    if not user:
+        return
+    can_play, cooldown_msg = _can_play(user)
+    if not can_play:
+        await bot.send_message(chat_id, cooldown_msg)
+        return
+
+    dice_msg = await bot.send_dice(chat_id=chat_id, emoji="🎳")
+    value = dice_msg.dice.value if dice_msg.dice else 0
+
+    now = _now()
+    user.last_game_at = now
+
+    if value == STRIKE_VALUE:
+        user.game_wins = (user.game_wins or 0) + 1
+        if user.premium_until:
+            pu = user.premium_until
+            if pu.tzinfo is None:
+                pu = pu.replace(tzinfo=timezone.utc)
+            if pu > now:
+                user.premium_until = pu + timedelta(days=REWARD_DAYS)
             else:
                 user.premium_until = now + timedelta(days=REWARD_DAYS)
-            await session.commit()
-            await asyncio.sleep(2)
-            await bot.send_message(chat_id, t(lang, "game_strike"))
-            await asyncio.sleep(4)
-            fname = user.first_name or "there"
-            is_premium = user_service.is_premium(user)
-            await bot.send_message(
-                chat_id,
-                t(lang, "main_greeting").format(name=fname),
-                reply_markup=main_menu(lang, is_premium),
-            )
         else:
-            await session.commit()
-            await asyncio.sleep(2)
-            await bot.send_message(chat_id, t(lang, "game_no_strike"))
-            await asyncio.sleep(4)
-            fname = user.first_name or "there"
-            is_premium = user_service.is_premium(user)
-            await bot.send_message(
-                chat_id,
-                t(lang, "main_greeting").format(name=fname),
-                reply_markup=main_menu(lang, is_premium),
-            )
+            user.premium_until = now + timedelta(days=REWARD_DAYS)
+        await session.commit()
+        user_service.invalidate(user.telegram_id)
+        await asyncio.sleep(2)
+        await bot.send_message(chat_id, t(lang, "game_strike"))
+        await asyncio.sleep(4)
+        fname = user.first_name or "there"
+        is_premium = user_service.is_premium(user)
+        await bot.send_message(
+            chat_id,
+            t(lang, "main_greeting").format(name=fname),
+            reply_markup=main_menu(lang, is_premium),
+        )
+    else:
+        await session.commit()
+        await asyncio.sleep(2)
+        await bot.send_message(chat_id, t(lang, "game_no_strike"))
+        await asyncio.sleep(4)
+        fname = user.first_name or "there"
+        is_premium = user_service.is_premium(user)
+        await bot.send_message(
+            chat_id,
+            t(lang, "main_greeting").format(name=fname),
+            reply_markup=main_menu(lang, is_premium),
+        )
 
 
 @router.message(F.text == "🎳")
 @router.message(Command("game"))
-async def game_play(message: Message) -> None:
+async def game_play(message: Message, session: AsyncSession, user: User | None, lang: str) -> None:
     tid = message.from_user.id if message.from_user else 0
     chat_id = message.chat.id if message.chat else tid
-    await _run_game(message.bot, chat_id, tid)
+    await _run_game(message.bot, chat_id, session, user, lang)
 
 
 @router.callback_query(F.data == "game")
-async def game_callback(cb: CallbackQuery) -> None:
+async def game_callback(cb: CallbackQuery, session: AsyncSession, user: User | None, lang: str) -> None:
     await cb.answer()
     tid = cb.from_user.id if cb.from_user else 0
     chat_id = cb.message.chat.id if cb.message else tid
     if cb.bot:
-        await _run_game(cb.bot, chat_id, tid)
+        await _run_game(cb.bot, chat_id, session, user, lang)
@@ -46,7 +46,6 @@ async def cb_habit_decline_back(cb: CallbackQuery, user, t, session) -> None:
     from app.repositories.habit_repo import HabitRepository
     from app.repositories.habit_log_repo import HabitLogRepository
     from app.services.motivation_service import MotivationService
-    from app.repositories.motivation_repo import MotivationRepository
 
     await cb.answer()
     log_id = int((cb.data or "").split(":")[1])
@@ -61,9 +60,8 @@ async def cb_habit_decline_back(cb: CallbackQuery, user, t, session) -> None:
     if not habit:
         return
     lang = user.language if user.language in ("ru", "en", "ar") else "ru"
-    motivation_repo = MotivationRepository(session)
-    motivation_svc = MotivationService(motivation_repo)
-    phrase = await motivation_svc.get_random_phrase(lang)
+    motivation_svc = MotivationService()
+    phrase = await motivation_svc.get_random_phrase(user, lang)
     await session.commit()
     msg = f"📌 {habit.title}\n\n{phrase}"
     await cb.message.edit_text(msg, reply_markup=habit_confirm_decline(t, pending.id))
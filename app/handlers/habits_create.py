@@ -6,12 +6,13 @@ from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_session_maker
 from app.keyboards import back_only, main_menu
 from app.core.habit_presets import get_preset_title
 from app.keyboards.habits import build_presets_keyboard, weekdays_keyboard, time_keyboard, confirm_keyboard
-from app.services import achievement_service, habit_service, user_service
+from app.models import User
+from app.services import achievement_check_service, habit_service, metrics_service, user_service
 from app.texts import t
 from app.utils.content_moderator import is_safe_habit_title
 from app.utils.input_sanitizer import sanitize_habit_title
@@ -34,13 +35,8 @@ async def cb_noop(cb: CallbackQuery) -> None:
 
 
 @router.callback_query(F.data == "premium_required")
-async def cb_premium_required(cb: CallbackQuery) -> None:
+async def cb_premium_required(cb: CallbackQuery, lang: str) -> None:
     await cb.answer()
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        lang = user.language_code if user else "ru"
     await cb.message.edit_text(
         t(lang, "premium_required_upsell"),
         reply_markup=InlineKeyboardMarkup(
@@ -53,21 +49,17 @@ async def cb_premium_required(cb: CallbackQuery) -> None:
 
 
 @router.callback_query(lambda c: c.data == "add_habit")
-async def cb_add_habit(cb: CallbackQuery, state: FSMContext) -> None:
+async def cb_add_habit(
+    cb: CallbackQuery, state: FSMContext, session: AsyncSession, user: User | None, lang: str
+) -> None:
     await cb.answer()
-    tid = cb.from_user.id if cb.from_user else 0
-
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        if not user:
-            return
-        lang = user.language_code
-        is_premium = user_service.is_premium(user)
-        count = await habit_service.count_user_habits(session, user.id)
-        if count >= 1 and not is_premium:
-            await cb.message.edit_text(t(lang, "premium_paywall"), reply_markup=back_only(lang))
-            return
+    if not user:
+        return
+    is_premium = user_service.is_premium(user)
+    count = await habit_service.count_user_habits(session, user.id)
+    if count >= 1 and not is_premium:
+        await cb.message.edit_text(t(lang, "premium_paywall"), reply_markup=back_only(lang))
+        return
 
     await state.set_state(CreateHabitStates.preset)
     await state.update_data(page=0, selected_preset=None, weekdays=[], times=[], lang=lang, is_premium=is_premium)
@@ -83,7 +75,6 @@ async def cb_preset_select(cb: CallbackQuery, state: FSMContext) -> None:
     lang = data.get("lang", "ru")
     is_premium = data.get("is_premium", False)
     page = data.get("page", 0)
-    tid = cb.from_user.id if cb.from_user else 0
 
     if cb.data and cb.data.startswith("preset_page_"):
         try:
@@ -118,30 +109,20 @@ async def cb_preset_select(cb: CallbackQuery, state: FSMContext) -> None:
         await state.update_data(selected_preset=title, habit_title=title, custom=False)
         await state.set_state(CreateHabitStates.days)
 
-        sm = get_session_maker()
-        async with sm() as session:
-            user = await user_service.get_by_telegram_id(session, tid)
-            lang = user.language_code if user else "ru"
-
         await cb.message.edit_text(t(lang, "habit_select_days"), reply_markup=weekdays_keyboard([], lang))
 
 
 @router.callback_query(CreateHabitStates.days, lambda c: c.data and (c.data.startswith("wd_") or c.data == "days_ok"))
-async def cb_days(cb: CallbackQuery, state: FSMContext) -> None:
+async def cb_days(cb: CallbackQuery, state: FSMContext, lang: str) -> None:
     await cb.answer()
     data = await state.get_data()
     weekdays = list(data.get("weekdays", []))
-    tid = cb.from_user.id if cb.from_user else 0
 
     if cb.data == "days_ok":
         if not weekdays:
             return
         await state.update_data(weekdays=weekdays)
         await state.set_state(CreateHabitStates.time_slot)
-        sm = get_session_maker()
-        async with sm() as session:
-            user = await user_service.get_by_telegram_id(session, tid)
-            lang = user.language_code if user else "en"
         await cb.message.edit_text(t(lang, "habit_select_time"), reply_markup=time_keyboard([], lang))
         return
 
@@ -153,30 +134,20 @@ async def cb_days(cb: CallbackQuery, state: FSMContext) -> None:
         weekdays.sort()
     await state.update_data(weekdays=weekdays)
 
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        lang = user.language_code if user else "en"
-
     await cb.message.edit_text(t(lang, "habit_select_days"), reply_markup=weekdays_keyboard(weekdays, lang))
 
 
 @router.callback_query(CreateHabitStates.time_slot, lambda c: c.data and (c.data.startswith("tm_") or c.data == "time_ok"))
-async def cb_time(cb: CallbackQuery, state: FSMContext) -> None:
+async def cb_time(cb: CallbackQuery, state: FSMContext, lang: str) -> None:
     await cb.answer()
     data = await state.get_data()
     times = list(data.get("times", []))
-    tid = cb.from_user.id if cb.from_user else 0
 
     if cb.data == "time_ok":
         if not times:
             return
         await state.update_data(times=times)
         await state.set_state(CreateHabitStates.confirm)
-        sm = get_session_maker()
-        async with sm() as session:
-            user = await user_service.get_by_telegram_id(session, tid)
-            lang = user.language_code if user else "en"
         title = data.get("habit_title", "")
         wd_names = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
         days_str = ", ".join(wd_names[d] for d in sorted(data.get("weekdays", [])))
@@ -193,11 +164,6 @@ async def cb_time(cb: CallbackQuery, state: FSMContext) -> None:
         times.sort()
     await state.update_data(times=times)
 
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        lang = user.language_code if user else "en"
-
     await cb.message.edit_text(t(lang, "habit_select_time"), reply_markup=time_keyboard(times, lang))
 
 
@@ -205,16 +171,11 @@ async def cb_time(cb: CallbackQuery, state: FSMContext) -> None:
 @router.callback_query(CreateHabitStates.days, lambda c: c.data == "back_main")
 @router.callback_query(CreateHabitStates.time_slot, lambda c: c.data == "back_main")
 @router.callback_query(CreateHabitStates.confirm, lambda c: c.data in ("back_main", "habit_cancel"))
-async def cb_create_cancel(cb: CallbackQuery, state: FSMContext) -> None:
+async def cb_create_cancel(cb: CallbackQuery, state: FSMContext, user: User | None, lang: str) -> None:
     await cb.answer()
     await state.clear()
-    tid = cb.from_user.id if cb.from_user else 0
     fname = cb.from_user.first_name if cb.from_user else ""
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        lang = user.language_code if user else "en"
-        is_premium = user_service.is_premium(user) if user else False
+    is_premium = user_service.is_premium(user) if user else False
     await cb.message.edit_text(
         t(lang, "main_greeting").format(name=fname or "there"),
         reply_markup=main_menu(lang, is_premium),
@@ -222,16 +183,11 @@ async def cb_create_cancel(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.callback_query(CreateHabitStates.custom_title, lambda c: c.data == "back_main")
-async def cb_custom_back(cb: CallbackQuery, state: FSMContext) -> None:
+async def cb_custom_back(cb: CallbackQuery, state: FSMContext, user: User | None, lang: str) -> None:
     await cb.answer()
     await state.clear()
-    tid = cb.from_user.id if cb.from_user else 0
     fname = cb.from_user.first_name if cb.from_user else ""
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        lang = user.language_code if user else "en"
-        is_premium = user_service.is_premium(user) if user else False
+    is_premium = user_service.is_premium(user) if user else False
     await cb.message.edit_text(
         t(lang, "main_greeting").format(name=fname or "there"),
         reply_markup=main_menu(lang, is_premium),
@@ -239,30 +195,25 @@ async def cb_custom_back(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.callback_query(CreateHabitStates.confirm, lambda c: c.data == "habit_confirm_ok")
-async def cb_confirm_ok(cb: CallbackQuery, state: FSMContext) -> None:
+async def cb_confirm_ok(
+    cb: CallbackQuery, state: FSMContext, session: AsyncSession, user: User | None, lang: str
+) -> None:
     await cb.answer()
     data = await state.get_data()
     title = data.get("habit_title", "")
     weekdays = data.get("weekdays", [])
     times = data.get("times", [])
-    tid = cb.from_user.id if cb.from_user else 0
 
     if not title or not weekdays or not times:
         await state.clear()
         return
 
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        if not user:
-            return
-        await habit_service.create(session, user.id, title, weekdays, times)
-        await session.commit()
-        await achievement_service.check_achievements(
-            session, user.id, user, cb.bot, user.telegram_id, trigger="habit_created"
-        )
-        await session.commit()
-        lang = user.language_code
+    if not user:
+        return
+    await habit_service.create(session, user.id, title, weekdays, times)
+    await metrics_service.update_metrics_on_habit_created(session, user.id, user)
+    await achievement_check_service.enqueue(session, user.id, "habit_created")
+    await session.commit()
 
     await state.clear()
     is_premium = user_service.is_premium(user)
@@ -273,7 +224,7 @@ async def cb_confirm_ok(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.message(CreateHabitStates.custom_title, F.text)
-async def habit_custom_title(message: Message, state: FSMContext) -> None:
+async def habit_custom_title(message: Message, state: FSMContext, lang: str) -> None:
     raw = (message.text or "").strip()
     title = sanitize_habit_title(raw)
     if not title:
@@ -283,9 +234,4 @@ async def habit_custom_title(message: Message, state: FSMContext) -> None:
         return
     await state.update_data(habit_title=title)
     await state.set_state(CreateHabitStates.days)
-    tid = message.from_user.id if message.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        lang = user.language_code if user else "en"
     await message.answer(t(lang, "habit_select_days"), reply_markup=weekdays_keyboard([], lang))
@@ -6,7 +6,7 @@ from aiogram.types import CallbackQuery, LabeledPrice, Message, PreCheckoutQuery
 from app.config import settings
 from app.db import get_session_maker
 from app.keyboards import main_menu, subscription_menu
-from app.services import achievement_service
+from app.services import achievement_check_service, user_service
 from app.services.payments import TARIFF_DAYS, extend_subscription, get_days_from_payload
 from app.texts import t
 from sqlalchemy import select
@@ -21,11 +21,7 @@ PRICES = {"1": 19900, "3": 49900, "12": 99900}
 async def cb_subscription(cb: CallbackQuery) -> None:
     await cb.answer()
     tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        r = await session.execute(select(User).where(User.telegram_id == tid))
-        user = r.scalar_one_or_none()
-        lang = user.language_code if user else "en"
+    lang = await user_service.get_language(tid, default="en")
     await cb.message.edit_text(t(lang, "btn_subscription"), reply_markup=subscription_menu(lang))
 
 
@@ -40,11 +36,7 @@ async def cb_pay(cb: CallbackQuery) -> None:
     chat_id = cb.message.chat.id if cb.message else tid
 
     if not settings.payment_provider_token:
-        sm = get_session_maker()
-        async with sm() as session:
-            r = await session.execute(select(User).where(User.telegram_id == tid))
-            user = r.scalar_one_or_none()
-            lang = user.language_code if user else "en"
+        lang = await user_service.get_language(tid, default="en")
         await cb.message.edit_text("Configure PAYMENT_PROVIDER_TOKEN", reply_markup=main_menu(lang))
         return
 
@@ -72,10 +64,7 @@ async def successful_payment(message: Message) -> None:
         user = r.scalar_one_or_none()
         if user:
             await extend_subscription(session, user.id, days)
-            await session.commit()
-            await achievement_service.check_achievements(
-                session, user.id, user, message.bot, user.telegram_id, trigger="subscription_purchased"
-            )
+            await achievement_check_service.enqueue_guarded(session, user.id, "subscription_purchased")
             await session.commit()
         lang = user.language_code if user else "en"
 
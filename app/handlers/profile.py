@@ -4,16 +4,18 @@ from datetime import datetime, timezone
 
 from aiogram import Router
 from aiogram.types import CallbackQuery, Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.levels import get_required_xp
-from app.db import get_session_maker
 from app.keyboards import back_only
 from app.keyboards.achievements import achievements_keyboard
 from app.keyboards.profile import profile_keyboard
+from app.models import User
 from app.utils.progress import build_progress_bar
 from app.utils.timezone_flags import get_tz_display
 from app.utils.safe_edit import safe_edit_or_send
-from app.services import achievement_service, habit_log_service, referral_service, user_service
+from app.services import achievement_service, habit_log_service, referral_service, streak_service, user_service
+from app.services.user_service import UserSnapshot
 from app.texts import t
 
 router = Router(name="profile")
@@ -84,19 +86,14 @@ async def _send_profile(target, user, ref_count: int, fname: str, lang: str, is_
 
 
 @router.callback_query(lambda c: c.data == "profile")
-async def cb_profile(cb: CallbackQuery) -> None:
+async def cb_profile(cb: CallbackQuery, session: AsyncSession, user: User | None, lang: str) -> None:
     await cb.answer()
     tid = cb.from_user.id if cb.from_user else 0
     achievement_service.clear_achievements_screen(tid)
     fname = cb.from_user.first_name if cb.from_user else ""
-
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        if not user:
-            return
-        lang = user.language_code
-        ref_count = await referral_service.count_referrals(session, user.id)
+    if not user:
+        return
+    ref_count = await referral_service.count_referrals(session, user.id)
 
     is_premium = user_service.is_premium(user)
     try:
@@ -107,23 +104,22 @@ async def cb_profile(cb: CallbackQuery) -> None:
 
 
 @router.callback_query(lambda c: c.data == "profile_statistics")
-async def cb_profile_statistics(cb: CallbackQuery) -> None:
+async def cb_profile_statistics(cb: CallbackQuery, session: AsyncSession, user_snapshot: UserSnapshot | None, lang: str) -> None:
     await cb.answer()
-    tid = cb.from_user.id if cb.from_user else 0
-
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        if not user:
-            return
-        lang = user.language_code
-        done = await habit_log_service.count_done(session, user.id)
-        skipped = await habit_log_service.count_skipped(session, user.id)
+    if not user_snapshot:
+        return
+    done = await habit_log_service.count_done(session, user_snapshot.id)
+    skipped = await habit_log_service.count_skipped(session, user_snapshot.id)
+    streak = await streak_service.get_state(session, user_snapshot.id)
+    current, longest = streak.current_streak, streak.longest_streak
+    await session.commit()
 
     text = (
         f"📊 {t(lang, 'statistics')}\n\n"
         f"✅ {t(lang, 'done_habits')}: {done}\n"
-        f"⏭ {t(lang, 'skipped_habits')}: {skipped}"
+        f"⏭ {t(lang, 'skipped_habits')}: {skipped}\n"
+        f"🔥 {t(lang, 'current_streak')}: {current}\n"
+        f"🏆 {t(lang, 'longest_streak')}: {longest}"
     )
     await safe_edit_or_send(cb, text, reply_markup=back_only(lang, "profile"))
 
@@ -138,7 +134,7 @@ def _ach_page(c: str) -> int | None:
 
 
 @router.callback_query(lambda c: c.data == "profile_achievements" or (c.data and c.data.startswith("ach_page_")))
-async def cb_profile_achievements(cb: CallbackQuery) -> None:
+async def cb_profile_achievements(cb: CallbackQuery, session: AsyncSession, user_snapshot: UserSnapshot | None, lang: str) -> None:
     await cb.answer()
     tid = cb.from_user.id if cb.from_user else 0
     page = 0
@@ -146,15 +142,10 @@ async def cb_profile_achievements(cb: CallbackQuery) -> None:
         p = _ach_page(cb.data)
         if p is not None and p >= 0:
             page = p
-
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        if not user:
-            return
-        lang = user.language_code
-        text = await achievement_service.build_achievements_header(session, user.id, lang)
-        ach_list = await achievement_service.get_achievements_with_status(session, user.id, lang)
+    if not user_snapshot:
+        return
+    text = await achievement_service.build_achievements_header(session, user_snapshot.id, lang)
+    ach_list = await achievement_service.get_achievements_with_status(session, user_snapshot.id, lang)
 
     kb = achievements_keyboard(ach_list, page, lang, len(ach_list))
     loc = await safe_edit_or_send(cb, text, reply_markup=kb)
@@ -163,31 +154,21 @@ async def cb_profile_achievements(cb: CallbackQuery) -> None:
 
 
 @router.callback_query(lambda c: c.data and c.data.startswith("ach_view:"))
-async def cb_ach_view(cb: CallbackQuery) -> None:
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        lang = user.language_code if user else "ru"
+async def cb_ach_view(cb: CallbackQuery, lang: str) -> None:
     await cb.answer(t(lang, "ach_unlocked_msg"))
 
 
 @router.callback_query(lambda c: c.data and c.data.startswith("ach_lock:"))
-async def cb_ach_lock(cb: CallbackQuery) -> None:
+async def cb_ach_lock(cb: CallbackQuery, session: AsyncSession, user_snapshot: UserSnapshot | None, lang: str) -> None:
     aid = int(cb.data.split(":")[1])
-    tid = cb.from_user.id if cb.from_user else 0
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        if not user:
-            await cb.answer()
-            return
-        lang = user.language_code
-        ach = await achievement_service.get_achievement_by_id(session, aid)
-        if not ach:
-            await cb.answer()
-            return
-        desc = ach.description_ru if lang == "ru" else ach.description_en
-        prefix = t(lang, "ach_locked_prefix")
-        msg = f"{prefix} {desc}"
+    if not user_snapshot:
+        await cb.answer()
+        return
+    ach = await achievement_service.get_achievement_by_id(session, aid)
+    if not ach:
+        await cb.answer()
+        return
+    desc = ach.description_ru if lang == "ru" else ach.description_en
+    prefix = t(lang, "ach_locked_prefix")
+    msg = f"{prefix} {desc}"
     await cb.answer(msg, show_alert=True)
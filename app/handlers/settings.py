@@ -5,11 +5,13 @@ import logging
 
 from aiogram import Router
 from aiogram.types import CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_session_maker
 from app.keyboards.settings import TIMEZONES
 from app.keyboards import settings_menu, lang_select, timezone_keyboard
-from app.services import achievement_service, user_service, timezone_service
+from app.models import User
+from app.services import achievement_check_service, user_service, timezone_service
+from app.services.user_service import UserSnapshot
 from app.texts import t
 from app.utils.message_cleanup import delete_later
 
@@ -18,57 +20,34 @@ router = Router(name="settings")
 
 
 @router.callback_query(lambda c: c.data == "settings")
-async def cb_settings(cb: CallbackQuery) -> None:
+async def cb_settings(cb: CallbackQuery, lang: str) -> None:
     await cb.answer()
-    tid = cb.from_user.id if cb.from_user else 0
-
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        lang = user.language_code if user else "en"
-
     await cb.message.edit_text(t(lang, "settings_menu"), reply_markup=settings_menu(lang))
 
 
 @router.callback_query(lambda c: c.data == "settings_tz")
-async def cb_settings_tz(cb: CallbackQuery) -> None:
+async def cb_settings_tz(cb: CallbackQuery, user_snapshot: UserSnapshot | None, lang: str) -> None:
     await cb.answer()
-    tid = cb.from_user.id if cb.from_user else 0
-
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        lang = user.language_code if user else "en"
-        current_tz = (user.timezone or "Europe/Moscow").strip() if user else "Europe/Moscow"
+    current_tz = (user_snapshot.timezone or "Europe/Moscow").strip() if user_snapshot else "Europe/Moscow"
 
     await cb.message.edit_text(t(lang, "tz_prompt"), reply_markup=timezone_keyboard(current_tz, lang))
 
 
 @router.callback_query(lambda c: c.data and c.data.startswith("tz:"))
-async def cb_tz_set(cb: CallbackQuery) -> None:
+async def cb_tz_set(cb: CallbackQuery, session: AsyncSession, user: User | None, lang: str) -> None:
     new_tz = (cb.data.split(":", 1)[1] if ":" in (cb.data or "") else "").strip()
-    tid = cb.from_user.id if cb.from_user else 0
 
     if not timezone_service.validate_timezone(new_tz):
         await cb.answer(t("ru", "tz_invalid"), show_alert=True)
         return
 
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        if not user:
-            await cb.answer()
-            return
-        user.timezone = new_tz
-        await session.commit()
-        await session.refresh(user)
-        lang = user.language_code
-        active_tz = (user.timezone or "Europe/Moscow").strip()
-
-        await achievement_service.check_achievements(
-            session, user.id, user, cb.bot, user.telegram_id, trigger="profile_updated"
-        )
-        await session.commit()
+    if not user:
+        await cb.answer()
+        return
+    await user_service.update_timezone(session, user, new_tz)
+    await achievement_check_service.enqueue(session, user.id, "profile_updated")
+    await session.commit()
+    active_tz = (user.timezone or "Europe/Moscow").strip()
 
     await cb.message.edit_reply_markup(reply_markup=timezone_keyboard(active_tz, lang))
     await cb.answer(t(lang, "tz_updated"), show_alert=True)
@@ -78,20 +57,13 @@ async def cb_tz_set(cb: CallbackQuery) -> None:
 
 
 @router.callback_query(lambda c: c.data == "settings_lang")
-async def cb_settings_lang(cb: CallbackQuery) -> None:
+async def cb_settings_lang(cb: CallbackQuery, lang: str) -> None:
     await cb.answer()
-    tid = cb.from_user.id if cb.from_user else 0
-
-    sm = get_session_maker()
-    async with sm() as session:
-        user = await user_service.get_by_telegram_id(session, tid)
-        lang = user.language_code if user else "en"
-
     await cb.message.edit_text(t(lang, "lang_prompt"), reply_markup=lang_select(next_step="done", lang=lang, back_callback="settings"))
 
 
 @router.callback_query(lambda c: c.data and c.data.startswith("lang_") and "_done" in (c.data or ""))
-async def cb_lang_select(cb: CallbackQuery) -> None:
+async def cb_lang_select(cb: CallbackQuery, session: AsyncSession, user: User | None) -> None:
     await cb.answer()
     data = cb.data or ""
     lang = "ru"
@@ -101,22 +73,11 @@ async def cb_lang_select(cb: CallbackQuery) -> None:
         lang = "en"
     elif "ar" in data:
         lang = "ar"
-    tid = cb.from_user.id if cb.from_user else 0
-
-    sm = get_session_maker()
-    async with sm() as session:
-        from sqlalchemy import select
-        from app.models import User
-        r = await session.execute(select(User).where(User.telegram_id == tid))
-        user = r.scalar_one_or_none()
-        if user:
-            await user_service.update_language(session, user, lang)
+
+    if user:
+        await user_service.update_language(session, user, lang)
+        await achievement_check_service.enqueue(session, user.id, "profile_updated")
         await session.commit()
-        if user:
-            await achievement_service.check_achievements(
-                session, user.id, user, cb.bot, user.telegram_id, trigger="profile_updated"
-            )
-            await session.commit()
 
     confirm_key = f"lang_updated_{lang}"
     await cb.message.edit_text(t(lang, confirm_key), reply_markup=settings_menu(lang))
@@ -1,16 +1,31 @@
 """Health endpoint and webhooks for Railway."""
 
 import logging
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
 
 from fastapi import FastAPI
+from sqlalchemy.exc import SQLAlchemyError
 
+from app.api.webhooks import telegram as telegram_webhook
 from app.api.webhooks.crypto import router as crypto_webhook_router
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    await telegram_webhook.start()
+    try:
+        yield
+    finally:
+        await telegram_webhook.stop()
+
+
+app = FastAPI(lifespan=_lifespan)
 
 app.include_router(crypto_webhook_router)
+app.include_router(telegram_webhook.router)
 
 
 @app.get("/health")
@@ -30,6 +45,34 @@ async def health() -> dict:
         status["checks"]["database"] = f"error: {e}"
         status["status"] = "degraded"
 
+    # Snooze queue depth
+    try:
+        from app.database import get_session_maker
+        from app.services import snooze_service
+        async with get_session_maker()() as session:
+            pending, due = await snooze_service.queue_depth(session)
+        status["checks"]["snooze_queue"] = {"pending": pending, "due": due}
+    except (SQLAlchemyError, OSError) as e:
+        status["checks"]["snooze_queue"] = f"error: {e}"
+
+    # Achievement check queue depth
+    try:
+        from app.database import get_session_maker
+        from app.services import achievement_check_service
+        async with get_session_maker()() as session:
+            status["checks"]["achievement_queue"] = await achievement_check_service.queue_depth(session)
+    except (SQLAlchemyError, OSError) as e:
+        status["checks"]["achievement_queue"] = f"error: {e}"
+
+    # In-memory stats published by the bot process (and web workers in webhook mode)
+    try:
+        from app.database import get_session_maker
+        from app.services import process_stats_service
+        async with get_session_maker()() as session:
+            status["checks"]["processes"] = await process_stats_service.recent(session, datetime.now(UTC))
+    except (SQLAlchemyError, OSError) as e:
+        status["checks"]["processes"] = f"error: {e}"
+
     # Check scheduler
     try:
         from app.scheduler import get_scheduler
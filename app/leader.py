@@ -0,0 +1,97 @@
+"""Scheduler leader election — one bot replica runs the periodic jobs at a time.
+
+Every replica starts the scheduler, but its periodic jobs only do work while
+this process holds a session-level Postgres advisory lock. The lock lives on a
+dedicated connection that is pinged every HEARTBEAT_INTERVAL; followers retry
+at the same pace. If the leader exits or its connection dies, Postgres drops
+the lock and a follower takes over within one interval. A leader that loses
+its connection steps down at its next heartbeat.
+"""
+
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from app.database import get_engine
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 7_351_902_114  # app-wide advisory lock id of the scheduler leader
+HEARTBEAT_INTERVAL = 10.0  # seconds; also the worst-case failover delay
+
+
+class SchedulerLeader:
+    def __init__(self, key: int = LOCK_KEY, interval: float = HEARTBEAT_INTERVAL) -> None:
+        self.key = key
+        self.interval = interval
+        self._conn = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._conn is not None
+
+    async def start(self) -> None:
+        """Try to become leader now, then keep trying / heartbeating in the background."""
+        await self._tick()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._tick()
+
+    async def _tick(self) -> None:
+        if self._conn is not None:
+            try:
+                await self._conn.execute(text("SELECT 1"))
+                return
+            except Exception:
+                logger.warning("Scheduler leadership lost", exc_info=True)
+                await self._release(unlock=False)
+        conn = None
+        try:
+            conn = await get_engine().connect()
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key})
+        except Exception:
+            logger.warning("Scheduler leader election failed", exc_info=True)
+            acquired = False
+        if acquired:
+            self._conn = conn
+            logger.info("Scheduler leadership acquired")
+        elif conn is not None:
+            await conn.close()
+
+    async def _release(self, unlock: bool) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            if unlock:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+        except Exception:
+            logger.warning("Scheduler leader unlock failed", exc_info=True)
+            unlock = False
+        if not unlock:
+            # Never hand a connection that may still hold the lock back to the pool
+            await conn.invalidate()
+        await conn.close()
+
+    async def stop(self) -> None:
+        """Stop campaigning and release leadership so a follower takes over at once."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._release(unlock=True)
+
+
+_leader: SchedulerLeader | None = None
+
+
+def get_leader() -> SchedulerLeader:
+    global _leader
+    if _leader is None:
+        _leader = SchedulerLeader()
+    return _leader
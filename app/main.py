@@ -1,22 +1,32 @@
-"""Bot entrypoint — pure long-polling with graceful shutdown."""
+"""Bot entrypoint — long polling (or webhook registration) plus the scheduler, with graceful shutdown."""
 
 import asyncio
 import logging
 import signal
 import sys
+from datetime import timedelta
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 
+from app import telegram_gateway
+from app.api.webhooks import telegram as telegram_webhook
 from app.config import settings
 from app.database import close_db, init_db
+from app.fsm_storage import PostgresStorage
+from app.leader import get_leader
 from app.logger import setup_logging
 from app.middlewares.content_filter import ContentFilterMiddleware
+from app.middlewares.fsm_flush import FSMFlushMiddleware
+from app.middlewares.i18n import I18nMiddleware
 from app.middlewares.rate_limit import RateLimitMiddleware
+from app.middlewares.user_context import UserContextMiddleware
 from app.scheduler import setup_scheduler, shutdown_scheduler
+from app.services import process_stats_service
 
 from app.handlers import (
     admin,
@@ -41,17 +51,32 @@ logger = logging.getLogger(__name__)
 _shutdown_event = asyncio.Event()
 
 
+def _create_storage() -> BaseStorage:
+    if settings.fsm_storage == "memory":
+        return MemoryStorage()
+    return PostgresStorage(ttl=timedelta(hours=settings.fsm_state_ttl_hours))
+
+
 def _create_bot_and_dp() -> tuple[Bot, Dispatcher]:
     bot = Bot(
         token=settings.bot_token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
-    dp = Dispatcher(storage=MemoryStorage())
-
-    # Register middlewares: rate limit first, then content filter
+    telegram_gateway.install(bot)
+    storage = _create_storage()
+    dp = Dispatcher(storage=storage)
+    if isinstance(storage, PostgresStorage):
+        # Around the whole update, so FSM writes of every handler are flushed together
+        dp.update.outer_middleware(FSMFlushMiddleware(storage))
+
+    # Register middlewares: rate limit first, then content filter, then the
+    # per-update session/user and the language derived from that user
     dp.message.middleware(RateLimitMiddleware())
     dp.callback_query.middleware(RateLimitMiddleware())
     dp.message.middleware(ContentFilterMiddleware())
+    for observer in (dp.message, dp.callback_query):
+        observer.middleware(UserContextMiddleware())
+        observer.middleware(I18nMiddleware())
 
     dp.include_router(admin.router)
     dp.include_router(commands.router)
@@ -82,8 +107,16 @@ async def main() -> None:
     _safe = _url.split("@")[-1] if "@" in _url else "***"
     logger.info("DATABASE_URL (host): %s", _safe)
 
+    if settings.bot_mode == "webhook" and not (settings.webhook_base_url and settings.webhook_secret):
+        logger.error("BOT_MODE=webhook needs WEBHOOK_BASE_URL and WEBHOOK_SECRET")
+        sys.exit(1)
+
     await init_db()
     bot, dp = _create_bot_and_dp()
+    if isinstance(dp.storage, PostgresStorage):
+        await dp.storage.start()
+    # Every replica schedules the jobs; only the advisory-lock holder runs them
+    await get_leader().start()
     setup_scheduler(bot)
 
     await bot.set_my_commands([
@@ -99,7 +132,15 @@ async def main() -> None:
     ])
 
     logging.getLogger("aiogram").setLevel(logging.DEBUG)
-    await bot.delete_webhook(drop_pending_updates=True)
+    if settings.bot_mode == "webhook":
+        # Updates go to the web workers (app.health); this process keeps the scheduler
+        await bot.set_webhook(
+            telegram_webhook.webhook_url(),
+            secret_token=settings.webhook_secret,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+    else:
+        await bot.delete_webhook(drop_pending_updates=True)
 
     # Graceful shutdown via signals
     loop = asyncio.get_running_loop()
@@ -111,15 +152,22 @@ async def main() -> None:
     for sig in (signal.SIGINT, signal.SIGTERM):
         loop.add_signal_handler(sig, _signal_handler)
 
+    # Caches and the outbound gateway queues of this process, reported by /health
+    stats_task = asyncio.create_task(process_stats_service.publish_forever("bot"))
+
     try:
-        polling_task = asyncio.create_task(dp.start_polling(bot))
+        if settings.bot_mode != "webhook":
+            polling_task = asyncio.create_task(dp.start_polling(bot))
         await _shutdown_event.wait()
         logger.info("Initiating graceful shutdown...")
         dp.shutdown()
     except Exception:
         pass
     finally:
+        stats_task.cancel()
         shutdown_scheduler()
+        await get_leader().stop()
+        await dp.storage.close()
         await close_db()
         logger.info("Bot stopped gracefully")
 
@@ -14,8 +14,8 @@ from typing import Any, Awaitable, Callable
 from aiogram import BaseMiddleware
 from aiogram.types import CallbackQuery, Message, TelegramObject
 
-from app.utils.content_moderator import is_prohibited
-from app.utils.input_sanitizer import sanitize_text, MAX_MESSAGE_LENGTH
+from app.utils.content_moderator import screen
+from app.utils.input_sanitizer import MAX_MESSAGE_LENGTH
 
 logger = logging.getLogger(__name__)
 
@@ -50,9 +50,11 @@ class ContentFilterMiddleware(BaseMiddleware):
             )
             return None
 
+        # Layers 2-3 share one cached verdict per distinct text
+        verdict = screen(text)
+
         # Layer 2: Unicode sanitization (NFC, invisible chars, Zalgo, emoji bomb)
-        sanitized = sanitize_text(text)
-        if sanitized is None:
+        if verdict.text is None:
             logger.warning(
                 "Content filter: sanitization rejected text from user_id=%s — dropped",
                 getattr(getattr(event, "from_user", None), "id", "?"),
@@ -60,7 +62,7 @@ class ContentFilterMiddleware(BaseMiddleware):
             return None
 
         # Layer 3: Banned content check
-        if is_prohibited(sanitized):
+        if verdict.prohibited:
             logger.warning(
                 "Content filter: prohibited content from user_id=%s — dropped",
                 getattr(getattr(event, "from_user", None), "id", "?"),
@@ -73,7 +75,7 @@ class ContentFilterMiddleware(BaseMiddleware):
             display_name = from_user.first_name or ""
             if from_user.last_name:
                 display_name += " " + from_user.last_name
-            if display_name and is_prohibited(display_name):
+            if display_name and screen(display_name).prohibited:
                 logger.warning(
                     "Content filter: prohibited display name '%s' from user_id=%s — dropped",
                     display_name[:30], from_user.id,
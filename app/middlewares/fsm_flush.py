@@ -0,0 +1,27 @@
+"""FSM flush middleware — write the update's FSM changes once, after it is handled."""
+
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.fsm_storage import PostgresStorage
+
+
+class FSMFlushMiddleware(BaseMiddleware):
+    """Outer update middleware: set_state/update_data calls of one update become one write."""
+
+    def __init__(self, storage: PostgresStorage) -> None:
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            await self.storage.flush()
@@ -1,4 +1,9 @@
-"""i18n middleware — strict language from user.language, no fallback guessing."""
+"""i18n middleware — strict language from user.language, no fallback guessing.
+
+Runs after UserContextMiddleware and reads the language from its cached
+`user_snapshot`; handlers receive `lang` and `t(key, **kw)` bound to the
+app.texts catalog they already use.
+"""
 
 import logging
 from typing import Any, Awaitable, Callable
@@ -6,7 +11,8 @@ from typing import Any, Awaitable, Callable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
 
-from app.utils.i18n import get_presets, get_weekdays, t as i18n_t
+from app.texts import t as texts_t
+from app.utils.i18n import get_presets, get_weekdays
 
 logger = logging.getLogger(__name__)
 
@@ -32,12 +38,11 @@ class I18nMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: dict[str, Any],
     ) -> Any:
-        user = data.get("user")
-        lang = _resolve_lang(user)
+        lang = _resolve_lang(data.get("user_snapshot"))
         data["lang"] = lang
 
         def _t(key: str, **kw) -> str:
-            return i18n_t(lang, key, **kw)
+            return texts_t(lang, key, **kw)
 
         data["t"] = _t
         data["presets"] = get_presets(lang)
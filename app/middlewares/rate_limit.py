@@ -1,29 +1,148 @@
-"""Rate limiting middleware — per-user throttling."""
+"""Rate limiting middleware — per-user token buckets with per-route limits.
+
+Each (user, route) key holds two floats: tokens left and when they were last
+counted. Buckets live in process memory by default and idle ones are evicted
+periodically, so memory tracks active users rather than every user ever seen.
+With RATE_LIMIT_BACKEND=postgres the buckets are shared across bot replicas.
+"""
 
 import logging
 import time
-from collections import defaultdict
 from typing import Any, Awaitable, Callable
 
 from aiogram import BaseMiddleware
 from aiogram.types import CallbackQuery, Message, TelegramObject
 
-logger = logging.getLogger(__name__)
+from app.config import settings
+from app.db import get_session_maker
+from app.services import rate_limit_service
 
-# Per-user: track (timestamp, count) in a sliding window
-_user_hits: dict[int, list[float]] = defaultdict(list)
+logger = logging.getLogger(__name__)
 
-# Defaults: 10 requests per 5 seconds
+# Defaults: bursts of 10 requests, refilling 10 per 5 seconds
 RATE_LIMIT = 10
 RATE_WINDOW = 5.0  # seconds
 
+DEFAULT_ROUTE = "default"
+
+# route -> (capacity, refill tokens per second)
+ROUTE_LIMITS: dict[str, tuple[float, float]] = {
+    DEFAULT_ROUTE: (RATE_LIMIT, RATE_LIMIT / RATE_WINDOW),
+    "export": (2, 1 / 60),  # builds a file from the whole history
+    "game": (3, 1 / 20),
+}
+
+# First word of a message, or callback data -> route
+ROUTE_KEYS = {
+    "/export": "export",
+    "export_data": "export",
+    "/game": "game",
+    "🎳": "game",
+    "game": "game",
+}
+
+EVICT_INTERVAL = 60.0  # seconds between idle sweeps
+
+
+def _max_idle(limits: dict[str, tuple[float, float]]) -> float:
+    """Seconds after which any bucket has refilled to capacity."""
+    return max(capacity / rate for capacity, rate in limits.values())
+
+
+def route_of(event: TelegramObject) -> str:
+    if isinstance(event, Message):
+        words = (event.text or "").split(maxsplit=1)
+        token = words[0].split("@", 1)[0] if words else ""
+    elif isinstance(event, CallbackQuery):
+        token = event.data or ""
+    else:
+        return DEFAULT_ROUTE
+    return ROUTE_KEYS.get(token, DEFAULT_ROUTE)
+
+
+class MemoryBuckets:
+    """Buckets in this process. Idle keys are dropped every EVICT_INTERVAL."""
+
+    def __init__(self, max_idle: float) -> None:
+        self.max_idle = max_idle
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._next_evict = 0.0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def evict(self, now: float) -> int:
+        idle = [key for key, (_, updated) in self._buckets.items() if now - updated >= self.max_idle]
+        for key in idle:
+            del self._buckets[key]
+        return len(idle)
+
+    def take_at(self, key: str, capacity: float, rate: float, now: float) -> bool:
+        if now >= self._next_evict:
+            self.evict(now)
+            self._next_evict = now + EVICT_INTERVAL
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        allowed, tokens = rate_limit_service.take(tokens, updated, now, capacity, rate)
+        self._buckets[key] = (tokens, now)
+        return allowed
+
+    async def take(self, key: str, capacity: float, rate: float) -> bool:
+        return self.take_at(key, capacity, rate, time.monotonic())
+
+
+class PostgresBuckets:
+    """Buckets in the rate_limit_buckets table, shared by all replicas. Fails open."""
+
+    def __init__(self, max_idle: float) -> None:
+        self.max_idle = max_idle
+        self._next_evict = 0.0
+
+    async def take(self, key: str, capacity: float, rate: float) -> bool:
+        now = time.monotonic()
+        try:
+            async with get_session_maker()() as session:
+                if now >= self._next_evict:
+                    self._next_evict = now + EVICT_INTERVAL
+                    await rate_limit_service.evict_idle(session, self.max_idle)
+                allowed = await rate_limit_service.take_shared(session, key, capacity, rate)
+                await session.commit()
+            return allowed
+        except Exception:
+            # Fail open: a limiter outage must not block users
+            logger.warning("Shared rate limit unavailable, allowing %s", key, exc_info=True)
+            return True
+
+
+_backend: MemoryBuckets | PostgresBuckets | None = None
+
+
+def get_backend() -> MemoryBuckets | PostgresBuckets:
+    """Process-wide backend from settings.rate_limit_backend, shared by all middleware instances."""
+    global _backend
+    if _backend is None:
+        max_idle = _max_idle(ROUTE_LIMITS)
+        if settings.rate_limit_backend == "postgres":
+            _backend = PostgresBuckets(max_idle)
+        else:
+            _backend = MemoryBuckets(max_idle)
+    return _backend
+
 
 class RateLimitMiddleware(BaseMiddleware):
-    """Simple in-memory rate limiter per Telegram user."""
+    """Token-bucket rate limiter per Telegram user and route."""
 
-    def __init__(self, limit: int = RATE_LIMIT, window: float = RATE_WINDOW):
+    def __init__(
+        self,
+        limit: int = RATE_LIMIT,
+        window: float = RATE_WINDOW,
+        backend: MemoryBuckets | PostgresBuckets | None = None,
+    ):
         self.limit = limit
         self.window = window
+        self.limits = {**ROUTE_LIMITS, DEFAULT_ROUTE: (limit, limit / window)}
+        self.backend = backend or get_backend()
+        # Never evict a bucket of ours before it has refilled
+        self.backend.max_idle = max(self.backend.max_idle, _max_idle(self.limits))
 
     async def __call__(
         self,
@@ -40,19 +159,12 @@ class RateLimitMiddleware(BaseMiddleware):
         if user_id is None:
             return await handler(event, data)
 
-        now = time.monotonic()
-        hits = _user_hits[user_id]
-
-        # Clean old entries outside the window
-        cutoff = now - self.window
-        _user_hits[user_id] = [ts for ts in hits if ts > cutoff]
-        hits = _user_hits[user_id]
-
-        if len(hits) >= self.limit:
-            logger.warning("Rate limit exceeded for user_id=%s (%d/%d in %.1fs)", user_id, len(hits), self.limit, self.window)
+        route = route_of(event)
+        capacity, rate = self.limits[route]
+        if not await self.backend.take(f"{user_id}:{route}", capacity, rate):
+            logger.warning("Rate limit exceeded for user_id=%s route=%s", user_id, route)
             if isinstance(event, CallbackQuery):
                 await event.answer("Too many requests. Please wait.", show_alert=True)
             return None
 
-        hits.append(now)
         return await handler(event, data)
@@ -1,28 +1,44 @@
 """Models — single export surface."""
 
 from app.models.achievement import Achievement, UserAchievement
+from app.models.achievement_check import AchievementCheck
 from app.models.admin_audit_log import AdminAuditLog
 from app.models.user_metrics import UserMetrics
 from app.models.base import Base
+from app.models.fsm_state import FsmState
 from app.models.habit import Habit
 from app.models.habit_log import HabitLog
 from app.models.habit_time import HabitTime
-from app.models.motivation_usage import MotivationUsage
+from app.models.job_watermark import JobWatermark
+from app.models.premium_expiry_notice import PremiumExpiryNotice
+from app.models.process_stats import ProcessStats
+from app.models.rate_limit_bucket import RateLimitBucket
 from app.models.referral import Referral
+from app.models.snoozed_reminder import SnoozedReminder
 from app.models.subscription import Payment
 from app.models.user import User
+from app.models.user_streak import UserStreak
+from app.models.weekly_report_run import WeeklyReportRun
 
 __all__ = [
     "Achievement",
+    "AchievementCheck",
     "AdminAuditLog",
     "UserAchievement",
     "UserMetrics",
     "Base",
     "User",
+    "UserStreak",
+    "FsmState",
     "Habit",
     "HabitTime",
     "HabitLog",
-    "MotivationUsage",
+    "JobWatermark",
+    "PremiumExpiryNotice",
+    "ProcessStats",
+    "RateLimitBucket",
     "Referral",
+    "SnoozedReminder",
     "Payment",
+    "WeeklyReportRun",
 ]
@@ -0,0 +1,23 @@
+"""AchievementCheck — pending achievement evaluation, one row per user."""
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class AchievementCheck(Base):
+    __tablename__ = "achievement_checks"
+
+    user_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    triggers: Mapped[str] = mapped_column(String(255), nullable=False, default="")
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Bumped by every enqueue, so completing a check never drops triggers queued meanwhile
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # Not handed out before this: lease of a running evaluation, or backoff after a failure
+    claimed_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,29 @@
+"""FsmState — aiogram FSM state and data per storage key, shared by all bot processes."""
+
+from datetime import datetime
+
+from sqlalchemy import DDL, JSON, DateTime, String, event, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class FsmState(Base):
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    data: Mapped[dict] = mapped_column(JSON().with_variant(JSONB(), "postgresql"), nullable=False, default=dict)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
+
+
+# Conversation state is cheap to lose on a crash and written on most updates:
+# skip the WAL. A clean restart keeps it.
+event.listen(
+    FsmState.__table__,
+    "after_create",
+    DDL("ALTER TABLE fsm_states SET UNLOGGED").execute_if(dialect="postgresql"),
+)
@@ -1,8 +1,15 @@
-"""HabitTime — weekday + time (TIME type)."""
+"""HabitTime — weekday + time (TIME type), plus precomputed next UTC fire time."""
 
-from datetime import time
+from datetime import datetime, time
 
-from sqlalchemy import BigInteger, ForeignKey, SmallInteger, Time, UniqueConstraint
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    ForeignKey,
+    SmallInteger,
+    Time,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
@@ -16,5 +23,7 @@ class HabitTime(Base):
     habit_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("habits.id", ondelete="CASCADE"), nullable=False)
     weekday: Mapped[int] = mapped_column(SmallInteger, nullable=False)
     time: Mapped[time] = mapped_column(Time, nullable=False)
+    # Next absolute UTC minute this slot fires at (user timezone applied). Maintained by reminder_index_service.
+    next_fire_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True, index=True)
 
     habit: Mapped["Habit"] = relationship("Habit", back_populates="habit_times")
@@ -0,0 +1,20 @@
+"""PremiumExpiryNotice — ledger of expiry warnings sent, one per (user, kind, premium_until)."""
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class PremiumExpiryNotice(Base):
+    __tablename__ = "premium_expiry_notices"
+
+    user_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    kind: Mapped[str] = mapped_column(String(8), primary_key=True)  # "3d" / "1d"
+    # The expiry warned about: a renewal moves premium_until and earns a fresh notice
+    premium_until: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, index=True)
+    notified_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,17 @@
+"""ProcessStats — latest in-memory stats of one bot or web process, for /health."""
+
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class ProcessStats(Base):
+    __tablename__ = "process_stats"
+
+    key: Mapped[str] = mapped_column(String(128), primary_key=True)  # host:pid
+    role: Mapped[str] = mapped_column(String(16), nullable=False)  # "bot" / "web"
+    stats: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
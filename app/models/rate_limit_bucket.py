@@ -0,0 +1,15 @@
+"""RateLimitBucket — shared token-bucket state, one row per (user, route) key."""
+
+from sqlalchemy import Float, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float, nullable=False)
+    # Epoch seconds from the database clock, so replicas agree on refill time
+    updated_at: Mapped[float] = mapped_column(Float, nullable=False, index=True)
@@ -30,6 +30,9 @@ class User(Base):
     trial_used: Mapped[bool] = mapped_column(nullable=False, default=False, server_default="false")
     streak_recoveries_used: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     last_streak_recovery_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Motivation phrase rotation: shuffle seed of the current cycle + position in it
+    motivation_seed: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    motivation_cursor: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), onupdate=func.now())
 
@@ -1,6 +1,8 @@
 """User metrics — aggregated stats for achievement conditions."""
 
-from sqlalchemy import BigInteger, Boolean, ForeignKey, Integer, func
+from datetime import date
+
+from sqlalchemy import BigInteger, Boolean, Date, ForeignKey, Integer, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base
@@ -36,3 +38,15 @@ class UserMetrics(Base):
     active_friends_30_days: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     active_categories: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     subscription_months: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Bit i set = achievement id i unlocked; NULL until built from user_achievements
+    achievements_mask: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # Fingerprint of the achievement catalog the mask was built against
+    achievements_catalog: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # User-local date the today-relative fields (completions_today, perfect today, ...) refer to
+    metrics_date: Mapped[date | None] = mapped_column(Date, nullable=True)
+    # Frozen aggregate of history older than the recalculation window (see metrics_service)
+    archived_through: Mapped[date | None] = mapped_column(Date, nullable=True)
+    archived_completions: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    archived_perfect_days: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    archived_last_perfect: Mapped[date | None] = mapped_column(Date, nullable=True)
+    archived_perfect_run: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,19 @@
+"""WeeklyReportRun — delivery progress of one week's reports, so a restart resumes."""
+
+from datetime import date, datetime
+
+from sqlalchemy import BigInteger, Date, DateTime, Integer, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class WeeklyReportRun(Base):
+    __tablename__ = "weekly_report_runs"
+
+    week_start: Mapped[date] = mapped_column(Date, primary_key=True)
+    # Reports are delivered in user id order; everyone up to here has been handled
+    last_user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    sent: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
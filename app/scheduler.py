@@ -1,22 +1,39 @@
-"""APScheduler — habit reminders every 60s, habit_time + timezone; daily metrics recalc."""
+"""APScheduler — habit reminders every 60s via the UTC fire-time index; daily metrics recalc.
 
+Periodic jobs are scheduled in every replica but only run on the elected leader (app.leader)."""
+
+import asyncio
+import functools
 import logging
-from datetime import datetime, timezone
-from zoneinfo import ZoneInfo
+from datetime import UTC, datetime, timedelta
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from sqlalchemy import select
 
+from app.config import settings
 from app.database import get_session_maker
 from app.keyboards.reminder import reminder_buttons
+from app.leader import get_leader
 from app.texts import _normalize_lang, t
-from app.models import Habit, HabitTime, User
-from app.services import habit_log_service, reminders as rem_svc
+from app.models import User
+from app.services import (
+    achievement_check_service,
+    achievement_service,
+    crypto_service,
+    fsm_service,
+    premium_expiry_service,
+    reminder_index_service,
+    reminders as rem_svc,
+    snooze_service,
+    streak_service,
+    weekly_report_service,
+)
+from app.telegram_gateway import BULK, REMINDER, with_priority
 
 logger = logging.getLogger(__name__)
 
 _scheduler: AsyncIOScheduler | None = None
+_streak_verify_after = 0  # keyset cursor of the streak verifier, wraps at the last user
 
 
 def get_scheduler() -> AsyncIOScheduler:
@@ -28,217 +45,305 @@ def get_scheduler() -> AsyncIOScheduler:
     return _scheduler
 
 
+@with_priority(REMINDER)
 async def run_reminders(bot) -> None:
-    """Every 60s: fresh DB fetch, timezone-aware conversion, direct weekday+time match.
-    No caching — DB is single source of truth."""
+    """Every 60s: one indexed lookup of slots whose next UTC fire time has passed.
+    Fired slots are advanced to their next weekly occurrence and the whole tick
+    is prepared with set-based queries in one session; sending happens after commit,
+    concurrently, paced by the outbound gateway."""
     try:
-        now_utc = datetime.now(timezone.utc)
+        now_utc = datetime.now(UTC)
         sm = get_session_maker()
-        async with sm() as s:
-            result = await s.execute(
-                select(HabitTime, Habit, User)
-                .join(Habit, HabitTime.habit_id == Habit.id)
-                .join(User, Habit.user_id == User.id)
-                .where(Habit.is_active == True)
-            )
-            rows = result.all()
+        async with sm() as session:
+            await reminder_index_service.backfill_missing(session, now_utc)
+            rows = await reminder_index_service.fetch_due(session, now_utc)
+            batch = []
+            for ht, habit, user in rows:
+                fire_at = reminder_index_service.as_utc(ht.next_fire_at)
+                if habit.is_active and fire_at >= now_utc - reminder_index_service.MAX_LATENESS:
+                    batch.append((user, habit, ht, reminder_index_service.local_date_of(fire_at, user.timezone)))
+            await reminder_index_service.advance(session, rows, now_utc)
+            ready = await rem_svc.prepare_batch(session, batch)
+            await session.commit()
 
-        for ht, habit, user in rows:
+        async def send(chat_id: int, habit_id: int, lang: str, text: str) -> None:
             try:
-                user_tz = ZoneInfo(user.timezone or "Europe/Moscow")
-            except Exception:
-                user_tz = ZoneInfo("Europe/Moscow")
+                await bot.send_message(
+                    chat_id=chat_id,
+                    text=text,
+                    reply_markup=reminder_buttons(habit_id, lang),
+                )
+            except Exception as e:
+                logger.warning("Reminder send failed user=%s habit=%s: %s", chat_id, habit_id, e)
+
+        # All at once: the outbound gateway paces them per chat and per bot
+        await asyncio.gather(*(send(*item) for item in ready))
 
-            now_local = now_utc.astimezone(user_tz)
-            weekday = now_local.weekday()
-            current_time = now_local.time().replace(second=0, microsecond=0)
-            today = now_local.date()
+    except Exception as e:
+        logger.exception("Reminders job error: %s", e)
 
-            if ht.weekday != weekday or ht.time != current_time:
-                continue
 
+@with_priority(REMINDER)
+async def deliver_snoozes(bot) -> None:
+    """Every 30s: claim due snoozed reminders in batches, send after each batch commits."""
+    try:
+        sm = get_session_maker()
+        now = datetime.now(UTC)
+        sent = 0
+        while True:
             async with sm() as session:
-                if await habit_log_service.has_log_today(session, user.id, habit.id, today):
-                    continue
-
-                lang = _normalize_lang(user.language_code)
-                await rem_svc.reset_usage_if_needed(session, user.id, lang)
-                used = await rem_svc.get_used_indices(session, user.id)
-                phrase, idx = rem_svc.get_phrase(lang, used)
-                await rem_svc.record_phrase_usage(session, user.id, habit.id, idx)
+                batch = await snooze_service.claim_due(session, now)
                 await session.commit()
+            for chat_id, habit_id, lang, title in batch:
+                try:
+                    await bot.send_message(
+                        chat_id=chat_id,
+                        text=t(_normalize_lang(lang), "snooze_reminder", title=title),
+                        reply_markup=reminder_buttons(habit_id, _normalize_lang(lang)),
+                    )
+                    sent += 1
+                except Exception as e:
+                    logger.warning("Snooze re-send failed user=%s habit=%s: %s", chat_id, habit_id, e)
+            if len(batch) < snooze_service.BATCH_SIZE:
+                break
+        if sent:
+            logger.info("Snoozed reminders delivered: %d", sent)
+    except Exception:
+        logger.exception("Snooze delivery job error")
 
-            try:
-                time_str = ht.time.strftime("%H:%M") if hasattr(ht.time, "strftime") else str(ht.time)
 
-                # Build reminder text with streak progress
-                streak_text = ""
-                try:
-                    async with sm() as session:
-                        streak = await habit_log_service.get_max_streak(session, user.id)
-                        if streak > 0:
-                            filled = min(10, streak)
-                            bar = "🔥" * min(filled, 10) + "⬜" * max(0, 10 - filled)
-                            streak_text = f"\n{bar} {streak} days"
-                except Exception:
-                    pass
-
-                text = t(lang, "notification_format", title=habit.title, time=time_str) + streak_text
-                if phrase:
-                    text += f"\n\n💬 {phrase}"
+async def purge_fsm_states(bot) -> None:
+    """Hourly: drop FSM conversations abandoned for longer than the TTL."""
+    try:
+        async with get_session_maker()() as session:
+            purged = await fsm_service.purge_expired(session, timedelta(hours=settings.fsm_state_ttl_hours))
+            await session.commit()
+        if purged:
+            logger.info("Expired FSM states purged: %d", purged)
+    except Exception:
+        logger.exception("FSM state purge failed")
 
-                await bot.send_message(
-                    chat_id=user.telegram_id,
-                    text=text,
-                    reply_markup=reminder_buttons(habit.id, lang),
+
+async def _check_user_achievements(sm, bot, check: achievement_check_service.Claim) -> None:
+    """Evaluate one claimed check and remove it in the same transaction; announce
+    unlocks once that has committed.
+
+    A failed evaluation is retried with backoff and dropped after MAX_ATTEMPTS.
+    """
+    try:
+        async with sm() as session:
+            user = await session.get(User, check.user_id)
+            unlocked = []
+            if user is not None:
+                unlocked = await achievement_service.check_achievements(
+                    session, check.user_id, user, trigger=check.triggers
                 )
-            except Exception as e:
-                logger.warning("Reminder send failed user=%s habit=%s: %s", user.telegram_id, habit.id, e)
+            await achievement_check_service.complete(session, check)
+            await session.commit()
+            if unlocked:
+                await achievement_service.notify_unlocked(session, bot, user, unlocked)
+        return
+    except Exception:
+        if check.attempts + 1 >= achievement_check_service.MAX_ATTEMPTS:
+            logger.exception(
+                "Achievement check dropped after %d attempts user_id=%s triggers=%s",
+                check.attempts + 1, check.user_id, check.triggers,
+            )
+        else:
+            logger.warning("Achievement check failed user_id=%s, will retry", check.user_id, exc_info=True)
+    try:
+        async with sm() as session:
+            await achievement_check_service.fail(session, check, datetime.now(UTC))
+            await session.commit()
+    except Exception:
+        # The lease still expires, so the check is retried without the bookkeeping
+        logger.exception("Achievement check retry bookkeeping failed user_id=%s", check.user_id)
 
-    except Exception as e:
-        logger.exception("Reminders job error: %s", e)
 
+@with_priority(REMINDER)
+async def run_achievement_checks(bot) -> None:
+    """Every 5s: lease queued achievement checks in batches, evaluate a few users at a time.
+    Events that arrived for a user since the last tick are coalesced into one check."""
+    try:
+        sm = get_session_maker()
+        limit = asyncio.Semaphore(max(1, settings.achievement_check_concurrency))
+
+        async def bounded(check: achievement_check_service.Claim) -> None:
+            async with limit:
+                await _check_user_achievements(sm, bot, check)
 
-async def run_daily_metrics_recalc(bot) -> None:
-    """Daily 00:05 UTC: recalc user_metrics for all users."""
+        checked = 0
+        while True:
+            async with sm() as session:
+                batch = await achievement_check_service.claim(session, datetime.now(UTC))
+                await session.commit()
+            await asyncio.gather(*(bounded(check) for check in batch))
+            checked += len(batch)
+            if len(batch) < achievement_check_service.BATCH_SIZE:
+                break
+        if checked:
+            logger.info("Achievement checks processed: %d", checked)
+    except Exception:
+        logger.exception("Achievement check job error")
+
+
+async def verify_streaks(bot) -> None:
+    """Every 10 min: recompute one batch of materialized streaks from habit_logs, repair drift."""
+    global _streak_verify_after
     try:
-        from app.services import metrics_service
         sm = get_session_maker()
         async with sm() as session:
-            await metrics_service.recalculate_all_metrics(session, bot)
+            last_id, repaired = await streak_service.verify_batch(session, _streak_verify_after)
             await session.commit()
-        logger.info("Daily metrics recalc completed")
+        _streak_verify_after = last_id or 0
+        if repaired:
+            logger.warning("Streak verifier repaired %d rows (up to user=%s)", repaired, last_id)
+    except Exception:
+        logger.exception("Streak verifier failed")
+
+
+async def run_daily_metrics_recalc(bot) -> None:
+    """Daily 00:05 UTC: bulk recalc of user_metrics, sharded across METRICS_WORKERS processes."""
+    try:
+        from app.services import metrics_service
+        started = datetime.now(UTC)
+        total = await metrics_service.recalculate_all_metrics(
+            get_session_maker(), settings.metrics_workers, settings.metrics_shard_size
+        )
+        elapsed = (datetime.now(UTC) - started).total_seconds()
+        logger.info("Daily metrics recalc completed: %d users in %.1fs", total, elapsed)
     except Exception as e:
         logger.exception("Daily metrics recalc failed: %s", e)
 
 
+async def _notify_payment_expired(bot, payment: crypto_service.ExpiredPayment) -> None:
+    lang = payment.language_code if payment.language_code in ("ru", "en", "ar") else "ru"
+    try:
+        await bot.send_message(chat_id=payment.telegram_id, text=t(lang, "crypto_expired"))
+    except Exception as e:
+        logger.warning("Crypto expiry notify failed user=%s: %s", payment.telegram_id, e)
+    if payment.invoice_message_id:
+        try:
+            await bot.delete_message(chat_id=payment.telegram_id, message_id=payment.invoice_message_id)
+        except Exception:
+            pass
+
+
+@with_priority(REMINDER)
 async def expire_crypto_payments(bot) -> None:
-    """Every 5 min: cancel expired crypto payments, notify user, delete invoice messages."""
-    from datetime import datetime, timezone
-    from sqlalchemy import select
-    from app.models import Payment, User
-    from app.texts import t
+    """Every 5 min: cancel expired crypto payments in one statement, then, after commit,
+    notify the users and delete their invoice messages concurrently."""
     try:
         sm = get_session_maker()
         async with sm() as session:
-            now = datetime.now(timezone.utc)
-            result = await session.execute(
-                select(Payment).where(
-                    Payment.provider == "crypto",
-                    Payment.status.in_(["check", "pending"]),
-                    Payment.expires_at.isnot(None),
-                    Payment.expires_at < now,
-                )
-            )
-            payments = result.scalars().all()
-            for p in payments:
-                p.status = "cancel"
-                if bot:
-                    try:
-                        user = await session.get(User, p.user_id)
-                        if user:
-                            lang = user.language_code if user.language_code in ("ru", "en", "ar") else "ru"
-                            await bot.send_message(chat_id=user.telegram_id, text=t(lang, "crypto_expired"))
-                            if p.invoice_message_id:
-                                await bot.delete_message(chat_id=user.telegram_id, message_id=p.invoice_message_id)
-                    except Exception:
-                        pass
+            expired = await crypto_service.expire_pending(session, datetime.now(UTC))
             await session.commit()
+        await asyncio.gather(*(_notify_payment_expired(bot, p) for p in expired))
+        if expired:
+            logger.info("Crypto payments expired: %d", len(expired))
     except Exception as e:
         logger.exception("Expire crypto payments failed: %s", e)
 
 
+async def _send_expiry_notice(bot, telegram_id: int, lang: str | None, kind: str) -> None:
+    lang = lang if lang in ("ru", "en", "ar") else "ru"
+    try:
+        await bot.send_message(chat_id=telegram_id, text=t(lang, f"premium_expiry_{kind}"))
+    except Exception as e:
+        logger.warning("Premium expiry notify failed user=%s: %s", telegram_id, e)
+
+
+@with_priority(BULK)
 async def check_premium_expiry(bot) -> None:
-    """Daily: notify users whose premium expires in 3 days or 1 day."""
-    from datetime import timedelta
+    """Every PREMIUM_EXPIRY_INTERVAL_MINUTES: warn users whose premium expires in 3 days or
+    1 day, for expiries that entered that horizon since the last run (stored watermark).
+    Each page is claimed in the notice ledger and committed before it is sent."""
     try:
         sm = get_session_maker()
-        now = datetime.now(timezone.utc)
+        now = datetime.now(UTC)
         async with sm() as session:
-            for days_ahead in (3, 1):
-                window_start = now + timedelta(days=days_ahead - 1, hours=23)
-                window_end = now + timedelta(days=days_ahead, hours=1)
-                result = await session.execute(
-                    select(User).where(
-                        User.premium_until.isnot(None),
-                        User.premium_until > window_start,
-                        User.premium_until < window_end,
-                    )
-                )
-                users = result.scalars().all()
-                for user in users:
-                    try:
-                        lang = user.language_code if user.language_code in ("ru", "en", "ar") else "ru"
-                        text_key = "premium_expiry_3d" if days_ahead == 3 else "premium_expiry_1d"
-                        await bot.send_message(
-                            chat_id=user.telegram_id,
-                            text=t(lang, text_key),
-                        )
-                    except Exception as e:
-                        logger.warning("Premium expiry notify failed user=%s: %s", user.telegram_id, e)
-        logger.info("Premium expiry check completed")
+            watermark = await premium_expiry_service.get_watermark(
+                session, now - timedelta(minutes=settings.premium_expiry_interval_minutes)
+            )
+        sent = 0
+        for kind, lo, hi in premium_expiry_service.windows(watermark, now):
+            cursor = None
+            while True:
+                async with sm() as session:
+                    page, cursor = await premium_expiry_service.claim_page(session, kind, lo, hi, cursor)
+                    await session.commit()
+                await asyncio.gather(*(_send_expiry_notice(bot, c.telegram_id, c.language_code, kind) for c in page))
+                sent += len(page)
+                if cursor is None:
+                    break
+        async with sm() as session:
+            await premium_expiry_service.set_watermark(session, now)
+            await premium_expiry_service.prune(session, now)
+            await session.commit()
+        if sent:
+            logger.info("Premium expiry notices sent: %d", sent)
     except Exception as e:
         logger.exception("Premium expiry check failed: %s", e)
 
 
+async def _send_report(bot, telegram_id: int, lang: str | None, done: int, skipped: int) -> int:
+    lang = lang if lang in ("ru", "en", "ar") else "ru"
+    try:
+        await bot.send_message(chat_id=telegram_id, text=weekly_report_service.render(lang, done, skipped))
+        return 1
+    except Exception as e:
+        logger.warning("Weekly report failed user=%s: %s", telegram_id, e)
+        return 0
+
+
+@with_priority(BULK)
 async def send_weekly_report(bot) -> None:
-    """Weekly (Monday 09:00 UTC): send habit completion report to all users."""
-    from datetime import timedelta
-    from sqlalchemy import func
-    from app.models import HabitLog
+    """Every 15 min: deliver last week's report to users with activity, once it is due
+    (Monday 09:00 UTC). Progress is checkpointed, so a restarted run resumes where it stopped."""
     try:
         sm = get_session_maker()
-        now = datetime.now(timezone.utc)
-        week_start = (now - timedelta(days=7)).date()
-
+        now = datetime.now(UTC)
+        week_start = weekly_report_service.week_of(now)
         async with sm() as session:
-            users_result = await session.execute(select(User))
-            users = users_result.scalars().all()
-
-            for user in users:
-                try:
-                    # Count done and skipped for the week
-                    done_count = await session.scalar(
-                        select(func.count()).select_from(HabitLog).where(
-                            HabitLog.user_id == user.id,
-                            HabitLog.status == "done",
-                            HabitLog.log_date >= week_start,
-                        )
-                    ) or 0
-                    skip_count = await session.scalar(
-                        select(func.count()).select_from(HabitLog).where(
-                            HabitLog.user_id == user.id,
-                            HabitLog.status == "skip",
-                            HabitLog.log_date >= week_start,
-                        )
-                    ) or 0
-
-                    total = done_count + skip_count
-                    if total == 0:
-                        continue  # Skip inactive users
-
-                    pct = int((done_count / total) * 100) if total > 0 else 0
-                    filled = min(10, pct // 10)
-                    bar = "🟩" * filled + "⬜" * (10 - filled)
-
-                    lang = user.language_code if user.language_code in ("ru", "en", "ar") else "ru"
-                    text = t(lang, "weekly_report",
-                             done=done_count, skip=skip_count,
-                             pct=pct, bar=bar)
-
-                    await bot.send_message(chat_id=user.telegram_id, text=text)
-                except Exception as e:
-                    logger.warning("Weekly report failed user=%s: %s", user.telegram_id, e)
-
-        logger.info("Weekly reports sent")
+            run = await weekly_report_service.open_run(session, week_start, now)
+            await session.commit()
+        if run is None or run.finished_at is not None:
+            return
+
+        sent = 0
+        async with sm() as reader:
+            async for batch in weekly_report_service.stream_activity(reader, week_start, run.last_user_id):
+                # Concurrent within a batch: the outbound gateway paces bulk sends
+                results = await asyncio.gather(
+                    *(_send_report(bot, tg_id, lang, done, skipped) for _, tg_id, lang, done, skipped in batch)
+                )
+                async with sm() as session:
+                    await weekly_report_service.checkpoint(session, week_start, batch[-1].user_id, sum(results))
+                    await session.commit()
+                sent += sum(results)
+        async with sm() as session:
+            await weekly_report_service.finish(session, week_start)
+            await session.commit()
+        logger.info("Weekly reports for week of %s sent: %d (resumed after user=%s)", week_start, sent, run.last_user_id)
     except Exception as e:
         logger.exception("Weekly report job failed: %s", e)
 
 
+def _leader_only(job):
+    """Periodic jobs run in every replica's scheduler; only the elected leader does the work."""
+
+    @functools.wraps(job)
+    async def wrapper(*args, **kwargs):
+        if get_leader().is_leader:
+            return await job(*args, **kwargs)
+
+    return wrapper
+
+
 def setup_scheduler(bot) -> None:
     sched = get_scheduler()
     sched.add_job(
-        expire_crypto_payments,
+        _leader_only(expire_crypto_payments),
         trigger="interval",
         minutes=5,
         args=(bot,),
@@ -246,7 +351,7 @@ def setup_scheduler(bot) -> None:
         replace_existing=True,
     )
     sched.add_job(
-        run_reminders,
+        _leader_only(run_reminders),
         trigger="interval",
         minutes=1,
         args=(bot,),
@@ -254,22 +359,56 @@ def setup_scheduler(bot) -> None:
         replace_existing=True,
     )
     sched.add_job(
-        run_daily_metrics_recalc,
+        _leader_only(deliver_snoozes),
+        trigger="interval",
+        seconds=30,
+        args=(bot,),
+        id="snooze_delivery",
+        replace_existing=True,
+    )
+    sched.add_job(
+        _leader_only(run_achievement_checks),
+        trigger="interval",
+        seconds=5,
+        args=(bot,),
+        id="achievement_checks",
+        replace_existing=True,
+    )
+    sched.add_job(
+        _leader_only(verify_streaks),
+        trigger="interval",
+        minutes=10,
+        args=(bot,),
+        id="streak_verifier",
+        replace_existing=True,
+    )
+    if settings.fsm_storage != "memory":
+        sched.add_job(
+            _leader_only(purge_fsm_states),
+            trigger="interval",
+            hours=1,
+            args=(bot,),
+            id="fsm_state_purge",
+            replace_existing=True,
+        )
+    sched.add_job(
+        _leader_only(run_daily_metrics_recalc),
         trigger=CronTrigger(hour=0, minute=5),
         args=(bot,),
         id="daily_metrics_recalc",
         replace_existing=True,
     )
     sched.add_job(
-        check_premium_expiry,
-        trigger=CronTrigger(hour=10, minute=0),
+        _leader_only(check_premium_expiry),
+        trigger="interval",
+        minutes=settings.premium_expiry_interval_minutes,
         args=(bot,),
         id="premium_expiry_check",
         replace_existing=True,
     )
     sched.add_job(
-        send_weekly_report,
-        trigger=CronTrigger(day_of_week="mon", hour=9, minute=0),
+        _leader_only(send_weekly_report),
+        trigger=CronTrigger(minute="*/15"),
         args=(bot,),
         id="weekly_report",
         replace_existing=True,
@@ -0,0 +1,153 @@
+"""Achievement check queue — handlers enqueue, a scheduler job evaluates.
+
+One row per user: repeated events only merge their trigger into the row, so a
+burst of taps is evaluated once. Rows are claimed with a lease (UPDATE ...
+SET claimed_until RETURNING, SKIP LOCKED) and deleted only once evaluated, in
+the evaluation's transaction; a crash mid-evaluation leaves the row to be
+handed out again when the lease expires. Failed evaluations are retried with
+backoff and dropped after MAX_ATTEMPTS.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import delete, distinct, func, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import AchievementCheck
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+LEASE = timedelta(minutes=5)  # a claimed check not completed by then is handed out again
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = timedelta(seconds=30)  # after the first failure; doubles with every further one
+
+
+class Claim(NamedTuple):
+    user_id: int
+    triggers: str  # comma-separated
+    version: int
+    attempts: int
+
+
+def merge_triggers(*triggers: str) -> str:
+    """Union of comma-separated trigger lists, sorted: the form stored in the queue."""
+    return ",".join(sorted({name for value in triggers for name in value.split(",") if name}))
+
+
+async def enqueue(session: AsyncSession, user_id: int, trigger: str) -> None:
+    """Queue a check for the user, merging `trigger` into a pending one. Caller commits."""
+    stmt = insert(AchievementCheck).values(user_id=user_id, triggers=merge_triggers(trigger))
+    queued = AchievementCheck.__table__.c.triggers
+    # Same set union as merge_triggers, in SQL, so concurrent enqueues cannot lose a trigger
+    names = (
+        func.unnest(func.string_to_array(queued + "," + stmt.excluded.triggers, ","))
+        .table_valued("name")
+        .render_derived(name="t")
+    )
+    merged = (
+        select(func.string_agg(distinct(names.c.name), aggregate_order_by(literal(","), names.c.name)))
+        .where(names.c.name != "")
+        .scalar_subquery()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"version": AchievementCheck.__table__.c.version + 1, "triggers": merged},
+    )
+    await session.execute(stmt)
+
+
+async def enqueue_guarded(session: AsyncSession, user_id: int, trigger: str) -> None:
+    """enqueue inside a savepoint, for transactions that must commit regardless (payments).
+
+    A failure is logged and rolled back to the savepoint; the caller's work is kept.
+    """
+    try:
+        async with session.begin_nested():
+            await enqueue(session, user_id, trigger)
+    except Exception:
+        logger.warning("Achievement check enqueue failed user_id=%s trigger=%s", user_id, trigger, exc_info=True)
+
+
+async def claim(session: AsyncSession, now: datetime, limit: int = BATCH_SIZE) -> list[Claim]:
+    """Lease up to `limit` queued checks, oldest first. Caller commits before evaluating.
+
+    Checks leased by a running evaluation, or backing off after a failure, are skipped.
+    """
+    queued = (
+        select(AchievementCheck.user_id)
+        .where(or_(AchievementCheck.claimed_until.is_(None), AchievementCheck.claimed_until <= now))
+        .order_by(AchievementCheck.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await session.execute(
+        update(AchievementCheck)
+        .where(AchievementCheck.user_id.in_(queued.scalar_subquery()))
+        .values(claimed_until=now + LEASE)
+        .returning(
+            AchievementCheck.user_id,
+            AchievementCheck.triggers,
+            AchievementCheck.version,
+            AchievementCheck.attempts,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return [Claim(*row) for row in result.all()]
+
+
+async def complete(session: AsyncSession, check: Claim) -> None:
+    """Remove an evaluated check. Call in the evaluation's transaction.
+
+    If triggers were queued since the claim, the row is released instead, so
+    they are evaluated on a later tick.
+    """
+    await _remove(session, check)
+
+
+async def _remove(session: AsyncSession, check: Claim) -> None:
+    """Delete the claimed row unless enqueue has bumped its version; then release it."""
+    result = await session.execute(
+        delete(AchievementCheck).where(
+            AchievementCheck.user_id == check.user_id,
+            AchievementCheck.version == check.version,
+        )
+    )
+    if not result.rowcount:
+        await session.execute(
+            update(AchievementCheck)
+            .where(AchievementCheck.user_id == check.user_id)
+            .values(claimed_until=None, attempts=0)
+        )
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff before the next try of a check that has failed `attempts` times."""
+    return RETRY_BACKOFF * 2 ** (attempts - 1)
+
+
+async def fail(session: AsyncSession, check: Claim, now: datetime) -> bool:
+    """Record a failed evaluation: back off, or drop the check after MAX_ATTEMPTS.
+
+    Returns True if the check was dropped. Triggers queued since the claim are
+    kept and get a fresh set of attempts. Caller commits.
+    """
+    attempts = check.attempts + 1
+    if attempts >= MAX_ATTEMPTS:
+        await _remove(session, check)
+        return True
+    await session.execute(
+        update(AchievementCheck)
+        .where(AchievementCheck.user_id == check.user_id)
+        .values(attempts=attempts, claimed_until=now + retry_delay(attempts))
+    )
+    return False
+
+
+async def queue_depth(session: AsyncSession) -> int:
+    """Users with a pending check."""
+    result = await session.execute(select(func.count()).select_from(AchievementCheck))
+    return result.scalar() or 0
@@ -1,13 +1,16 @@
 """Achievement check and unlock logic."""
 
 import logging
+import zlib
+from collections.abc import Callable
 from datetime import datetime, timezone
 
 from aiogram import Bot
-from sqlalchemy import select, func
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Achievement, User, UserAchievement
+from app.models import Achievement, User, UserAchievement, UserMetrics
 from app.services import metrics_service, referral_service
 
 logger = logging.getLogger(__name__)
@@ -17,67 +20,168 @@ TOTAL_ACHIEVEMENTS = 50
 # Cache for auto-update: telegram_id -> (chat_id, message_id)
 _achievements_screen_cache: dict[int, tuple[int, int]] = {}
 
-CONDITIONS = {
-    "FIRST_STEP": lambda m: m["habits_created"] >= 1,
-    "AWARE_START": lambda m: m["habits_created"] >= 3,
-    "DAY_ARCHITECT": lambda m: m["habits_created"] >= 5,
-    "FULL_CONTROL": lambda m: m.get("profile_completed", False) and m.get("reminders_configured", False),
-    "FIRST_MARK": lambda m: m["completed_total"] >= 1,
-    "ACCELERATION": lambda m: m["completed_total"] >= 5,
-    "FIRST_10": lambda m: m["completed_total"] >= 10,
-    "WEEK_FOCUS": lambda m: m.get("all_habits_one_day", False) and m.get("completed_one_day", 0) > 0,
-    "PERFECT_MONDAY": lambda m: m.get("all_habits_monday", False),
-    "NO_SKIP_3": lambda m: m.get("no_skips_days", 0) >= 3,
-    "STREAK_7": lambda m: m["streak_days"] >= 7,
-    "STREAK_14": lambda m: m["streak_days"] >= 14,
-    "STREAK_21": lambda m: m["streak_days"] >= 21,
-    "STREAK_30": lambda m: m["streak_days"] >= 30,
-    "STREAK_45": lambda m: m["streak_days"] >= 45,
-    "STREAK_60": lambda m: m["streak_days"] >= 60,
-    "STREAK_90": lambda m: m["streak_days"] >= 90,
-    "STREAK_180": lambda m: m["streak_days"] >= 180,
-    "STREAK_365": lambda m: m["streak_days"] >= 365,
-    "PHOENIX": lambda m: m.get("returned_after_skip_days", 0) >= 5,
-    "PERFECT_DAY": lambda m: m.get("perfect_day_count", 0) >= 1,
-    "PERFECT_7": lambda m: m.get("perfect_streak", 0) >= 7,
-    "PERFECT_WEEK": lambda m: m.get("all_habits_7_days", False),
-    "PERFECT_14": lambda m: m.get("perfect_streak", 0) >= 14,
-    "PERFECT_MONTH": lambda m: m.get("perfect_streak", 0) >= 30,
-    "ABSOLUTE": lambda m: m.get("perfect_weeks_in_month", 0) >= 3,
-    "MAXIMALIST": lambda m: m.get("perfect_streak", 0) >= 10,
-    "MARK_50": lambda m: m["completed_total"] >= 50,
-    "MARK_100": lambda m: m["completed_total"] >= 100,
-    "MARK_250": lambda m: m["completed_total"] >= 250,
-    "MARK_500": lambda m: m["completed_total"] >= 500,
-    "MARK_1000": lambda m: m["completed_total"] >= 1000,
-    "SUPERACTIVE": lambda m: m.get("completed_one_day", 0) >= 20,
-    "STRONG_WEEK": lambda m: m.get("completed_7_days", 0) >= 70,
-    "PRODUCTIVE_MONTH": lambda m: m.get("completed_month", 0) >= 300,
-    "FLEXIBLE": lambda m: m.get("habit_changed_streak_ok", False),
-    "GROWTH": lambda m: m.get("habit_goal_increased", False),
-    "MULTIFOCUS": lambda m: m.get("five_habits_14_days", False),
-    "BALANCE": lambda m: m.get("three_categories_30_days", False),
-    "EXPERIMENTER": lambda m: m.get("new_habit_7_days", False),
-    "FIRST_FRIEND": lambda m: m["referrals_count"] >= 1,
-    "TEAM_START": lambda m: m["referrals_count"] >= 3,
-    "AMBASSADOR": lambda m: m["referrals_count"] >= 10,
-    "SUPPORTER_1M": lambda m: m["subscription_months"] >= 1,
-    "CHOICE_3M": lambda m: m["subscription_months"] >= 3,
-    "PLAN_6M": lambda m: m["subscription_months"] >= 6,
-    "INVESTOR_12M": lambda m: m["subscription_months"] >= 12,
-    "TEAM_DISCIPLINE": lambda m: m.get("referrals_streak_7", 0) >= 3,
-    "SOCIAL_DRIVE": lambda m: m.get("synced_with_friend_14", False),
-    "LEADER": lambda m: m.get("referrals_active_30", 0) >= 5,
+# code -> (metric keys the condition reads, condition over metrics_to_dict output)
+CONDITIONS: dict[str, tuple[tuple[str, ...], Callable[[dict], bool]]] = {
+    "FIRST_STEP": (("habits_created",), lambda m: m["habits_created"] >= 1),
+    "AWARE_START": (("habits_created",), lambda m: m["habits_created"] >= 3),
+    "DAY_ARCHITECT": (("habits_created",), lambda m: m["habits_created"] >= 5),
+    "FULL_CONTROL": (
+        ("profile_completed", "reminders_configured"),
+        lambda m: m.get("profile_completed", False) and m.get("reminders_configured", False),
+    ),
+    "FIRST_MARK": (("completed_total",), lambda m: m["completed_total"] >= 1),
+    "ACCELERATION": (("completed_total",), lambda m: m["completed_total"] >= 5),
+    "FIRST_10": (("completed_total",), lambda m: m["completed_total"] >= 10),
+    "WEEK_FOCUS": (
+        ("all_habits_one_day", "completed_one_day"),
+        lambda m: m.get("all_habits_one_day", False) and m.get("completed_one_day", 0) > 0,
+    ),
+    "PERFECT_MONDAY": (("all_habits_monday",), lambda m: m.get("all_habits_monday", False)),
+    "NO_SKIP_3": (("no_skips_days",), lambda m: m.get("no_skips_days", 0) >= 3),
+    "STREAK_7": (("streak_days",), lambda m: m["streak_days"] >= 7),
+    "STREAK_14": (("streak_days",), lambda m: m["streak_days"] >= 14),
+    "STREAK_21": (("streak_days",), lambda m: m["streak_days"] >= 21),
+    "STREAK_30": (("streak_days",), lambda m: m["streak_days"] >= 30),
+    "STREAK_45": (("streak_days",), lambda m: m["streak_days"] >= 45),
+    "STREAK_60": (("streak_days",), lambda m: m["streak_days"] >= 60),
+    "STREAK_90": (("streak_days",), lambda m: m["streak_days"] >= 90),
+    "STREAK_180": (("streak_days",), lambda m: m["streak_days"] >= 180),
+    "STREAK_365": (("streak_days",), lambda m: m["streak_days"] >= 365),
+    "PHOENIX": (("returned_after_skip_days",), lambda m: m.get("returned_after_skip_days", 0) >= 5),
+    "PERFECT_DAY": (("perfect_day_count",), lambda m: m.get("perfect_day_count", 0) >= 1),
+    "PERFECT_7": (("perfect_streak",), lambda m: m.get("perfect_streak", 0) >= 7),
+    "PERFECT_WEEK": (("all_habits_7_days",), lambda m: m.get("all_habits_7_days", False)),
+    "PERFECT_14": (("perfect_streak",), lambda m: m.get("perfect_streak", 0) >= 14),
+    "PERFECT_MONTH": (("perfect_streak",), lambda m: m.get("perfect_streak", 0) >= 30),
+    "ABSOLUTE": (("perfect_weeks_in_month",), lambda m: m.get("perfect_weeks_in_month", 0) >= 3),
+    "MAXIMALIST": (("perfect_streak",), lambda m: m.get("perfect_streak", 0) >= 10),
+    "MARK_50": (("completed_total",), lambda m: m["completed_total"] >= 50),
+    "MARK_100": (("completed_total",), lambda m: m["completed_total"] >= 100),
+    "MARK_250": (("completed_total",), lambda m: m["completed_total"] >= 250),
+    "MARK_500": (("completed_total",), lambda m: m["completed_total"] >= 500),
+    "MARK_1000": (("completed_total",), lambda m: m["completed_total"] >= 1000),
+    "SUPERACTIVE": (("completed_one_day",), lambda m: m.get("completed_one_day", 0) >= 20),
+    "STRONG_WEEK": (("completed_7_days",), lambda m: m.get("completed_7_days", 0) >= 70),
+    "PRODUCTIVE_MONTH": (("completed_month",), lambda m: m.get("completed_month", 0) >= 300),
+    "FLEXIBLE": (("habit_changed_streak_ok",), lambda m: m.get("habit_changed_streak_ok", False)),
+    "GROWTH": (("habit_goal_increased",), lambda m: m.get("habit_goal_increased", False)),
+    "MULTIFOCUS": (("five_habits_14_days",), lambda m: m.get("five_habits_14_days", False)),
+    "BALANCE": (("three_categories_30_days",), lambda m: m.get("three_categories_30_days", False)),
+    "EXPERIMENTER": (("new_habit_7_days",), lambda m: m.get("new_habit_7_days", False)),
+    "FIRST_FRIEND": (("referrals_count",), lambda m: m["referrals_count"] >= 1),
+    "TEAM_START": (("referrals_count",), lambda m: m["referrals_count"] >= 3),
+    "AMBASSADOR": (("referrals_count",), lambda m: m["referrals_count"] >= 10),
+    "SUPPORTER_1M": (("subscription_months",), lambda m: m["subscription_months"] >= 1),
+    "CHOICE_3M": (("subscription_months",), lambda m: m["subscription_months"] >= 3),
+    "PLAN_6M": (("subscription_months",), lambda m: m["subscription_months"] >= 6),
+    "INVESTOR_12M": (("subscription_months",), lambda m: m["subscription_months"] >= 12),
+    "TEAM_DISCIPLINE": (("referrals_streak_7",), lambda m: m.get("referrals_streak_7", 0) >= 3),
+    "SOCIAL_DRIVE": (("synced_with_friend_14",), lambda m: m.get("synced_with_friend_14", False)),
+    "LEADER": (("referrals_active_30",), lambda m: m.get("referrals_active_30", 0) >= 5),
 }
 
+_ALL = None  # trigger evaluates every condition
+
+# Metric keys a trigger can change. Unknown triggers (and "user_returns", which can
+# follow a day rollover) evaluate everything.
+TRIGGER_INPUTS: dict[str, frozenset[str] | None] = {
+    "habit_completed": frozenset({
+        "completed_total", "completed_one_day", "completed_7_days", "completed_month",
+        "streak_days", "no_skips_days", "returned_after_skip_days",
+        "all_habits_one_day", "all_habits_monday", "all_habits_7_days",
+        "perfect_day_count", "perfect_streak", "perfect_weeks_in_month",
+        "five_habits_14_days", "three_categories_30_days", "new_habit_7_days",
+    }),
+    "habit_missed": frozenset({"no_skips_days", "returned_after_skip_days"}),
+    "habit_created": frozenset({
+        "habits_created", "reminders_configured",
+        "all_habits_one_day", "all_habits_monday", "all_habits_7_days",
+        "perfect_day_count", "perfect_streak", "perfect_weeks_in_month",
+    }),
+    "habit_modified": frozenset({"habit_changed_streak_ok", "habit_goal_increased"}),
+    "subscription_purchased": frozenset({"subscription_months"}),
+    "friend_invited": frozenset({
+        "referrals_count", "referrals_streak_7", "synced_with_friend_14", "referrals_active_30",
+    }),
+    "profile_updated": frozenset({"profile_completed", "reminders_configured"}),
+    "user_returns": _ALL,
+}
 
-async def _get_metrics(session: AsyncSession, user_id: int, user: User | None) -> dict:
-    """Get metrics from user_metrics (after recalc) or fallback minimal dict."""
+# Unlocked achievements per user are kept as a bitmask of achievement ids on
+# user_metrics; if any catalog id does not fit a BIGINT the unlocked set is queried.
+# Masks are only ever OR-ed, so each is stamped with the fingerprint of the catalog
+# it was built against; a mask with another fingerprint is rebuilt for that user
+# from user_achievements on their next check.
+MASK_BITS = 63
+
+# Catalog: loaded once per process, detached from the session that loaded it
+_catalog: list[Achievement] | None = None
+_catalog_by_code: dict[str, Achievement] = {}
+_catalog_fits_mask = False
+_catalog_fingerprint = 0
+
+
+def conditions_for(trigger: str) -> list[str]:
+    """Codes whose inputs the trigger can change, in CONDITIONS order.
+
+    `trigger` may list several comma-separated triggers (a coalesced queued check).
+    """
+    changed: set[str] = set()
+    for name in trigger.split(","):
+        inputs = TRIGGER_INPUTS.get(name, _ALL)
+        if inputs is None:
+            return list(CONDITIONS)
+        changed.update(inputs)
+    return [code for code, (inputs, _fn) in CONDITIONS.items() if changed.intersection(inputs)]
+
+
+def catalog_fingerprint(catalog: list[Achievement]) -> int:
+    """Stable 32-bit fingerprint of the catalog's (id, code) pairs."""
+    return zlib.crc32(",".join(f"{a.id}:{a.code}" for a in catalog).encode())
+
+
+def mask_of(achievement_ids) -> int | None:
+    """Bitmask of achievement ids, or None if any id does not fit."""
+    mask = 0
+    for ach_id in achievement_ids:
+        if ach_id >= MASK_BITS:
+            return None
+        mask |= 1 << ach_id
+    return mask
+
+
+async def get_catalog(session: AsyncSession) -> list[Achievement]:
+    """All achievements ordered by id. Cached in memory after the first load."""
+    global _catalog, _catalog_by_code, _catalog_fits_mask, _catalog_fingerprint
+    if _catalog is None:
+        result = await session.execute(select(Achievement).order_by(Achievement.id))
+        catalog = list(result.scalars().unique().all())
+        for a in catalog:
+            session.expunge(a)
+        _catalog, _catalog_by_code = catalog, {a.code: a for a in catalog}
+        _catalog_fits_mask = mask_of(a.id for a in catalog) is not None
+        _catalog_fingerprint = catalog_fingerprint(catalog)
+    return _catalog
+
+
+def invalidate_catalog() -> None:
+    """Drop the cached catalog, e.g. after achievements are edited in the DB."""
+    global _catalog, _catalog_by_code, _catalog_fits_mask
+    _catalog, _catalog_by_code, _catalog_fits_mask = None, {}, False
+
+
+async def _get_metrics(
+    session: AsyncSession, user_id: int, user: User | None
+) -> tuple[dict, UserMetrics | None, bool]:
+    """(metrics dict, stored row, whether it was fully recalculated just now).
+
+    Falls back to a minimal dict (row None) if metrics cannot be loaded.
+    """
     try:
-        await metrics_service.recalculate_user_metrics(session, user_id, user)
-        m = await metrics_service.get_or_create_metrics(session, user_id)
-        await session.refresh(m)
-        return metrics_service.metrics_to_dict(m, user)
+        stored = await session.get(UserMetrics, user_id)
+        recalculated = not metrics_service.is_current(stored, user)
+        m = await metrics_service.get_current_metrics(session, user_id, user)
+        return metrics_service.metrics_to_dict(m, user), m, recalculated
     except Exception as e:
         logger.warning("Metrics recalc failed, using fallback: %s", e)
     referrals = await referral_service.count_referrals(session, user_id)
@@ -88,7 +192,7 @@ async def _get_metrics(session: AsyncSession, user_id: int, user: User | None) -
             pu = pu.replace(tzinfo=timezone.utc)
         if pu > datetime.now(timezone.utc):
             sub_months = max(1, (pu - datetime.now(timezone.utc)).days // 30)
-    return {
+    fallback = {
         "habits_created": 0,
         "completed_total": 0,
         "streak_days": 0,
@@ -116,6 +220,7 @@ async def _get_metrics(session: AsyncSession, user_id: int, user: User | None) -
         "synced_with_friend_14": False,
         "referrals_active_30": 0,
     }
+    return fallback, None, True
 
 
 async def _get_unlocked_ids(session: AsyncSession, user_id: int) -> set[int]:
@@ -125,6 +230,18 @@ async def _get_unlocked_ids(session: AsyncSession, user_id: int) -> set[int]:
     return set(row[0] for row in r.all())
 
 
+async def _unlocked_mask(session: AsyncSession, user_id: int, m: UserMetrics | None) -> int:
+    """Unlocked bitmask from user_metrics, (re)built from user_achievements when it is
+    missing or was built against another catalog."""
+    if m is not None and m.achievements_mask is not None and m.achievements_catalog == _catalog_fingerprint:
+        return m.achievements_mask
+    mask = mask_of(await _get_unlocked_ids(session, user_id)) or 0
+    if m is not None:
+        m.achievements_mask = mask
+        m.achievements_catalog = _catalog_fingerprint
+    return mask
+
+
 async def get_achievement_progress(session: AsyncSession, user_id: int) -> tuple[int, int]:
     """Return (unlocked_count, percent). No caching, always from DB."""
     r = await session.execute(
@@ -199,65 +316,97 @@ async def check_achievements(
     session: AsyncSession,
     user_id: int,
     user: User | None,
-    bot: Bot | None,
-    telegram_id: int | None = None,
     trigger: str = "",
 ) -> list[Achievement]:
-    """Check and unlock achievements. Call AFTER session.commit(). Returns newly unlocked achievements."""
+    """Check and unlock achievements. Returns newly unlocked achievements; caller commits,
+    then announces them with notify_unlocked.
+
+    Only conditions whose metric inputs the trigger can change are evaluated (all of
+    them if metrics were just recalculated); unlocked ones are skipped via the bitmask.
+    Unlocks are written in one INSERT ... ON CONFLICT DO NOTHING and the user gets one
+    combined message, so DB and Bot API work per event is constant.
+    """
     logger.info("Checking achievements for user_id=%s trigger=%s", user_id, trigger or "unknown")
-    result = await session.execute(select(Achievement))
-    all_achievements = {a.code: a for a in result.scalars().unique().all()}
-    unlocked_ids = await _get_unlocked_ids(session, user_id)
-    metrics = await _get_metrics(session, user_id, user)
-    newly_unlocked: list[Achievement] = []
-
-    for code, cond_fn in CONDITIONS.items():
-        ach = all_achievements.get(code)
-        if not ach or ach.id in unlocked_ids:
+    await get_catalog(session)
+    metrics, m, recalculated = await _get_metrics(session, user_id, user)
+    mask = await _unlocked_mask(session, user_id, m) if _catalog_fits_mask else None
+    unlocked_ids = await _get_unlocked_ids(session, user_id) if mask is None else set()
+    codes = list(CONDITIONS) if recalculated else conditions_for(trigger)
+    candidates: list[Achievement] = []
+
+    for code in codes:
+        ach = _catalog_by_code.get(code)
+        if not ach:
             continue
+        if (mask >> ach.id & 1) if mask is not None else ach.id in unlocked_ids:
+            continue
+        _inputs, cond_fn = CONDITIONS[code]
         try:
             if cond_fn(metrics):
-                ua = UserAchievement(user_id=user_id, achievement_id=ach.id)
-                session.add(ua)
-                await session.flush()
-                newly_unlocked.append(ach)
-                if code == "FLEXIBLE":
-                    await metrics_service.reset_flexibility_flags(session, user_id)
-                elif code == "GROWTH":
-                    await metrics_service.reset_growth_flag(session, user_id)
-                logger.info("Unlocked achievement %s for user_id=%s", code, user_id)
-                if bot and telegram_id:
-                    lang = (user.language_code or "ru")[:2].lower()
-                    lang = "ar" if lang == "ar" else ("en" if lang == "en" else "ru")
-                    msg = ach.unlock_msg_ru if lang == "ru" else ach.unlock_msg_en  # ar uses en
-                    name = ach.name_ru if lang == "ru" else ach.name_en  # ar uses en
-                    try:
-                        await bot.send_message(
-                            telegram_id,
-                            f"🏆 {name}\n\n{msg}",
-                        )
-                    except Exception as e:
-                        logger.warning("Failed to send achievement unlock: %s", e)
+                candidates.append(ach)
         except Exception as e:
             logger.warning("Achievement %s check failed: %s", code, e)
 
-    if newly_unlocked and bot and telegram_id and user:
-        try:
-            await refresh_achievements_screen_if_open(bot, session, telegram_id, user_id, user)
-        except Exception as e:
-            logger.debug("Refresh achievements screen failed: %s", e)
+    if not candidates:
+        return []
 
+    # Rows another check already inserted (concurrent event) are not returned
+    result = await session.execute(
+        insert(UserAchievement)
+        .values([{"user_id": user_id, "achievement_id": a.id} for a in candidates])
+        .on_conflict_do_nothing(constraint="uq_user_achievement")
+        .returning(UserAchievement.achievement_id)
+    )
+    inserted = {row[0] for row in result.all()}
+    newly_unlocked = [a for a in candidates if a.id in inserted]
+    if mask is not None and m is not None:
+        m.achievements_mask = mask | (mask_of(a.id for a in candidates) or 0)
+    codes_unlocked = {a.code for a in newly_unlocked}
+    if "FLEXIBLE" in codes_unlocked:
+        await metrics_service.reset_flexibility_flags(session, user_id)
+    if "GROWTH" in codes_unlocked:
+        await metrics_service.reset_growth_flag(session, user_id)
+    if newly_unlocked:
+        logger.info("Unlocked achievements %s for user_id=%s", sorted(codes_unlocked), user_id)
     return newly_unlocked
 
 
+async def notify_unlocked(
+    session: AsyncSession, bot: Bot, user: User, achievements: list[Achievement]
+) -> None:
+    """Announce committed unlocks in one message and refresh an open achievements screen."""
+    if not achievements:
+        return
+    try:
+        text = format_unlock_message(achievements, user.language_code)
+        await bot.send_message(user.telegram_id, text)
+    except Exception as e:
+        logger.warning("Failed to send achievement unlock: %s", e)
+    try:
+        await refresh_achievements_screen_if_open(bot, session, user.telegram_id, user.id, user)
+    except Exception as e:
+        logger.debug("Refresh achievements screen failed: %s", e)
+
+
+def format_unlock_message(achievements: list[Achievement], language_code: str | None) -> str:
+    """One message for all achievements unlocked by an event."""
+    lang = (language_code or "ru")[:2].lower()
+    lang = "ar" if lang == "ar" else ("en" if lang == "en" else "ru")
+    parts = []
+    for ach in achievements:
+        msg = ach.unlock_msg_ru if lang == "ru" else ach.unlock_msg_en  # ar uses en
+        name = ach.name_ru if lang == "ru" else ach.name_en  # ar uses en
+        parts.append(f"🏆 {name}\n\n{msg}")
+    return "\n\n".join(parts)
+
+
 async def get_achievements_with_status(
     session: AsyncSession,
     user_id: int,
     lang: str,
 ) -> list[tuple[int, str, bool]]:
     """Return list of (achievement_id, display_name, unlocked) ordered by id."""
-    result = await session.execute(select(Achievement).order_by(Achievement.id))
-    all_ach = result.scalars().unique().all()
+    all_ach = await get_catalog(session)
     unlocked = await _get_unlocked_ids(session, user_id)
     code = (lang or "ru")[:2].lower()
     code = "ar" if code == "ar" else ("en" if code == "en" else "ru")
@@ -4,6 +4,7 @@ from sqlalchemy import select
 
 from app.db import get_session_maker
 from app.models import User
+from app.services import user_service
 
 
 async def delete_user_full_by_tg_id(tg_id: int) -> bool:
@@ -21,5 +22,6 @@ async def delete_user_full_by_tg_id(tg_id: int) -> bool:
 
         await session.delete(user)
         await session.commit()
+    user_service.invalidate(tg_id)
 
     return True
@@ -7,10 +7,10 @@ import json
 import logging
 import uuid
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, NamedTuple
 
 import httpx
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
@@ -29,6 +29,12 @@ ALLOWED_NETWORKS = frozenset(["TRX-TRC20", "BSC-BEP20", "ETH-ERC20", "TON"])
 NETWORK_LABELS = {"TRX-TRC20": "TRC20", "BSC-BEP20": "BEP20", "ETH-ERC20": "ERC20", "TON": "TON"}
 
 
+class ExpiredPayment(NamedTuple):
+    telegram_id: int
+    language_code: str | None
+    invoice_message_id: int | None
+
+
 def _sign_body(body: dict, api_key: str) -> str:
     """HMAC-SHA256 sign: json -> base64 -> hmac."""
     payload = json.dumps(body, separators=(",", ":"), ensure_ascii=False)
@@ -229,13 +235,8 @@ async def process_crypto_webhook(
                     )
                 except Exception as e:
                     logger.warning("Notify user premium failed: %s", e)
-            from app.services import achievement_service
-            try:
-                await achievement_service.check_achievements(
-                    session, user.id, user, bot, user.telegram_id, trigger="subscription_purchased"
-                )
-            except Exception:
-                pass
+            from app.services import achievement_check_service
+            await achievement_check_service.enqueue_guarded(session, user.id, "subscription_purchased")
         await session.flush()
     elif status == "underpaid":
         if bot and payment.user_id:
@@ -256,3 +257,25 @@ async def process_crypto_webhook(
         await session.flush()
 
     return 200, ""
+
+
+async def expire_pending(session: AsyncSession, now: datetime) -> list[ExpiredPayment]:
+    """Cancel every open crypto payment past expires_at in one UPDATE ... RETURNING.
+
+    Returns what the owners need to be told. Caller commits, then notifies.
+    A payment the webhook marks paid meanwhile fails the re-checked status
+    condition and is left alone.
+    """
+    result = await session.execute(
+        update(Payment)
+        .where(
+            Payment.user_id == User.id,
+            Payment.provider == "crypto",
+            Payment.status.in_(("check", "pending")),
+            Payment.expires_at < now,
+        )
+        .values(status="cancel")
+        .returning(User.telegram_id, User.language_code, Payment.invoice_message_id)
+        .execution_options(synchronize_session=False)
+    )
+    return [ExpiredPayment(*row) for row in result.all()]
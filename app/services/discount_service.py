@@ -6,6 +6,7 @@ from datetime import datetime, timezone, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import User
+from app.services import user_service
 
 DISCOUNT_OPTIONS = [10, 15, 20, 25, 30, 50]
 DURATION_OPTIONS_DAYS = [1, 3, 7, 14, 30, 90]
@@ -57,4 +58,5 @@ async def grant_discount(
     user.discount_given_by = admin_id
     user.discount_created_at = now
     await session.flush()
+    user_service.invalidate(user.telegram_id, session)
     return user
@@ -0,0 +1,65 @@
+"""FSM rows — load, batched save and expiry of conversation state.
+
+One row per aiogram storage key. A key with no state and no data has no row.
+Rows untouched for longer than the TTL are abandoned conversations: reads
+ignore them and purge_expired deletes them.
+"""
+
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import FsmState
+
+NOTIFY_CHANNEL = "fsm_states"
+NOTIFY_KEYS_PER_MESSAGE = 100  # keeps a payload well under the 8000-byte limit
+
+
+def _cutoff(ttl: timedelta) -> datetime:
+    return datetime.now(UTC) - ttl
+
+
+async def load(session: AsyncSession, key: str, ttl: timedelta) -> tuple[str | None, dict[str, Any]]:
+    """(state, data) for key; (None, {}) if missing or expired."""
+    result = await session.execute(
+        select(FsmState.state, FsmState.data).where(FsmState.key == key, FsmState.updated_at > _cutoff(ttl))
+    )
+    row = result.first()
+    return (row[0], dict(row[1] or {})) if row else (None, {})
+
+
+async def save_many(session: AsyncSession, rows: list[tuple[str, str | None, dict[str, Any]]]) -> None:
+    """Write (key, state, data) rows: one upsert for live keys, one delete for cleared ones. Caller commits."""
+    live = [{"key": k, "state": s, "data": d} for k, s, d in rows if s is not None or d]
+    cleared = [k for k, s, d in rows if s is None and not d]
+    if live:
+        stmt = insert(FsmState).values(live)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"state": stmt.excluded.state, "data": stmt.excluded.data, "updated_at": func.now()},
+        )
+        await session.execute(stmt)
+    if cleared:
+        await session.execute(delete(FsmState).where(FsmState.key.in_(cleared)))
+
+
+async def notify(session: AsyncSession, origin: str, keys: list[str]) -> None:
+    """Tell other bot processes to drop these keys from their caches. Sent on commit."""
+    for i in range(0, len(keys), NOTIFY_KEYS_PER_MESSAGE):
+        payload = origin + "|" + "\n".join(keys[i:i + NOTIFY_KEYS_PER_MESSAGE])
+        await session.execute(select(func.pg_notify(NOTIFY_CHANNEL, payload)))
+
+
+def parse_notification(payload: str) -> tuple[str, list[str]]:
+    """(origin, keys) from a notify() payload."""
+    origin, _, keys = payload.partition("|")
+    return origin, keys.split("\n") if keys else []
+
+
+async def purge_expired(session: AsyncSession, ttl: timedelta) -> int:
+    """Delete abandoned conversations. Caller commits."""
+    result = await session.execute(delete(FsmState).where(FsmState.updated_at <= _cutoff(ttl)))
+    return result.rowcount or 0
@@ -6,6 +6,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import HabitLog
+from app.services import streak_service
 
 
 async def has_log_today(
@@ -24,6 +25,23 @@ async def has_log_today(
     return result.scalar_one_or_none() is not None
 
 
+async def get_logged_keys(
+    session: AsyncSession,
+    keys: list[tuple[int, int, date]],
+) -> set[tuple[int, int, date]]:
+    """Subset of (user_id, habit_id, log_date) keys that already have a log. One query."""
+    if not keys:
+        return set()
+    result = await session.execute(
+        select(HabitLog.user_id, HabitLog.habit_id, HabitLog.log_date).where(
+            HabitLog.habit_id.in_({k[1] for k in keys}),
+            HabitLog.log_date.in_({k[2] for k in keys}),
+        )
+    )
+    wanted = set(keys)
+    return {tuple(row) for row in result.all() if tuple(row) in wanted}
+
+
 async def log_done(
     session: AsyncSession,
     habit_id: int,
@@ -33,6 +51,7 @@ async def log_done(
     log = HabitLog(habit_id=habit_id, user_id=user_id, log_date=today, status="done")
     session.add(log)
     await session.flush()
+    await streak_service.record_done(session, user_id, today)
     await session.refresh(log)
     return log
 
@@ -46,6 +65,7 @@ async def log_skipped(
     log = HabitLog(habit_id=habit_id, user_id=user_id, log_date=today, status="skipped")
     session.add(log)
     await session.flush()
+    await streak_service.record_skip(session, user_id, today)
     await session.refresh(log)
     return log
 
@@ -72,28 +92,48 @@ async def count_skipped(session: AsyncSession, user_id: int) -> int:
     return result.scalar() or 0
 
 
-async def get_max_streak(session: AsyncSession, user_id: int) -> int:
-    """Max consecutive days with at least one habit done."""
-    result = await session.execute(
-        select(HabitLog.log_date)
-        .where(HabitLog.user_id == user_id, HabitLog.status == "done")
-        .order_by(HabitLog.log_date.desc())
-    )
-    seen: set[date] = set()
-    dates = []
-    for r in result.all():
-        d = r[0]
-        if d not in seen:
-            seen.add(d)
-            dates.append(d)
-    if not dates:
-        return 0
+def _streak_from_dates(dates_desc: list[date]) -> int:
+    """Consecutive days ending at the most recent date. Input: distinct dates, newest first."""
     streak = 0
     prev = None
-    for d in dates:
+    for d in dates_desc:
         if prev is None or (prev - d).days == 1:
             streak += 1
             prev = d
         else:
             break
     return streak
+
+
+async def get_max_streak(session: AsyncSession, user_id: int) -> int:
+    """Current streak: consecutive done days ending at the last done date. O(1) via user_streaks."""
+    state = await streak_service.get_state(session, user_id)
+    return state.current_streak
+
+
+async def get_max_streaks(session: AsyncSession, user_ids: list[int]) -> dict[int, int]:
+    """get_max_streak for many users. Users without done logs map to 0.
+
+    Reads user_streaks; users not yet materialized fall back to their log history.
+    """
+    streaks = {uid: 0 for uid in user_ids}
+    if not user_ids:
+        return streaks
+    states = await streak_service.get_states(session, user_ids)
+    for uid, state in states.items():
+        streaks[uid] = state.current_streak
+    missing = set(user_ids) - states.keys()
+    if not missing:
+        return streaks
+    result = await session.execute(
+        select(HabitLog.user_id, HabitLog.log_date)
+        .where(HabitLog.user_id.in_(missing), HabitLog.status == "done")
+        .distinct()
+        .order_by(HabitLog.user_id, HabitLog.log_date.desc())
+    )
+    by_user: dict[int, list[date]] = {}
+    for uid, d in result.all():
+        by_user.setdefault(uid, []).append(d)
+    for uid, dates in by_user.items():
+        streaks[uid] = _streak_from_dates(dates)
+    return streaks
@@ -6,6 +6,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Habit, HabitTime
+from app.services import metrics_service, reminder_index_service
 
 
 def _parse_time(s: str) -> time:
@@ -33,6 +34,7 @@ async def create(
             ht = HabitTime(habit_id=habit.id, weekday=wd, time=_parse_time(t))
             session.add(ht)
     await session.flush()
+    await reminder_index_service.reindex_habit(session, habit.id)
     await session.refresh(habit)
     return habit
 
@@ -69,11 +71,15 @@ async def update_habit_times(
             ht = HabitTime(habit_id=habit_id, weekday=wd, time=_parse_time(t))
             session.add(ht)
     await session.flush()
+    await reminder_index_service.reindex_habit(session, habit_id)
 
 
 async def delete_habit(session: AsyncSession, habit: Habit) -> None:
+    user_id = habit.user_id
     await session.delete(habit)
     await session.flush()
+    # Its logs are gone (cascade): counters and archived history must be rebuilt
+    await metrics_service.invalidate_metrics(session, user_id)
 
 
 async def count_user_habits(session: AsyncSession, user_id: int) -> int:
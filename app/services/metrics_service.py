@@ -1,26 +1,37 @@
 """User metrics — computation and persistence for achievements."""
 
+import asyncio
 import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, datetime, timedelta, timezone
+from multiprocessing import get_context
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import select, func, delete
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
-from app.models import Habit, HabitLog, HabitTime, Referral, User, UserMetrics
+from app.config import settings
+from app.models import Habit, HabitLog, HabitTime, Referral, User, UserMetrics, UserStreak
+from app.services import streak_service
 
 logger = logging.getLogger(__name__)
 
 
-def _user_today(user: User) -> date:
-    tz_name = user.timezone or "UTC"
+def _today_in(tz_name: str | None) -> date:
     try:
-        tz = ZoneInfo(tz_name)
+        tz = ZoneInfo(tz_name or "UTC")
     except Exception:
         tz = timezone.utc
     return datetime.now(tz).date()
 
 
+def user_today(user: User) -> date:
+    """The user's current calendar day: the day metrics, logs and streaks are kept in."""
+    return _today_in(user.timezone)
+
+
 def _user_now(user: User) -> datetime:
     tz_name = user.timezone or "UTC"
     try:
@@ -39,254 +50,578 @@ async def get_or_create_metrics(session: AsyncSession, user_id: int) -> UserMetr
     return m
 
 
+# Days older than this are folded into the archived_* aggregate on user_metrics.
+# Covers the longest lookback below (365-day no-miss streak) plus a current month.
+WINDOW_DAYS = 400
+
+# Users per chunk of the nightly bulk pass (one transaction each)
+METRICS_CHUNK_SIZE = 500
+
+# Per-day stats: (done logs, distinct habits done, distinct active habits done, any skip)
+DayStats = tuple[int, int, int, bool]
+
+# (archived_through, completions, perfect days, last perfect date, perfect run ending there)
+Archive = tuple[date | None, int, int, date | None, int]
+
+
+def _is_perfect(stats: DayStats | None, habits_count: int) -> bool:
+    """Every active habit has at least one done log that day."""
+    return habits_count > 0 and stats is not None and stats[2] >= habits_count
+
+
+def fold_archive(
+    archive: Archive,
+    days: dict[date, DayStats],
+    cutoff: date,
+    habits_count: int,
+) -> Archive:
+    """Move days <= cutoff out of `days` into the archive. Perfect days are judged
+    against the habits active at fold time and stay frozen afterwards."""
+    through, completions, perfect_days, last_perfect, run = archive
+    if through is not None and cutoff <= through:
+        return archive
+    for d in sorted(d for d in days if d <= cutoff):
+        stats = days.pop(d)
+        completions += stats[0]
+        if _is_perfect(stats, habits_count):
+            perfect_days += 1
+            run = run + 1 if last_perfect is not None and (d - last_perfect).days == 1 else 1
+            last_perfect = d
+    return cutoff, completions, perfect_days, last_perfect, run
+
+
+def compute_log_metrics(
+    days: dict[date, DayStats],
+    habits_count: int,
+    today: date,
+    archive: Archive,
+) -> dict[str, int | bool]:
+    """Every log-derived UserMetrics field from per-day stats of the window plus the archive."""
+    _through, archived_completions, archived_perfect, last_perfect, run = archive
+
+    def done_since(start: date) -> int:
+        return sum(s[0] for d, s in days.items() if d >= start)
+
+    # Consecutive days with no skips, counting days with a done (back from today, max 365)
+    no_misses = 0
+    for i in range(365):
+        stats = days.get(today - timedelta(days=i))
+        if stats is not None and stats[3]:
+            break
+        if stats is not None and stats[0] > 0:
+            no_misses += 1
+
+    perfect_dates = sorted(d for d, s in days.items() if s[0] > 0 and _is_perfect(s, habits_count))
+    for d in perfect_dates:
+        run = run + 1 if last_perfect is not None and (d - last_perfect).days == 1 else 1
+        last_perfect = d
+
+    # Perfect weeks in current month: week blocks from the 1st that end inside the month
+    month_start = date(today.year, today.month, 1)
+    perfect_weeks = 0
+    for w in range(5):
+        week_start = month_start + timedelta(days=w * 7)
+        if week_start.month != today.month:
+            break
+        week_perfect = True
+        for i in range(7):
+            d = week_start + timedelta(days=i)
+            if d > today or d.month != today.month:
+                break
+            if not _is_perfect(days.get(d), habits_count):
+                week_perfect = False
+                break
+        if week_perfect and (week_start + timedelta(days=6)).month == today.month:
+            perfect_weeks += 1
+
+    # MULTI_FOCUS: min distinct habits done per day over 14 days
+    min_habits = min((days.get(today - timedelta(days=i)) or (0, 0, 0, False))[1] for i in range(14))
+
+    return {
+        "total_completions": archived_completions + done_since(date.min),
+        "completions_today": (days.get(today) or (0, 0, 0, False))[0],
+        "completions_last_7_days": done_since(today - timedelta(days=7)),
+        "completions_last_30_days": done_since(today - timedelta(days=30)),
+        "streak_no_misses": no_misses,
+        "all_habits_completed_today": _is_perfect(days.get(today), habits_count),
+        "all_habits_completed_7_days": all(
+            _is_perfect(days.get(today - timedelta(days=i)), habits_count) for i in range(7)
+        ),
+        "perfect_days_total": archived_perfect + len(perfect_dates),
+        "perfect_days_streak": run if last_perfect is not None else 0,
+        "perfect_weeks_in_month": perfect_weeks,
+        "habits_completed_daily": min_habits if min_habits >= 5 else 0,
+    }
+
+
+def _subscription_months(user: User | None) -> int:
+    if not user or not user.premium_until:
+        return 0
+    pu = user.premium_until
+    if pu.tzinfo is None:
+        pu = pu.replace(tzinfo=timezone.utc)
+    now = datetime.now(timezone.utc)
+    return max(1, (pu - now).days // 30) if pu > now else 0
+
+
+def _returned_after_miss(prev: int, last_done: date | None, last_skip: date | None) -> int:
+    """Returned after miss: if user had 5+ days of skips then came back. Kept otherwise."""
+    if not (last_skip and last_done):
+        return 0
+    if last_done > last_skip and (last_done - last_skip).days >= 5:
+        return (last_done - last_skip).days
+    return prev
+
+
+def _apply_streak(m: UserMetrics, streak: UserStreak) -> None:
+    """Streak and last done/skip dates are materialized on write, see streak_service."""
+    m.streak_days = streak.current_streak
+    m.returned_after_miss_days = _returned_after_miss(
+        m.returned_after_miss_days or 0, streak.last_done_date, streak.last_skip_date
+    )
+
+
+async def _load_day_stats(
+    session: AsyncSession,
+    user_id: int,
+    active_ids: list[int],
+    after: date | None,
+) -> dict[date, DayStats]:
+    """Per-day aggregates of the user's logs newer than `after`. One GROUP BY query."""
+    done = HabitLog.status == "done"
+    stmt = (
+        select(
+            HabitLog.log_date,
+            func.count().filter(done),
+            func.count(func.distinct(HabitLog.habit_id)).filter(done),
+            func.count(func.distinct(HabitLog.habit_id)).filter(done, HabitLog.habit_id.in_(active_ids)),
+            func.count().filter(HabitLog.status == "skipped"),
+        )
+        .where(HabitLog.user_id == user_id)
+        .group_by(HabitLog.log_date)
+    )
+    if after is not None:
+        stmt = stmt.where(HabitLog.log_date > after)
+    result = await session.execute(stmt)
+    return {
+        d: (done_n or 0, distinct_n or 0, active_n or 0, (skipped_n or 0) > 0)
+        for d, done_n, distinct_n, active_n, skipped_n in result.all()
+    }
+
+
 async def recalculate_user_metrics(
     session: AsyncSession,
     user_id: int,
     user: User | None = None,
 ) -> UserMetrics:
-    """Full recalculation from habit_logs, habits, referrals. Uses user timezone if provided."""
+    """Full recalculation from habit_logs, habits, referrals. Uses user timezone if provided.
+
+    A constant number of queries: logs arrive as one row per day for the last
+    WINDOW_DAYS; older days live in the archived_* aggregate on the metrics row.
+    """
     if user is None:
         user = await session.get(User, user_id)
     m = await get_or_create_metrics(session, user_id)
-    today = _user_today(user) if user else date.today()
-    tz_name = (user.timezone or "UTC") if user else "UTC"
-
-    # Total completions
-    r = await session.execute(
-        select(func.count()).select_from(HabitLog).where(
-            HabitLog.user_id == user_id, HabitLog.status == "done"
-        )
-    )
-    m.total_completions = r.scalar() or 0
+    today = user_today(user) if user else date.today()
 
-    # Habits count
-    r = await session.execute(
-        select(func.count()).select_from(Habit).where(
-            Habit.user_id == user_id, Habit.is_active == True
-        )
-    )
-    habits_count = r.scalar() or 0
+    r = await session.execute(select(Habit.id).where(Habit.user_id == user_id, Habit.is_active == True))
+    active_ids = [row[0] for row in r.all()]
+    habits_count = len(active_ids)
     m.habits_created = habits_count
 
-    # Referrals
     r = await session.execute(
         select(func.count()).select_from(Referral).where(Referral.referrer_id == user_id)
     )
     m.invited_friends = r.scalar() or 0
 
-    # Subscription months
-    sub_months = 0
-    if user and user.premium_until:
-        pu = user.premium_until
-        if pu.tzinfo is None:
-            pu = pu.replace(tzinfo=timezone.utc)
-        now = datetime.now(timezone.utc)
-        if pu > now:
-            sub_months = max(1, (pu - now).days // 30)
-    m.subscription_months = sub_months
-
-    # Completions today, last 7, last 30
+    m.subscription_months = _subscription_months(user)
+
+    archive: Archive = (
+        m.archived_through,
+        m.archived_completions or 0,
+        m.archived_perfect_days or 0,
+        m.archived_last_perfect,
+        m.archived_perfect_run or 0,
+    )
+    days = await _load_day_stats(session, user_id, active_ids, archive[0])
+    archive = fold_archive(archive, days, today - timedelta(days=WINDOW_DAYS), habits_count)
+    (
+        m.archived_through,
+        m.archived_completions,
+        m.archived_perfect_days,
+        m.archived_last_perfect,
+        m.archived_perfect_run,
+    ) = archive
+    for field, value in compute_log_metrics(days, habits_count, today, archive).items():
+        setattr(m, field, value)
+
+    _apply_streak(m, await streak_service.get_state(session, user_id))
+    m.metrics_date = today
+
+    await session.flush()
+    return m
+
+
+def build_metrics_row(
+    user_id: int,
+    today: date,
+    habits_count: int,
+    referrals: int,
+    subscription_months: int,
+    days: dict[date, DayStats],
+    archive: Archive,
+    streak: tuple[int, date | None, date | None] | None,
+    prev_returned: int,
+) -> dict:
+    """Column values recomputed by the bulk pass for one user.
+
+    streak is (current, last_done, last_skip) from user_streaks; for users not yet
+    materialized the current run is taken from the window (gaps-and-islands over done days).
+    """
+    archive = fold_archive(archive, days, today - timedelta(days=WINDOW_DAYS), habits_count)
+    if streak is None:
+        done_days = [d for d, stats in days.items() if stats[0] > 0]
+        skip_days = [d for d, stats in days.items() if stats[3]]
+        current, _longest, last_done = streak_service.streak_state(done_days)
+        streak = (current, last_done, max(skip_days, default=None))
+    row = compute_log_metrics(days, habits_count, today, archive)
+    row.update(
+        user_id=user_id,
+        habits_created=habits_count,
+        invited_friends=referrals,
+        subscription_months=subscription_months,
+        streak_days=streak[0],
+        returned_after_miss_days=_returned_after_miss(prev_returned, streak[1], streak[2]),
+        metrics_date=today,
+        archived_through=archive[0],
+        archived_completions=archive[1],
+        archived_perfect_days=archive[2],
+        archived_last_perfect=archive[3],
+        archived_perfect_run=archive[4],
+    )
+    return row
+
+
+async def build_metrics_rows(
+    session: AsyncSession,
+    after_user_id: int,
+    limit: int,
+    upto_user_id: int | None = None,
+) -> tuple[list[int], list[dict]]:
+    """Metric rows for up to `limit` users with after_user_id < id <= upto_user_id.
+
+    Six set-based queries regardless of chunk size or history; no writes.
+    Returns (user ids in order, rows for upsert_metrics_rows).
+    """
+    stmt = select(User.id, User.timezone, User.premium_until).where(User.id > after_user_id)
+    if upto_user_id is not None:
+        stmt = stmt.where(User.id <= upto_user_id)
+    r = await session.execute(stmt.order_by(User.id).limit(limit))
+    users = r.all()
+    if not users:
+        return [], []
+    ids = [u.id for u in users]
+
     r = await session.execute(
-        select(func.count()).select_from(HabitLog).where(
-            HabitLog.user_id == user_id,
-            HabitLog.status == "done",
-            HabitLog.log_date == today,
-        )
+        select(
+            UserMetrics.user_id,
+            UserMetrics.archived_through,
+            UserMetrics.archived_completions,
+            UserMetrics.archived_perfect_days,
+            UserMetrics.archived_last_perfect,
+            UserMetrics.archived_perfect_run,
+            UserMetrics.returned_after_miss_days,
+        ).where(UserMetrics.user_id.in_(ids))
     )
-    m.completions_today = r.scalar() or 0
+    stored = {row[0]: (tuple(row[1:6]), row[6] or 0) for row in r.all()}
 
-    d7 = today - timedelta(days=7)
     r = await session.execute(
-        select(func.count()).select_from(HabitLog).where(
-            HabitLog.user_id == user_id,
-            HabitLog.status == "done",
-            HabitLog.log_date >= d7,
-        )
+        select(Habit.user_id, func.count())
+        .where(Habit.user_id.in_(ids), Habit.is_active == True)
+        .group_by(Habit.user_id)
     )
-    m.completions_last_7_days = r.scalar() or 0
+    habit_counts = dict(r.all())
 
-    d30 = today - timedelta(days=30)
     r = await session.execute(
-        select(func.count()).select_from(HabitLog).where(
-            HabitLog.user_id == user_id,
-            HabitLog.status == "done",
-            HabitLog.log_date >= d30,
-        )
+        select(Referral.referrer_id, func.count())
+        .where(Referral.referrer_id.in_(ids))
+        .group_by(Referral.referrer_id)
     )
-    m.completions_last_30_days = r.scalar() or 0
+    referrals = dict(r.all())
 
-    # Streak: consecutive days with at least one done (desc from today)
     r = await session.execute(
-        select(HabitLog.log_date)
-        .where(HabitLog.user_id == user_id, HabitLog.status == "done")
-        .distinct()
-        .order_by(HabitLog.log_date.desc())
+        select(
+            UserStreak.user_id,
+            UserStreak.current_streak,
+            UserStreak.last_done_date,
+            UserStreak.last_skip_date,
+        ).where(UserStreak.user_id.in_(ids))
     )
-    done_dates = sorted(set(row[0] for row in r.all()), reverse=True)
-    streak_days = 0
-    prev = None
-    for d in done_dates:
-        if prev is None or (prev - d).days == 1:
-            streak_days += 1
-            prev = d
-        else:
-            break
-    m.streak_days = streak_days
+    streaks = {row[0]: tuple(row[1:]) for row in r.all()}
 
-    # Streak no misses: consecutive days with no skips
+    # Per (user, day) aggregates newer than each user's archive cutoff
+    done = HabitLog.status == "done"
     r = await session.execute(
-        select(HabitLog.log_date)
-        .where(HabitLog.user_id == user_id, HabitLog.status == "skipped")
-        .distinct()
+        select(
+            HabitLog.user_id,
+            HabitLog.log_date,
+            func.count().filter(done),
+            func.count(func.distinct(HabitLog.habit_id)).filter(done),
+            func.count(func.distinct(HabitLog.habit_id)).filter(done, Habit.is_active == True),
+            func.count().filter(HabitLog.status == "skipped"),
+        )
+        .join(Habit, Habit.id == HabitLog.habit_id)
+        .outerjoin(UserMetrics, UserMetrics.user_id == HabitLog.user_id)
+        .where(
+            HabitLog.user_id.in_(ids),
+            or_(UserMetrics.archived_through.is_(None), HabitLog.log_date > UserMetrics.archived_through),
+        )
+        .group_by(HabitLog.user_id, HabitLog.log_date)
     )
-    skip_dates = set(row[0] for row in r.all())
-    streak_no_misses = 0
-    d = today
-    for _ in range(365):
-        if d in skip_dates:
-            break
-        r2 = await session.execute(
-            select(func.count()).select_from(HabitLog).where(
-                HabitLog.user_id == user_id, HabitLog.status == "done", HabitLog.log_date == d
+    days: dict[int, dict[date, DayStats]] = {uid: {} for uid in ids}
+    for uid, d, done_n, distinct_n, active_n, skipped_n in r.all():
+        days[uid][d] = (done_n or 0, distinct_n or 0, active_n or 0, (skipped_n or 0) > 0)
+
+    rows = []
+    for u in users:
+        archive, prev_returned = stored.get(u.id, ((None, 0, 0, None, 0), 0))
+        rows.append(
+            build_metrics_row(
+                u.id,
+                _today_in(u.timezone),
+                habit_counts.get(u.id, 0),
+                referrals.get(u.id, 0),
+                _subscription_months(u),
+                days[u.id],
+                (archive[0], archive[1] or 0, archive[2] or 0, archive[3], archive[4] or 0),
+                streaks.get(u.id),
+                prev_returned,
             )
         )
-        if (r2.scalar() or 0) > 0:
-            streak_no_misses += 1
-        d -= timedelta(days=1)
-    m.streak_no_misses = streak_no_misses
-
-    # Perfect day: all active habits have at least one done log that day
-    async def is_perfect_day(d: date) -> bool:
-        r_habits = await session.execute(
-            select(Habit.id).where(Habit.user_id == user_id, Habit.is_active == True)
+
+    return ids, rows
+
+
+async def upsert_metrics_rows(session: AsyncSession, rows: list[dict]) -> None:
+    """Write bulk rows into user_metrics, METRICS_CHUNK_SIZE per statement.
+    Event flags (habit_modified, ...) are not in the rows and stay as they are."""
+    for i in range(0, len(rows), METRICS_CHUNK_SIZE):
+        batch = rows[i:i + METRICS_CHUNK_SIZE]
+        stmt = insert(UserMetrics).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={col: stmt.excluded[col] for col in batch[0] if col != "user_id"},
         )
-        habit_ids = [row[0] for row in r_habits.all()]
-        if not habit_ids:
-            return False
-        for hid in habit_ids:
-            r_done = await session.execute(
-                select(func.count()).select_from(HabitLog).where(
-                    HabitLog.habit_id == hid,
-                    HabitLog.user_id == user_id,
-                    HabitLog.status == "done",
-                    HabitLog.log_date == d,
-                )
-            )
-            if (r_done.scalar() or 0) == 0:
-                return False
-        return True
-
-    m.all_habits_completed_today = await is_perfect_day(today) if habits_count > 0 else False
-    m.all_habits_completed_7_days = True
-    for i in range(7):
-        d = today - timedelta(days=i)
-        if not await is_perfect_day(d):
-            m.all_habits_completed_7_days = False
-            break
+        await session.execute(stmt)
 
-    # Perfect days total and streak
-    perfect_dates = []
-    for d in done_dates:
-        if await is_perfect_day(d):
-            perfect_dates.append(d)
-    m.perfect_days_total = len(perfect_dates)
-    perfect_streak = 0
-    prev = None
-    for d in perfect_dates:
-        if prev is None or (prev - d).days == 1:
-            perfect_streak += 1
-            prev = d
-        else:
-            break
-    m.perfect_days_streak = perfect_streak
 
-    # Perfect weeks in current month
-    now = _user_now(user) if user else datetime.now()
-    month_start = date(now.year, now.month, 1)
-    perfect_weeks = 0
-    for w in range(5):
-        week_start = month_start + timedelta(days=w * 7)
-        if week_start.month != now.month:
-            break
-        week_perfect = True
-        for d in range(7):
-            d_date = week_start + timedelta(days=d)
-            if d_date > today or d_date.month != now.month:
-                break
-            if not await is_perfect_day(d_date):
-                week_perfect = False
+async def recalculate_metrics_chunk(
+    session: AsyncSession,
+    after_user_id: int = 0,
+    limit: int = METRICS_CHUNK_SIZE,
+) -> tuple[int | None, int]:
+    """Bulk recalculation for up to `limit` users with id > after_user_id, in this process.
+
+    Returns (last user id of the chunk or None when past the end, users written).
+    """
+    ids, rows = await build_metrics_rows(session, after_user_id, limit)
+    if not ids:
+        return None, 0
+    await upsert_metrics_rows(session, rows)
+    return ids[-1], len(rows)
+
+
+async def shard_bounds(session: AsyncSession, shard_size: int) -> list[tuple[int, int | None]]:
+    """Split users into (after_id, upto_id] ranges of shard_size users; the last is open-ended."""
+    numbered = select(User.id, func.row_number().over(order_by=User.id).label("rn")).subquery()
+    r = await session.execute(
+        select(numbered.c.id).where(numbered.c.rn % shard_size == 0).order_by(numbered.c.id)
+    )
+    bounds: list[tuple[int, int | None]] = []
+    after = 0
+    for (upto,) in r.all():
+        bounds.append((after, upto))
+        after = upto
+    bounds.append((after, None))
+    return bounds
+
+
+async def _pull_shard(after_user_id: int, upto_user_id: int | None, shard_size: int) -> list[dict]:
+    engine = create_async_engine(settings.database_url, pool_size=1, max_overflow=0)
+    try:
+        async with async_sessionmaker(engine, class_=AsyncSession)() as session:
+            _ids, rows = await build_metrics_rows(session, after_user_id, shard_size, upto_user_id)
+            return rows
+    finally:
+        await engine.dispose()
+
+
+def _shard_worker(after_user_id: int, upto_user_id: int | None, shard_size: int) -> list[dict]:
+    """Process-pool entry point: own event loop and one DB connection, reads only."""
+    return asyncio.run(_pull_shard(after_user_id, upto_user_id, shard_size))
+
+
+async def recalculate_all_metrics(
+    session_maker: async_sessionmaker[AsyncSession],
+    workers: int,
+    shard_size: int = METRICS_CHUNK_SIZE,
+) -> int:
+    """Nightly recalculation of every user's metrics. Returns users written.
+
+    workers > 0: shards of shard_size users (by id range) are pulled and computed
+    in a process pool, so the CPU work stays off the bot's event loop; this process
+    only upserts finished shards, one transaction each. workers == 0: keyset chunks
+    in this process.
+    """
+    started = time.monotonic()
+    total = 0
+    if workers <= 0:
+        after = 0
+        while True:
+            async with session_maker() as session:
+                last_id, written = await recalculate_metrics_chunk(session, after, shard_size)
+                await session.commit()
+            if last_id is None:
                 break
-        if week_perfect and (week_start + timedelta(days=6)).month == now.month:
-            perfect_weeks += 1
-    m.perfect_weeks_in_month = perfect_weeks
-
-    # Returned after miss: if user had 5+ days of skips then came back
-    if skip_dates and done_dates:
-        last_skip = max(skip_dates)
-        last_done = done_dates[0]
-        if last_done > last_skip:
-            gap = (last_done - last_skip).days
-            if gap >= 5:
-                m.returned_after_miss_days = gap
-    else:
-        m.returned_after_miss_days = 0
-
-    # MULTI_FOCUS: 5+ habits completed each day for 14 days - min count over 14 days
-    min_habits = 999
-    for i in range(14):
-        d = today - timedelta(days=i)
-        r_h = await session.execute(
-            select(func.count(func.distinct(HabitLog.habit_id)))
-            .select_from(HabitLog)
-            .where(
-                HabitLog.user_id == user_id,
-                HabitLog.status == "done",
-                HabitLog.log_date == d,
+            after, total = last_id, total + written
+        return total
+
+    async with session_maker() as session:
+        bounds = await shard_bounds(session, shard_size)
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        shards = [
+            loop.run_in_executor(pool, _shard_worker, after, upto, shard_size)
+            for after, upto in bounds
+        ]
+        for done, shard in enumerate(asyncio.as_completed(shards), start=1):
+            rows = await shard
+            if rows:
+                async with session_maker() as session:
+                    await upsert_metrics_rows(session, rows)
+                    await session.commit()
+            total += len(rows)
+            elapsed = time.monotonic() - started
+            logger.info(
+                "Metrics shard %d/%d: %d users, %d total, %.0f users/s",
+                done, len(bounds), len(rows), total, total / elapsed if elapsed else 0,
             )
+    return total
+
+
+async def _current(session: AsyncSession, user_id: int, today: date) -> UserMetrics | None:
+    """Metrics row if its today-relative fields are valid for `today`, else None."""
+    m = await session.get(UserMetrics, user_id)
+    if m is None or m.metrics_date != today:
+        return None
+    return m
+
+
+async def _today_done_counts(session: AsyncSession, user_id: int, today: date) -> tuple[int, int]:
+    """(distinct active habits done today, distinct habits done today)."""
+    r = await session.execute(
+        select(
+            func.count(func.distinct(HabitLog.habit_id)).filter(Habit.is_active == True),
+            func.count(func.distinct(HabitLog.habit_id)),
         )
-        cnt = r_h.scalar() or 0
-        min_habits = min(min_habits, cnt)
-    m.habits_completed_daily = min_habits if min_habits >= 5 else 0
+        .join(Habit, Habit.id == HabitLog.habit_id)
+        .where(HabitLog.user_id == user_id, HabitLog.status == "done", HabitLog.log_date == today)
+    )
+    active_done, distinct_done = r.one()
+    return active_done or 0, distinct_done or 0
 
-    await session.flush()
+
+def is_current(m: UserMetrics | None, user: User | None) -> bool:
+    """Stored row exists and its today-relative fields refer to the user's today."""
+    return m is not None and m.metrics_date == (user_today(user) if user else date.today())
+
+
+async def get_current_metrics(session: AsyncSession, user_id: int, user: User | None) -> UserMetrics:
+    """Stored metrics, fully recalculated only if missing or computed for another day."""
+    if user is None:
+        user = await session.get(User, user_id)
+    m = await _current(session, user_id, user_today(user) if user else date.today())
+    if m is None:
+        return await recalculate_user_metrics(session, user_id, user)
+    m.subscription_months = _subscription_months(user)  # premium changes in many places; no query
     return m
 
 
-async def recalculate_all_metrics(session: AsyncSession, bot=None) -> None:
-    """Recalc metrics for all users. Called by daily job."""
-    r = await session.execute(select(User))
-    users = r.scalars().unique().all()
-    for user in users:
-        try:
-            await recalculate_user_metrics(session, user.id, user)
-        except Exception as e:
-            logger.warning("Recalc metrics failed user=%s: %s", user.id, e)
-    await session.flush()
+async def invalidate_metrics(session: AsyncSession, user_id: int) -> None:
+    """Force a full recalculation from all history on next read (e.g. logs were deleted)."""
+    m = await session.get(UserMetrics, user_id)
+    if m:
+        m.metrics_date = None
+        m.archived_through = None
+        m.archived_completions = 0
+        m.archived_perfect_days = 0
+        m.archived_last_perfect = None
+        m.archived_perfect_run = 0
+        await session.flush()
 
 
 async def update_metrics_on_habit_done(
     session: AsyncSession, user_id: int, user: User, today: date
 ) -> UserMetrics:
-    """Incremental update after habit completed. Then full recalc for accuracy."""
-    return await recalculate_user_metrics(session, user_id, user)
+    """Delta update after a done log for `today` (user_today). Call after log_done, before commit.
+
+    Counters and streaks move in place. A completion that makes the day perfect or
+    reaches five habits in a day affects multi-day fields and triggers a full recalc.
+    """
+    m = await _current(session, user_id, today)
+    if m is None or today != user_today(user):
+        return await recalculate_user_metrics(session, user_id, user)
+    streak = await streak_service.get_state(session, user_id)
+    if m.completions_today == 0 and streak.last_skip_date != today:
+        m.streak_no_misses += 1
+    m.total_completions += 1
+    m.completions_today += 1
+    m.completions_last_7_days += 1
+    m.completions_last_30_days += 1
+    _apply_streak(m, streak)
+    active_done, distinct_done = await _today_done_counts(session, user_id, today)
+    if (m.habits_created and active_done >= m.habits_created) or distinct_done >= 5:
+        return await recalculate_user_metrics(session, user_id, user)
+    await session.flush()
+    return m
 
 
-async def update_metrics_on_habit_created(
-    session: AsyncSession, user_id: int, user: User
+async def update_metrics_on_habit_skipped(
+    session: AsyncSession, user_id: int, user: User, today: date
 ) -> UserMetrics:
-    return await recalculate_user_metrics(session, user_id, user)
+    """Delta update after a skipped log for `today` (user_today). Call after log_skipped, before commit."""
+    m = await _current(session, user_id, today)
+    if m is None or today != user_today(user):
+        return await recalculate_user_metrics(session, user_id, user)
+    m.streak_no_misses = 0
+    _apply_streak(m, await streak_service.get_state(session, user_id))
+    await session.flush()
+    return m
 
 
-async def update_metrics_on_referral(
+async def update_metrics_on_habit_created(
     session: AsyncSession, user_id: int, user: User
 ) -> UserMetrics:
-    return await recalculate_user_metrics(session, user_id, user)
+    """New active habit. Perfect days inside the window are judged against the new
+    habit set, so those fields need a full recalc; otherwise only the count moves."""
+    m = await _current(session, user_id, user_today(user))
+    if m is None or m.perfect_days_total > (m.archived_perfect_days or 0):
+        return await recalculate_user_metrics(session, user_id, user)
+    m.habits_created += 1
+    await session.flush()
+    return m
 
 
-async def update_metrics_on_subscription(
+async def update_metrics_on_referral(
     session: AsyncSession, user_id: int, user: User
 ) -> UserMetrics:
-    return await recalculate_user_metrics(session, user_id, user)
+    m = await get_or_create_metrics(session, user_id)
+    r = await session.execute(
+        select(func.count()).select_from(Referral).where(Referral.referrer_id == user_id)
+    )
+    m.invited_friends = r.scalar() or 0
+    await session.flush()
+    return m
 
 
 def metrics_to_dict(m: UserMetrics, user: User | None = None) -> dict:
@@ -341,13 +676,10 @@ async def reset_growth_flag(session: AsyncSession, user_id: int) -> None:
 
 
 async def mark_habit_modified(session: AsyncSession, user_id: int, user: User) -> None:
-    """Call after habit edit. Sets habit_modified, recalc, then streak_preserved if streak intact."""
-    m = await get_or_create_metrics(session, user_id)
+    """Call after habit edit. Sets habit_modified, then streak_preserved if streak intact."""
+    m = await get_current_metrics(session, user_id, user)
     m.habit_modified = True
-    await session.flush()
-    await recalculate_user_metrics(session, user_id, user)
-    m = await session.get(UserMetrics, user_id)
-    if m and m.streak_days > 0:
+    if m.streak_days > 0:
         m.streak_preserved = True
     await session.flush()
 
@@ -1,19 +1,11 @@
-"""Motivation phrase service — get random, reset when exhausted."""
+"""Motivation phrase service — per-user shuffled rotation, no phrase table scan."""
 
-from app.repositories.motivation_repo import MotivationRepository
+from app.services.reminders import next_phrase
 
 
 class MotivationService:
-    def __init__(self, repo: MotivationRepository):
-        self.repo = repo
-
-    async def get_random_phrase(self, language: str) -> str:
+    async def get_random_phrase(self, user, language: str) -> str:
+        """Next phrase of the user's rotation. Mutates the user row; caller commits."""
         lang = language if language in ("ru", "en", "ar") else "ru"
-        phrase = await self.repo.get_random_unused(lang)
-        if phrase is None:
-            await self.repo.reset_all_for_language(lang)
-            phrase = await self.repo.get_random_unused(lang)
-        if phrase is None:
-            return "Молодец!" if lang == "ru" else ("أحسنت!" if lang == "ar" else "Well done!")
-        await self.repo.mark_used(phrase)
-        return phrase.text
+        phrase, _idx = next_phrase(user, lang)
+        return phrase
@@ -6,6 +6,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Payment, User
+from app.services import user_service
 
 TARIFF_DAYS = {"1": 30, "3": 90, "12": 365}
 
@@ -21,6 +22,7 @@ async def extend_subscription(session: AsyncSession, user_id: int, days: int) ->
     else:
         user.premium_until = now + timedelta(days=days)
     await session.flush()
+    user_service.invalidate(user.telegram_id, session)
 
 
 def get_days_from_payload(payload: str) -> int:
@@ -0,0 +1,112 @@
+"""Premium expiry warnings — incremental, deduplicated "expires in 3d / 1d" notices.
+
+Each run looks only at expiries that entered a warning horizon since the
+previous run: premium_until in (watermark + lead, now + lead]. The watermark is
+stored, so a delayed or missed run widens the next window instead of skipping
+users. Candidates are read in keyset pages of slim rows off a covering index
+and claimed in the premium_expiry_notices ledger before sending, so reruns and
+overlapping windows never notify twice for the same expiry.
+"""
+
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import delete, exists, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import JobWatermark, PremiumExpiryNotice, User
+
+WATERMARK = "premium_expiry"
+PAGE_SIZE = 200
+LEDGER_RETENTION = timedelta(days=30)  # notices kept this long after the expiry they announced
+
+# (kind, lead) from longest to shortest; text key is premium_expiry_<kind>
+KINDS = (("3d", timedelta(days=3)), ("1d", timedelta(days=1)))
+
+
+class Candidate(NamedTuple):
+    user_id: int
+    telegram_id: int
+    language_code: str
+    premium_until: datetime
+
+
+def windows(watermark: datetime, now: datetime) -> list[tuple[str, datetime, datetime]]:
+    """(kind, lo, hi]: premium_until range each kind warns about in this run.
+
+    A warning is not sent once the next shorter one is due, so after downtime
+    a user gets only the most relevant notice; nobody is warned after expiry.
+    """
+    result = []
+    for i, (kind, lead) in enumerate(KINDS):
+        floor = now + KINDS[i + 1][1] if i + 1 < len(KINDS) else now
+        lo, hi = max(watermark + lead, floor), now + lead
+        if lo < hi:
+            result.append((kind, lo, hi))
+    return result
+
+
+async def get_watermark(session: AsyncSession, default: datetime) -> datetime:
+    """Upper bound of the last completed run, or `default` before the first."""
+    value = await session.scalar(select(JobWatermark.value).where(JobWatermark.name == WATERMARK))
+    return value or default
+
+
+async def set_watermark(session: AsyncSession, value: datetime) -> None:
+    """Record that expiries up to `value` + lead have been handled. Caller commits."""
+    stmt = insert(JobWatermark).values(name=WATERMARK, value=value)
+    await session.execute(stmt.on_conflict_do_update(index_elements=["name"], set_={"value": value}))
+
+
+def candidates_query(kind: str, lo: datetime, hi: datetime, after: tuple[datetime, int] | None, limit: int):
+    """Next keyset page of users expiring in (lo, hi] not yet warned with `kind`."""
+    notified = exists().where(
+        PremiumExpiryNotice.user_id == User.id,
+        PremiumExpiryNotice.kind == kind,
+        PremiumExpiryNotice.premium_until == User.premium_until,
+    )
+    stmt = select(User.id, User.telegram_id, User.language_code, User.premium_until).where(
+        User.premium_until > lo,
+        User.premium_until <= hi,
+        ~notified,
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(User.premium_until, User.id) > tuple_(*after))
+    return stmt.order_by(User.premium_until, User.id).limit(limit)
+
+
+async def claim_page(
+    session: AsyncSession,
+    kind: str,
+    lo: datetime,
+    hi: datetime,
+    after: tuple[datetime, int] | None = None,
+    limit: int = PAGE_SIZE,
+) -> tuple[list[Candidate], tuple[datetime, int] | None]:
+    """Record notices for the next page and return (users to notify, cursor).
+
+    Rows another run claimed first are left out. Cursor is None past the last
+    page. Caller commits before sending.
+    """
+    result = await session.execute(candidates_query(kind, lo, hi, after, limit))
+    page = [Candidate(*row) for row in result.all()]
+    if not page:
+        return [], None
+    claimed = await session.execute(
+        insert(PremiumExpiryNotice)
+        .values([{"user_id": c.user_id, "kind": kind, "premium_until": c.premium_until} for c in page])
+        .on_conflict_do_nothing()
+        .returning(PremiumExpiryNotice.user_id)
+    )
+    ids = {row[0] for row in claimed.all()}
+    cursor = (page[-1].premium_until, page[-1].user_id) if len(page) == limit else None
+    return [c for c in page if c.user_id in ids], cursor
+
+
+async def prune(session: AsyncSession, now: datetime) -> int:
+    """Drop notices for expiries long past. Caller commits."""
+    result = await session.execute(
+        delete(PremiumExpiryNotice).where(PremiumExpiryNotice.premium_until < now - LEDGER_RETENTION)
+    )
+    return result.rowcount or 0
@@ -0,0 +1,76 @@
+"""Process stats — per-process caches and queues, published for /health.
+
+The snapshot cache and friends live in the memory of the process that uses
+them (the bot process, or the web workers in webhook mode), not in the one
+that answers /health. Each such process upserts its stats into
+process_stats every PUBLISH_INTERVAL; /health lists the recent rows.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import get_session_maker
+from app.models import ProcessStats
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_INTERVAL = 60.0  # seconds
+STALE_AFTER = timedelta(minutes=5)  # rows older than this are not reported
+RETENTION = timedelta(days=1)  # rows of exited processes are deleted after this
+
+PROCESS_KEY = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def collect() -> dict:
+    """This process's in-memory stats."""
+    from app.services import user_service
+    from app.telegram_gateway import get_gateway
+    from app.utils import content_moderator
+
+    return {
+        "user_cache": user_service.cache_stats(),
+        "moderation_cache": content_moderator.verdict_cache_stats(),
+        "telegram_gateway": get_gateway().stats(),
+    }
+
+
+async def publish(session: AsyncSession, role: str, stats: dict, now: datetime) -> None:
+    """Upsert this process's row and drop rows of long-gone processes. Caller commits."""
+    stmt = insert(ProcessStats).values(key=PROCESS_KEY, role=role, stats=stats, updated_at=now)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"role": stmt.excluded.role, "stats": stmt.excluded.stats, "updated_at": stmt.excluded.updated_at},
+        )
+    )
+    await session.execute(delete(ProcessStats).where(ProcessStats.updated_at < now - RETENTION))
+
+
+async def recent(session: AsyncSession, now: datetime) -> dict[str, dict]:
+    """key -> {role, updated_at, **stats} for processes that published lately."""
+    result = await session.execute(
+        select(ProcessStats).where(ProcessStats.updated_at >= now - STALE_AFTER).order_by(ProcessStats.key)
+    )
+    return {
+        row.key: {"role": row.role, "updated_at": row.updated_at.isoformat(), **row.stats}
+        for row in result.scalars().all()
+    }
+
+
+async def publish_forever(role: str) -> None:
+    """Publish collect() every PUBLISH_INTERVAL until cancelled. Failures are logged and retried."""
+    while True:
+        try:
+            async with get_session_maker()() as session:
+                await publish(session, role, collect(), datetime.now(UTC))
+                await session.commit()
+        except Exception:
+            logger.warning("Process stats publish failed", exc_info=True)
+        await asyncio.sleep(PUBLISH_INTERVAL)
@@ -0,0 +1,55 @@
+"""Token buckets — refill math and the shared Postgres store.
+
+A bucket is two floats: tokens left and when they were last counted. Tokens
+refill lazily at `rate` per second up to `capacity` on each take, so an idle
+bucket needs no timer and a bucket idle for capacity / rate seconds is full,
+i.e. indistinguishable from a missing one and safe to evict.
+"""
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import RateLimitBucket
+
+
+def take(tokens: float, updated: float, now: float, capacity: float, rate: float) -> tuple[bool, float]:
+    """(allowed, tokens left) after trying to take one token at `now`."""
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1.0:
+        return True, tokens - 1.0
+    return False, tokens
+
+
+async def take_shared(session: AsyncSession, key: str, capacity: float, rate: float) -> bool:
+    """Take one token from the shared bucket `key` in a single upsert. Caller commits.
+
+    A denied take leaves the row untouched; refill is computed from the stored
+    timestamp next time, so nothing is lost.
+    """
+    table = RateLimitBucket.__table__
+    stmt = insert(RateLimitBucket).values(
+        key=key,
+        tokens=float(capacity) - 1.0,
+        updated_at=func.extract("epoch", func.clock_timestamp()),
+    )
+    refilled = func.least(
+        float(capacity), table.c.tokens + (stmt.excluded.updated_at - table.c.updated_at) * rate
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["key"],
+        set_={"tokens": refilled - 1.0, "updated_at": stmt.excluded.updated_at},
+        where=refilled >= 1.0,
+    ).returning(RateLimitBucket.key)
+    result = await session.execute(stmt)
+    return result.first() is not None
+
+
+async def evict_idle(session: AsyncSession, idle_seconds: float) -> int:
+    """Delete buckets untouched for `idle_seconds` (full again by then). Caller commits."""
+    result = await session.execute(
+        delete(RateLimitBucket).where(
+            RateLimitBucket.updated_at < func.extract("epoch", func.clock_timestamp()) - float(idle_seconds)
+        )
+    )
+    return result.rowcount or 0
@@ -0,0 +1,134 @@
+"""Reminder index — next UTC fire minute per habit_time, one indexed lookup per tick.
+
+Each HabitTime row carries next_fire_at: the next absolute UTC instant its
+(weekday, local time) pair occurs in the owner's timezone. The scheduler asks
+for rows with next_fire_at <= now, sends them, then advances them one week.
+Converting local wall time per occurrence keeps the index correct across DST.
+"""
+
+import logging
+from datetime import UTC, date, datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Habit, HabitTime, User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TZ = "Europe/Moscow"
+
+# Due slots older than this are advanced without sending (bot was down, clock jump).
+MAX_LATENESS = timedelta(minutes=5)
+
+
+def _zone(tz_name: str | None) -> ZoneInfo:
+    try:
+        return ZoneInfo(tz_name or DEFAULT_TZ)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TZ)
+
+
+def as_utc(dt: datetime) -> datetime:
+    """Treat naive datetimes as UTC (some drivers drop tzinfo)."""
+    return dt.replace(tzinfo=UTC) if dt.tzinfo is None else dt
+
+
+def next_fire_at(weekday: int, at: time, tz_name: str | None, after: datetime) -> datetime:
+    """Next UTC datetime strictly after `after` when local (weekday, at) occurs in tz.
+
+    Wall time is resolved per candidate date, so the UTC offset follows DST.
+    Local times skipped by a spring-forward gap fire at the shifted instant.
+    """
+    tz = _zone(tz_name)
+    after = as_utc(after)
+    at = at.replace(second=0, microsecond=0, tzinfo=None)
+    local_day = after.astimezone(tz).date()
+    start = local_day - timedelta(days=1)  # offset changes can pull the slot across midnight
+    delta = (weekday - start.weekday()) % 7
+    for week in range(3):
+        candidate: date = start + timedelta(days=delta + week * 7)
+        fire = datetime.combine(candidate, at, tzinfo=tz).astimezone(UTC)
+        if fire > after:
+            return fire
+    return fire  # unreachable: three consecutive weeks always include one future slot
+
+
+def local_date_of(fire_at: datetime, tz_name: str | None) -> date:
+    """User-local calendar date of a fire instant."""
+    return as_utc(fire_at).astimezone(_zone(tz_name)).date()
+
+
+async def reindex_habit(session: AsyncSession, habit_id: int, now: datetime | None = None) -> int:
+    """Recompute next_fire_at for every slot of one habit. Call after its times change."""
+    now = now or datetime.now(UTC)
+    result = await session.execute(
+        select(HabitTime.id, HabitTime.weekday, HabitTime.time, User.timezone)
+        .join(Habit, HabitTime.habit_id == Habit.id)
+        .join(User, Habit.user_id == User.id)
+        .where(HabitTime.habit_id == habit_id)
+    )
+    return await _write_fire_times(session, result.all(), now)
+
+
+async def reindex_user(session: AsyncSession, user_id: int, now: datetime | None = None) -> int:
+    """Recompute next_fire_at for all of a user's slots. Call after a timezone change."""
+    now = now or datetime.now(UTC)
+    result = await session.execute(
+        select(HabitTime.id, HabitTime.weekday, HabitTime.time, User.timezone)
+        .join(Habit, HabitTime.habit_id == Habit.id)
+        .join(User, Habit.user_id == User.id)
+        .where(Habit.user_id == user_id)
+    )
+    return await _write_fire_times(session, result.all(), now)
+
+
+async def backfill_missing(session: AsyncSession, now: datetime | None = None, limit: int = 5000) -> int:
+    """Index slots that have never been computed (rows created before the column existed)."""
+    now = now or datetime.now(UTC)
+    result = await session.execute(
+        select(HabitTime.id, HabitTime.weekday, HabitTime.time, User.timezone)
+        .join(Habit, HabitTime.habit_id == Habit.id)
+        .join(User, Habit.user_id == User.id)
+        .where(HabitTime.next_fire_at.is_(None))
+        .limit(limit)
+    )
+    return await _write_fire_times(session, result.all(), now)
+
+
+async def fetch_due(session: AsyncSession, now: datetime) -> list[tuple[HabitTime, Habit, User]]:
+    """All slots whose fire time has passed. Served by the next_fire_at index."""
+    result = await session.execute(
+        select(HabitTime, Habit, User)
+        .join(Habit, HabitTime.habit_id == Habit.id)
+        .join(User, Habit.user_id == User.id)
+        .where(HabitTime.next_fire_at <= now)
+    )
+    return list(result.all())
+
+
+async def advance(
+    session: AsyncSession,
+    rows: list[tuple[HabitTime, Habit, User]],
+    now: datetime,
+) -> None:
+    """Move fired slots to their next weekly occurrence."""
+    params = [
+        {"id": ht.id, "next_fire_at": next_fire_at(ht.weekday, ht.time, user.timezone, now)}
+        for ht, _habit, user in rows
+    ]
+    if params:
+        await session.execute(update(HabitTime), params)
+        await session.flush()
+
+
+async def _write_fire_times(session: AsyncSession, rows, now: datetime) -> int:
+    params = [
+        {"id": ht_id, "next_fire_at": next_fire_at(weekday, at, tz_name, now)}
+        for ht_id, weekday, at, tz_name in rows
+    ]
+    if params:
+        await session.execute(update(HabitTime), params)
+        await session.flush()
+    return len(params)
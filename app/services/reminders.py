@@ -1,12 +1,15 @@
-"""Reminder service — motivation phrases, habit logs."""
+"""Reminder service — motivation phrases, habit logs, batched per-tick preparation."""
 
 import random
-from datetime import date
+from datetime import date, time
+from functools import lru_cache
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Habit, HabitLog, MotivationUsage, User
+from app.models import Habit, HabitLog, HabitTime, User
+from app.services import habit_log_service, streak_service
+from app.texts import _normalize_lang, t
 
 MOTIVATION_RU = [
     "Молодец!", "Так держать!", "Ты справляешься!", "Отличный шаг!", "Прекрасная работа!",
@@ -21,49 +24,91 @@ MOTIVATION_AR = [
 ] * 30
 
 
-def get_phrase(lang: str, used_indices: set[int]) -> tuple[str, int]:
+def _phrases_for(lang: str) -> list[str]:
     if lang == "ar":
-        phrases = MOTIVATION_AR
-    elif lang == "en":
-        phrases = MOTIVATION_EN
-    else:
-        phrases = MOTIVATION_RU
-    available = [i for i in range(len(phrases)) if i not in used_indices]
-    if not available:
-        idx = random.randint(0, len(phrases) - 1)
-        return phrases[idx], idx
-    idx = random.choice(available)
+        return MOTIVATION_AR
+    if lang == "en":
+        return MOTIVATION_EN
+    return MOTIVATION_RU
+
+
+@lru_cache(maxsize=1024)
+def _permutation(seed: int, n: int) -> tuple[int, ...]:
+    order = list(range(n))
+    random.Random(seed).shuffle(order)
+    return tuple(order)
+
+
+def next_phrase(user, lang: str) -> tuple[str, int]:
+    """Next phrase of the user's shuffled rotation; every phrase once per cycle.
+
+    State is two columns on the user row (motivation_seed, motivation_cursor):
+    no extra query and nothing appended. A new seed is drawn when the cycle
+    ends. Mutates the user; the caller's flush/commit persists it.
+    """
+    phrases = _phrases_for(lang)
+    n = len(phrases)
+    seed = user.motivation_seed
+    cursor = user.motivation_cursor or 0
+    if seed is None or cursor >= n:
+        seed = random.getrandbits(31)
+        cursor = 0
+    idx = _permutation(seed, n)[cursor]
+    user.motivation_seed = seed
+    user.motivation_cursor = cursor + 1
     return phrases[idx], idx
 
 
-async def record_phrase_usage(
-    session: AsyncSession, user_id: int, habit_id: int, phrase_index: int
-) -> None:
-    usage = MotivationUsage(user_id=user_id, habit_id=habit_id, phrase_index=phrase_index)
-    session.add(usage)
-    await session.flush()
-
-
-async def get_used_indices(session: AsyncSession, user_id: int) -> set[int]:
-    result = await session.execute(
-        select(MotivationUsage.phrase_index).where(MotivationUsage.user_id == user_id)
+def build_reminder_text(lang: str, title: str, at: time, streak: int, phrase: str) -> str:
+    """Reminder body: habit + time, streak bar, motivation phrase."""
+    time_str = at.strftime("%H:%M") if hasattr(at, "strftime") else str(at)
+    text = t(lang, "notification_format", title=title, time=time_str)
+    if streak > 0:
+        filled = min(10, streak)
+        text += f"\n{'🔥' * filled}{'⬜' * (10 - filled)} {streak} days"
+    if phrase:
+        text += f"\n\n💬 {phrase}"
+    return text
+
+
+async def prepare_batch(
+    session: AsyncSession,
+    due: list[tuple[User, Habit, HabitTime, date]],
+) -> list[tuple[int, int, str, str]]:
+    """Resolve one tick's due reminders in a constant number of queries.
+
+    Input: (user, habit, habit_time, user-local date) for every slot firing now.
+    Drops slots already logged that day, advances each user's phrase rotation
+    and attaches the current streak. Users must be attached to `session`.
+    Returns (chat_id, habit_id, lang, text) ready to send; caller commits.
+    """
+    if not due:
+        return []
+    logged = await habit_log_service.get_logged_keys(
+        session, [(user.id, habit.id, d) for user, habit, _ht, d in due]
     )
-    return set(result.scalars().all())
+    pending = [row for row in due if (row[0].id, row[1].id, row[3]) not in logged]
+    if not pending:
+        return []
+
+    streaks = await habit_log_service.get_max_streaks(session, list({user.id for user, *_ in pending}))
 
+    ready: list[tuple[int, int, str, str]] = []
+    for user, habit, ht, _d in pending:
+        lang = _normalize_lang(user.language_code)
+        phrase, _idx = next_phrase(user, lang)
+        text = build_reminder_text(lang, habit.title, ht.time, streaks.get(user.id, 0), phrase)
+        ready.append((user.telegram_id, habit.id, lang, text))
 
-async def reset_usage_if_needed(session: AsyncSession, user_id: int, lang: str) -> None:
-    phrases = MOTIVATION_AR if lang == "ar" else (MOTIVATION_EN if lang == "en" else MOTIVATION_RU)
-    used = await get_used_indices(session, user_id)
-    if len(used) >= len(phrases):
-        from sqlalchemy import delete
-        await session.execute(delete(MotivationUsage).where(MotivationUsage.user_id == user_id))
-        await session.flush()
+    await session.flush()
+    return ready
 
 
 async def log_done(session: AsyncSession, habit_id: int, user_id: int, d: date) -> HabitLog:
     log = HabitLog(habit_id=habit_id, user_id=user_id, log_date=d, status="done")
     session.add(log)
     await session.flush()
+    await streak_service.record_done(session, user_id, d)
     return log
 
 
@@ -71,6 +116,7 @@ async def log_skipped(session: AsyncSession, habit_id: int, user_id: int, d: dat
     log = HabitLog(habit_id=habit_id, user_id=user_id, log_date=d, status="skipped")
     session.add(log)
     await session.flush()
+    await streak_service.record_skip(session, user_id, d)
     return log
 
 
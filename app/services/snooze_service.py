@@ -0,0 +1,81 @@
+"""Snooze queue — durable delayed reminders polled by the scheduler.
+
+One row per (user, habit): snoozing again only moves due_at. Due rows are
+claimed with DELETE ... RETURNING (SKIP LOCKED), so a restart never loses
+a snooze and two pollers never deliver the same one.
+"""
+
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Habit, SnoozedReminder, User
+
+BATCH_SIZE = 200
+
+
+async def schedule(session: AsyncSession, user_id: int, habit_id: int, minutes: int) -> datetime:
+    """Queue (or re-queue) a reminder for habit in `minutes`. Caller commits."""
+    due_at = datetime.now(UTC) + timedelta(minutes=minutes)
+    stmt = insert(SnoozedReminder).values(user_id=user_id, habit_id=habit_id, due_at=due_at)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_snoozed_reminder_user_habit",
+        set_={"due_at": due_at},
+    )
+    await session.execute(stmt)
+    await session.flush()
+    return due_at
+
+
+async def claim_due(
+    session: AsyncSession,
+    now: datetime,
+    limit: int = BATCH_SIZE,
+) -> list[tuple[int, int, str, str]]:
+    """Remove up to `limit` due snoozes and return (chat_id, habit_id, lang, title) to send.
+
+    Snoozes of deleted or deactivated habits are dropped. Caller commits before sending.
+    """
+    due_ids = (
+        select(SnoozedReminder.id)
+        .where(SnoozedReminder.due_at <= now)
+        .order_by(SnoozedReminder.due_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await session.execute(
+        delete(SnoozedReminder)
+        .where(SnoozedReminder.id.in_(due_ids.scalar_subquery()))
+        .returning(SnoozedReminder.habit_id)
+    )
+    habit_ids = {row[0] for row in result.all()}
+    if not habit_ids:
+        return []
+    result = await session.execute(
+        select(User.telegram_id, Habit.id, User.language_code, Habit.title)
+        .join(Habit, Habit.user_id == User.id)
+        .where(Habit.id.in_(habit_ids), Habit.is_active == True)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def queue_depth(session: AsyncSession) -> tuple[int, int]:
+    """(pending snoozes, of which already due)."""
+    now = datetime.now(UTC)
+    result = await session.execute(
+        select(func.count(), func.count().filter(SnoozedReminder.due_at <= now)).select_from(SnoozedReminder)
+    )
+    total, due = result.one()
+    return total or 0, due or 0
+
+
+async def cancel(session: AsyncSession, user_id: int, habit_id: int) -> None:
+    """Drop a pending snooze, e.g. once the habit is logged."""
+    await session.execute(
+        delete(SnoozedReminder).where(
+            SnoozedReminder.user_id == user_id,
+            SnoozedReminder.habit_id == habit_id,
+        )
+    )
@@ -0,0 +1,174 @@
+"""Streak state — current/longest streak per user, maintained on write.
+
+A user_streaks row is updated in the same transaction as every done/skipped
+log, so readers (reminders, profile, metrics) get the streak in O(1) instead
+of walking the whole log history. A background verifier recomputes batches
+of users from habit_logs and repairs any drift.
+"""
+
+from collections.abc import Iterable
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import HabitLog, User, UserStreak
+
+VERIFY_BATCH_SIZE = 1000
+
+
+def streak_state(done_dates: Iterable[date]) -> tuple[int, int, date | None]:
+    """(current, longest, last_done) from done dates in any order, duplicates allowed.
+
+    Current is the run of consecutive days ending at the most recent done date.
+    """
+    current = longest = 0
+    prev = None
+    for d in sorted(set(done_dates)):
+        current = current + 1 if prev is not None and (d - prev).days == 1 else 1
+        longest = max(longest, current)
+        prev = d
+    return current, longest, prev
+
+
+def advance_streak(
+    current: int,
+    longest: int,
+    last_done: date | None,
+    day: date,
+) -> tuple[int, int, date] | None:
+    """State after a done on `day`. None if `day` precedes last_done (needs a rebuild)."""
+    if last_done is None or (day - last_done).days > 1:
+        current = 1
+    elif day == last_done:
+        return current, longest, last_done
+    elif (day - last_done).days == 1:
+        current += 1
+    else:
+        return None
+    return current, max(longest, current), day
+
+
+async def _locked_state(session: AsyncSession, user_id: int) -> UserStreak:
+    """The user's row, created if missing and locked until the caller commits."""
+    await session.execute(
+        insert(UserStreak).values(user_id=user_id).on_conflict_do_nothing(index_elements=["user_id"])
+    )
+    result = await session.execute(
+        select(UserStreak)
+        .where(UserStreak.user_id == user_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+
+async def _history(session: AsyncSession, user_ids: list[int]) -> dict[int, tuple[list[date], date | None]]:
+    """user_id -> (done dates, last skip date) from habit_logs. One query."""
+    history: dict[int, tuple[list[date], date | None]] = {uid: ([], None) for uid in user_ids}
+    result = await session.execute(
+        select(HabitLog.user_id, HabitLog.log_date, HabitLog.status)
+        .where(HabitLog.user_id.in_(set(user_ids)), HabitLog.status.in_(("done", "skipped")))
+        .distinct()
+    )
+    for uid, d, status in result.all():
+        done, last_skip = history[uid]
+        if status == "done":
+            done.append(d)
+        elif last_skip is None or d > last_skip:
+            history[uid] = (done, d)
+    return history
+
+
+def _apply(state: UserStreak, done: list[date], last_skip: date | None) -> bool:
+    """Overwrite state from history. True if anything changed."""
+    current, longest, last_done = streak_state(done)
+    fresh = (current, longest, last_done, last_skip)
+    if (state.current_streak, state.longest_streak, state.last_done_date, state.last_skip_date) == fresh:
+        return False
+    state.current_streak, state.longest_streak, state.last_done_date, state.last_skip_date = fresh
+    return True
+
+
+async def rebuild(session: AsyncSession, user_id: int) -> UserStreak:
+    """Recompute one user's state from habit_logs."""
+    state = await _locked_state(session, user_id)
+    done, last_skip = (await _history(session, [user_id]))[user_id]
+    _apply(state, done, last_skip)
+    await session.flush()
+    return state
+
+
+async def record_done(session: AsyncSession, user_id: int, day: date) -> UserStreak:
+    """Advance the streak for a done log on `day`. Call in the transaction that writes the log."""
+    state = await _locked_state(session, user_id)
+    advanced = advance_streak(
+        state.current_streak or 0, state.longest_streak or 0, state.last_done_date, day
+    )
+    if advanced is None:
+        return await rebuild(session, user_id)
+    state.current_streak, state.longest_streak, state.last_done_date = advanced
+    await session.flush()
+    return state
+
+
+async def record_skip(session: AsyncSession, user_id: int, day: date) -> UserStreak:
+    """Remember the latest skip date. Skips do not break the done-day streak."""
+    state = await _locked_state(session, user_id)
+    if state.last_skip_date is None or day > state.last_skip_date:
+        state.last_skip_date = day
+        await session.flush()
+    return state
+
+
+async def get_state(session: AsyncSession, user_id: int) -> UserStreak:
+    """Stored state; built from history the first time a user is read."""
+    state = await session.get(UserStreak, user_id)
+    if state is None:
+        state = await rebuild(session, user_id)
+    return state
+
+
+async def get_states(session: AsyncSession, user_ids: list[int]) -> dict[int, UserStreak]:
+    """Stored states for many users in one query. Users without a row are absent."""
+    if not user_ids:
+        return {}
+    result = await session.execute(select(UserStreak).where(UserStreak.user_id.in_(set(user_ids))))
+    return {s.user_id: s for s in result.scalars().all()}
+
+
+async def verify_batch(
+    session: AsyncSession,
+    after_user_id: int = 0,
+    limit: int = VERIFY_BATCH_SIZE,
+) -> tuple[int | None, int]:
+    """Recompute up to `limit` users with id > after_user_id and repair drifted rows.
+
+    Rows are locked before history is read, so a concurrent record_done either
+    lands in the history seen here or waits for this batch to commit.
+    Returns (last user id checked or None when past the end, rows repaired).
+    """
+    result = await session.execute(
+        select(User.id).where(User.id > after_user_id).order_by(User.id).limit(limit)
+    )
+    user_ids = [row[0] for row in result.all()]
+    if not user_ids:
+        return None, 0
+    await session.execute(
+        insert(UserStreak)
+        .values([{"user_id": uid} for uid in user_ids])
+        .on_conflict_do_nothing(index_elements=["user_id"])
+    )
+    result = await session.execute(
+        select(UserStreak)
+        .where(UserStreak.user_id.in_(user_ids))
+        .order_by(UserStreak.user_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    states = {s.user_id: s for s in result.scalars().all()}
+    history = await _history(session, user_ids)
+    repaired = sum(_apply(states[uid], *history[uid]) for uid in user_ids)
+    await session.flush()
+    return user_ids[-1], repaired
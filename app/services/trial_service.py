@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.models import User
+from app.services import user_service
 
 logger = logging.getLogger(__name__)
 
@@ -29,5 +30,6 @@ async def grant_trial_if_eligible(session: AsyncSession, user: User) -> bool:
     user.trial_used = True
     user.premium_until = datetime.now(timezone.utc) + timedelta(days=trial_days)
     await session.flush()
+    user_service.invalidate(user.telegram_id, session)
     logger.info("Trial premium granted to user_id=%s for %d days", user.id, trial_days)
     return True
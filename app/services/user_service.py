@@ -1,18 +1,181 @@
-"""User service."""
+"""User service.
 
+Also keeps a per-process LRU+TTL cache of UserSnapshot by telegram_id for
+read-only lookups (language, premium, timezone). Services that change the
+cached fields call invalidate(telegram_id, session): the entry is dropped at
+once and again when that session commits, so a read in between cannot
+re-cache the old row. Only rows read from committed state are cached: not
+from a session that has flushed writes, and not when the key was invalidated
+while the read was in flight. The TTL bounds staleness across processes.
+"""
+
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
 
-from sqlalchemy import select, update
+from sqlalchemy import event, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
 from app.db import get_session_maker
 from app.models import User
+from app.services import reminder_index_service
+
+SNAPSHOT_TTL = 300.0  # seconds
+SNAPSHOT_MAX_SIZE = 10_000
+TOMBSTONE_TTL = 60.0  # seconds an invalidation blocks caching of reads that started before it
+
+_PENDING_INVALIDATIONS = "user_cache_invalidate"  # Session.info keys
+_HAS_WRITES = "user_cache_has_writes"
+
+
+class UserSnapshot(NamedTuple):
+    """Read-only copy of the User fields most handlers need."""
+
+    id: int
+    telegram_id: int
+    language_code: str
+    timezone: str
+    premium_until: datetime | None
+    xp: int
+    level: int
+    discount_percent: int
+    discount_until: datetime | None
+
+
+_snapshots: OrderedDict[int, tuple[float, UserSnapshot]] = OrderedDict()
+_tombstones: dict[int, float] = {}  # telegram_id -> monotonic time of its last invalidation
+_hits = 0
+_misses = 0
 
 
 def _now() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def snapshot_of(user: User) -> UserSnapshot:
+    return UserSnapshot(
+        user.id,
+        user.telegram_id,
+        user.language_code,
+        user.timezone,
+        user.premium_until,
+        user.xp,
+        user.level,
+        user.discount_percent,
+        user.discount_until,
+    )
+
+
+def cache_user(user: User, read_at: float | None = None) -> UserSnapshot:
+    """Store a snapshot of a user read at `read_at`, evicting the least recently used.
+
+    Skipped if the user was invalidated since `read_at`: the row may predate that write.
+    """
+    snap = snapshot_of(user)
+    if read_at is not None and _tombstones.get(user.telegram_id, float("-inf")) >= read_at:
+        return snap
+    _snapshots[user.telegram_id] = (time.monotonic() + SNAPSHOT_TTL, snap)
+    _snapshots.move_to_end(user.telegram_id)
+    while len(_snapshots) > SNAPSHOT_MAX_SIZE:
+        _snapshots.popitem(last=False)
+    return snap
+
+
+def invalidate(telegram_id: int | None, session: AsyncSession | None = None) -> None:
+    """Drop a cached snapshot. Call from every write to a cached field.
+
+    Pass the session that made the write if it is not committed yet: the entry
+    is dropped again once that session commits (or rolls back).
+    """
+    if telegram_id is None:
+        return
+    now = time.monotonic()
+    _snapshots.pop(telegram_id, None)
+    _tombstones[telegram_id] = now
+    if len(_tombstones) > SNAPSHOT_MAX_SIZE:
+        for tid, at in list(_tombstones.items()):
+            if now - at > TOMBSTONE_TTL:
+                del _tombstones[tid]
+    if session is not None:
+        session.sync_session.info.setdefault(_PENDING_INVALIDATIONS, set()).add(telegram_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_writes(session: Session, _flush_context) -> None:
+    session.info[_HAS_WRITES] = True
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _end_of_transaction(session: Session) -> None:
+    session.info.pop(_HAS_WRITES, None)
+    for telegram_id in session.info.pop(_PENDING_INVALIDATIONS, ()):
+        invalidate(telegram_id)
+
+
+def _cache_if_committed(session: AsyncSession, user: User, read_at: float) -> None:
+    """Cache a row this session read, unless the session has uncommitted writes."""
+    info = session.sync_session.info
+    if not info.get(_HAS_WRITES) and not info.get(_PENDING_INVALIDATIONS):
+        cache_user(user, read_at)
+
+
+def clear_cache() -> None:
+    global _hits, _misses
+    _snapshots.clear()
+    _tombstones.clear()
+    _hits = _misses = 0
+
+
+def cache_stats() -> dict:
+    """Size and hit rate of the snapshot cache since start (or clear_cache)."""
+    lookups = _hits + _misses
+    return {
+        "size": len(_snapshots),
+        "max_size": SNAPSHOT_MAX_SIZE,
+        "hits": _hits,
+        "misses": _misses,
+        "hit_rate": round(_hits / lookups, 3) if lookups else 0.0,
+    }
+
+
+def _cached(telegram_id: int) -> UserSnapshot | None:
+    global _hits, _misses
+    entry = _snapshots.get(telegram_id)
+    if entry is not None:
+        expires, snap = entry
+        if expires > time.monotonic():
+            _snapshots.move_to_end(telegram_id)
+            _hits += 1
+            return snap
+        del _snapshots[telegram_id]
+    _misses += 1
+    return None
+
+
+async def get_snapshot(telegram_id: int, session: AsyncSession | None = None) -> UserSnapshot | None:
+    """Cached snapshot; on a miss loads the user (in its own session if none is given)."""
+    snap = _cached(telegram_id)
+    if snap is not None:
+        return snap
+    if session is not None:
+        user = await get_by_telegram_id(session, telegram_id)
+        return snapshot_of(user) if user else None
+    async with get_session_maker()() as own:
+        user = await get_by_telegram_id(own, telegram_id)
+        return snapshot_of(user) if user else None
+
+
+async def get_language(telegram_id: int | None, default: str = "ru") -> str:
+    """User's language (ru/en/ar) from the snapshot cache; `default` for unknown users."""
+    snap = await get_snapshot(telegram_id) if telegram_id else None
+    if snap is None:
+        return default
+    return snap.language_code if snap.language_code in ("ru", "en", "ar") else "ru"
+
+
 def is_premium(user: User) -> bool:
     if not user.premium_until:
         return False
@@ -29,9 +192,13 @@ async def get_or_create(
     first_name: str | None = None,
     telegram_language_code: str | None = None,
 ) -> tuple[User, bool]:
-    result = await session.execute(select(User).where(User.telegram_id == telegram_id))
+    read_at = time.monotonic()
+    result = await session.execute(
+        select(User).where(User.telegram_id == telegram_id).execution_options(populate_existing=True)
+    )
     user = result.scalar_one_or_none()
     if user:
+        _cache_if_committed(session, user, read_at)
         return user, False
 
     lang = (telegram_language_code or "ru")[:2].lower() if telegram_language_code else "ru"
@@ -52,13 +219,21 @@ async def get_or_create(
 
 
 async def get_by_telegram_id(session: AsyncSession, telegram_id: int) -> User | None:
-    result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-    return result.scalar_one_or_none()
+    read_at = time.monotonic()
+    # populate_existing: a copy already in the identity map may be older than the row
+    result = await session.execute(
+        select(User).where(User.telegram_id == telegram_id).execution_options(populate_existing=True)
+    )
+    user = result.scalar_one_or_none()
+    if user is not None:
+        _cache_if_committed(session, user, read_at)
+    return user
 
 
 async def update_language(session: AsyncSession, user: User, language_code: str) -> None:
     user.language_code = language_code if language_code in ("ru", "en", "ar") else "ru"
     await session.flush()
+    invalidate(user.telegram_id, session)
 
 
 ALLOWED_TIMEZONES = {
@@ -89,6 +264,8 @@ async def update_timezone(session: AsyncSession, user: User, timezone: str) -> N
     tz = _validate_iana_timezone(timezone)
     user.timezone = tz
     await session.flush()
+    invalidate(user.telegram_id, session)
+    await reminder_index_service.reindex_user(session, user.id)
 
 
 async def update_user_timezone(user_id: int, new_tz: str) -> bool:
@@ -99,9 +276,14 @@ async def update_user_timezone(user_id: int, new_tz: str) -> bool:
     tz = _validate_iana_timezone(new_tz)
     sm = get_session_maker()
     async with sm() as session:
-        result = await session.execute(update(User).where(User.id == user_id).values(timezone=tz))
+        result = await session.execute(
+            update(User).where(User.id == user_id).values(timezone=tz).returning(User.telegram_id)
+        )
+        telegram_id = result.scalar_one_or_none()
+        await reminder_index_service.reindex_user(session, user_id)
         await session.commit()
-        return result.rowcount > 0
+        invalidate(telegram_id)
+        return telegram_id is not None
 
 
 async def extend_premium(session: AsyncSession, user: User, months: int) -> None:
@@ -111,6 +293,7 @@ async def extend_premium(session: AsyncSession, user: User, months: int) -> None
     else:
         user.premium_until = now + timedelta(days=months * 30)
     await session.flush()
+    invalidate(user.telegram_id, session)
 
 
 async def add_reward_days(session: AsyncSession, user: User, days: int) -> None:
@@ -120,3 +303,4 @@ async def add_reward_days(session: AsyncSession, user: User, days: int) -> None:
     else:
         user.premium_until = _now() + timedelta(days=days)
     await session.flush()
+    invalidate(user.telegram_id, session)
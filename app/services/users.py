@@ -4,6 +4,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import User
+from app.services import user_service
 
 
 async def get_or_create(
@@ -38,9 +39,13 @@ async def get_or_create(
 async def update_language(session: AsyncSession, user: User, language_code: str) -> None:
     user.language_code = language_code if language_code in ("ru", "en", "ar") else "ru"
     await session.flush()
+    user_service.invalidate(user.telegram_id, session)
 
 
 async def update_timezone(session: AsyncSession, user: User, timezone: str) -> None:
     from app.services.user_service import _validate_iana_timezone
     user.timezone = _validate_iana_timezone(timezone or "Europe/Moscow")
     await session.flush()
+    user_service.invalidate(user.telegram_id, session)
+    from app.services import reminder_index_service
+    await reminder_index_service.reindex_user(session, user.id)
@@ -0,0 +1,111 @@
+"""Weekly report — last week's done/skipped counts per user, delivered resumably.
+
+One aggregate over the week's habit_logs (GROUP BY user with FILTERed counts)
+is streamed through a server-side cursor in user id order, so only users with
+activity are ever loaded. Progress is checkpointed per delivery batch in
+weekly_report_runs; a restarted job continues after the last checkpoint and
+at most one batch can be re-sent.
+"""
+
+from collections.abc import AsyncIterator, Sequence
+from datetime import UTC, date, datetime, time, timedelta
+
+from sqlalchemy import Row, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import HabitLog, User, WeeklyReportRun
+from app.texts import t
+
+REPORT_HOUR = 9  # Monday, UTC
+START_WINDOW = timedelta(days=1)  # a week's run is not begun later than this after REPORT_HOUR
+DELIVERY_BATCH = 50  # reports sent between checkpoints
+
+
+def week_of(now: datetime) -> date:
+    """Monday of the latest week whose report is due at `now` (Monday REPORT_HOUR UTC)."""
+    due = (now - timedelta(hours=REPORT_HOUR)).date()
+    return due - timedelta(days=due.weekday() + 7)
+
+
+def due_at(week_start: date) -> datetime:
+    """When the report for the week starting `week_start` is due."""
+    return datetime.combine(week_start + timedelta(days=7), time(REPORT_HOUR), tzinfo=UTC)
+
+
+def activity_query(week_start: date, after_user_id: int = 0):
+    """(user_id, telegram_id, language_code, done, skipped) for users with logs that week."""
+    counts = (
+        select(
+            HabitLog.user_id,
+            func.count().filter(HabitLog.status == "done").label("done"),
+            func.count().filter(HabitLog.status == "skipped").label("skipped"),
+        )
+        .where(
+            HabitLog.log_date >= week_start,
+            HabitLog.log_date < week_start + timedelta(days=7),
+            HabitLog.status.in_(("done", "skipped")),
+            HabitLog.user_id > after_user_id,
+        )
+        .group_by(HabitLog.user_id)
+        .subquery()
+    )
+    return (
+        select(counts.c.user_id, User.telegram_id, User.language_code, counts.c.done, counts.c.skipped)
+        .join(User, User.id == counts.c.user_id)
+        .order_by(counts.c.user_id)
+    )
+
+
+async def stream_activity(
+    session: AsyncSession,
+    week_start: date,
+    after_user_id: int = 0,
+    batch_size: int = DELIVERY_BATCH,
+) -> AsyncIterator[Sequence[Row]]:
+    """Batches of `activity_query` rows, fetched from a server-side cursor."""
+    result = await session.stream(
+        activity_query(week_start, after_user_id).execution_options(yield_per=batch_size)
+    )
+    async for batch in result.partitions():
+        yield batch
+
+
+def render(lang: str, done: int, skipped: int) -> str:
+    """Report text with a 10-cell completion bar."""
+    total = done + skipped
+    pct = int(done / total * 100) if total else 0
+    filled = min(10, pct // 10)
+    bar = "🟩" * filled + "⬜" * (10 - filled)
+    return t(lang, "weekly_report", done=done, skip=skipped, pct=pct, bar=bar)
+
+
+async def open_run(session: AsyncSession, week_start: date, now: datetime) -> WeeklyReportRun | None:
+    """The week's run, created if still within START_WINDOW of its due time. Caller commits."""
+    run = await session.get(WeeklyReportRun, week_start)
+    if run is not None or now >= due_at(week_start) + START_WINDOW:
+        return run
+    await session.execute(
+        insert(WeeklyReportRun)
+        .values(week_start=week_start, last_user_id=0, sent=0)
+        .on_conflict_do_nothing(index_elements=["week_start"])
+    )
+    return await session.get(WeeklyReportRun, week_start, populate_existing=True)
+
+
+async def checkpoint(session: AsyncSession, week_start: date, last_user_id: int, sent: int) -> None:
+    """Record that every user up to `last_user_id` was handled. Caller commits."""
+    await session.execute(
+        update(WeeklyReportRun)
+        .where(WeeklyReportRun.week_start == week_start)
+        .values(last_user_id=last_user_id, sent=WeeklyReportRun.sent + sent)
+    )
+
+
+async def finish(session: AsyncSession, week_start: date) -> None:
+    """Mark the week delivered; later ticks leave it alone. Caller commits."""
+    await session.execute(
+        update(WeeklyReportRun)
+        .where(WeeklyReportRun.week_start == week_start)
+        .values(finished_at=func.now())
+    )
@@ -5,6 +5,7 @@ import random
 from aiogram import Bot
 
 from app.core.levels import MAX_LEVEL, get_required_xp
+from app.services import user_service
 from app.texts import t
 
 LEVEL_PHRASES = {
@@ -62,3 +63,4 @@ async def add_xp(user, session, bot: Bot) -> None:
             pass
 
     await session.flush()
+    user_service.invalidate(user.telegram_id, session)
@@ -0,0 +1,275 @@
+"""Outbound Telegram gateway — one paced, prioritised path for every API call.
+
+Installed as a request middleware on each Bot session, so handler replies,
+scheduler jobs and service notifications all pass through it unchanged.
+Sending methods wait for a token from a per-bot bucket (~30 msg/s) and a
+per-chat bucket (~1 msg/s with a small burst); waiters are released by
+priority class, FIFO within a class, so interactive replies overtake a
+reminder backlog, which overtakes reports. Callers may fan out sends
+concurrently: the gateway keeps the pace. RetryAfter pauses the chat (or
+the whole bot for chat-less calls) and the call is retried.
+
+The priority class is taken from a context variable: handlers default to
+INTERACTIVE, background jobs opt in with `with_priority` / `priority`.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage,
+    ForwardMessage,
+    SendAnimation,
+    SendAudio,
+    SendContact,
+    SendDice,
+    SendDocument,
+    SendInvoice,
+    SendLocation,
+    SendMediaGroup,
+    SendMessage,
+    SendPhoto,
+    SendPoll,
+    SendSticker,
+    SendVenue,
+    SendVideo,
+    SendVideoNote,
+    SendVoice,
+    TelegramMethod,
+)
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+REMINDER = 1
+BULK = 2
+CLASS_NAMES = {INTERACTIVE: "interactive", REMINDER: "reminder", BULK: "bulk"}
+
+MAX_RETRIES = 3
+SCAN_DEPTH = 64  # waiters per class looked at for a chat that is ready
+SWEEP_INTERVAL = 60.0  # seconds between drops of idle per-chat buckets
+
+# Methods that post a message and count towards Telegram's flood limits
+PACED_METHODS = (
+    SendMessage, SendPhoto, SendDocument, SendDice, SendSticker, SendAnimation,
+    SendVideo, SendVideoNote, SendAudio, SendVoice, SendMediaGroup, SendInvoice,
+    SendLocation, SendContact, SendPoll, SendVenue, CopyMessage, ForwardMessage,
+)
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("telegram_priority", default=INTERACTIVE)
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+@contextmanager
+def priority(cls: int) -> Iterator[None]:
+    """Sends inside the block (and tasks started in it) use priority class `cls`."""
+    token = _priority.set(cls)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def with_priority(cls: int) -> Callable[[F], F]:
+    """Decorator form of `priority` for background jobs."""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with priority(cls):
+                return await fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+class _Bucket:
+    __slots__ = ("blocked_until", "capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float, now: float) -> None:
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, now: float) -> float:
+        """Seconds until a token can be taken (0 if now)."""
+        self._refill(now)
+        return max(self.blocked_until - now, (1.0 - self.tokens) / self.rate if self.tokens < 1.0 else 0.0)
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1.0
+
+    def idle(self, now: float) -> bool:
+        """Full and not paused: indistinguishable from a fresh bucket."""
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+class TelegramGateway(BaseRequestMiddleware):
+    def __init__(self, rate: float, chat_rate: float, chat_burst: float) -> None:
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._global = _Bucket(rate, rate, time.monotonic())
+        self._chats: dict[Any, _Bucket] = {}
+        self._queues: dict[int, deque[tuple[Any, asyncio.Future]]] = {cls: deque() for cls in CLASS_NAMES}
+        self._wakeup = asyncio.Event()
+        self._pump: asyncio.Task | None = None
+        self._next_sweep = 0.0
+        self._sent = {cls: 0 for cls in CLASS_NAMES}
+        self._latency_total = {cls: 0.0 for cls in CLASS_NAMES}
+        self._latency_max = {cls: 0.0 for cls in CLASS_NAMES}
+        self._retry_after = 0
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Any:
+        paced = isinstance(method, PACED_METHODS)
+        cls = _priority.get()
+        chat = getattr(method, "chat_id", None)
+        started = time.monotonic()
+        for attempt in range(MAX_RETRIES + 1):
+            if paced:
+                await self._acquire(cls, chat)
+            try:
+                result = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self._retry_after += 1
+                if attempt == MAX_RETRIES:
+                    raise
+                logger.warning("RetryAfter %ss for chat=%s (%s)", e.retry_after, chat, type(method).__name__)
+                self._pause(chat, e.retry_after)
+                if not paced:
+                    await asyncio.sleep(e.retry_after)
+                continue
+            if paced:
+                self._record(cls, time.monotonic() - started)
+            return result
+
+    def _pause(self, chat: Any, seconds: float) -> None:
+        now = time.monotonic()
+        bucket = self._global if chat is None else self._chat_bucket(chat, now)
+        bucket.blocked_until = max(bucket.blocked_until, now + seconds)
+        self._wakeup.set()
+
+    def _chat_bucket(self, chat: Any, now: float) -> _Bucket:
+        bucket = self._chats.get(chat)
+        if bucket is None:
+            bucket = self._chats[chat] = _Bucket(self.chat_burst, self.chat_rate, now)
+        return bucket
+
+    def _record(self, cls: int, latency: float) -> None:
+        self._sent[cls] += 1
+        self._latency_total[cls] += latency
+        self._latency_max[cls] = max(self._latency_max[cls], latency)
+
+    async def _acquire(self, cls: int, chat: Any) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._queues[cls].append((chat, future))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run())
+        self._wakeup.set()
+        await future
+
+    def _next_ready(self, now: float) -> tuple[float, Any]:
+        """Release the best ready waiter; else (seconds until one may be ready, None)."""
+        soonest = float("inf")
+        for cls in sorted(self._queues):
+            queue = self._queues[cls]
+            while queue and queue[0][1].done():  # cancelled while waiting
+                queue.popleft()
+            for i, (chat, future) in enumerate(queue):
+                if i >= SCAN_DEPTH:
+                    break
+                if future.done():
+                    continue
+                wait = self._chat_bucket(chat, now).wait(now) if chat is not None else 0.0
+                if wait <= 0:
+                    del queue[i]
+                    return 0.0, (chat, future)
+                soonest = min(soonest, wait)
+        return soonest, None
+
+    async def _run(self) -> None:
+        while any(self._queues.values()):
+            now = time.monotonic()
+            if now >= self._next_sweep:
+                self._chats = {chat: b for chat, b in self._chats.items() if not b.idle(now)}
+                self._next_sweep = now + SWEEP_INTERVAL
+            wait = self._global.wait(now)
+            if wait <= 0:
+                wait, ready = self._next_ready(now)
+                if ready is not None:
+                    chat, future = ready
+                    self._global.take(now)
+                    if chat is not None:
+                        self._chats[chat].take(now)
+                    future.set_result(None)
+                    continue
+            if wait == float("inf"):
+                wait = 1.0
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        """Queue depth and send latency per priority class since start."""
+        classes = {}
+        for cls, name in CLASS_NAMES.items():
+            sent = self._sent[cls]
+            classes[name] = {
+                "queued": sum(1 for _, f in self._queues[cls] if not f.done()),
+                "sent": sent,
+                "avg_latency_ms": round(self._latency_total[cls] / sent * 1000, 1) if sent else 0.0,
+                "max_latency_ms": round(self._latency_max[cls] * 1000, 1),
+            }
+        return {"classes": classes, "retry_after": self._retry_after, "chats_tracked": len(self._chats)}
+
+
+_gateway: TelegramGateway | None = None
+
+
+def get_gateway() -> TelegramGateway:
+    """Process-wide gateway, shared by every Bot instance of this process."""
+    global _gateway
+    if _gateway is None:
+        _gateway = TelegramGateway(
+            rate=settings.outbound_rate,
+            chat_rate=settings.outbound_chat_rate,
+            chat_burst=settings.outbound_chat_burst,
+        )
+    return _gateway
+
+
+def install(bot: Bot) -> Bot:
+    """Route all API calls of `bot` through the gateway."""
+    bot.session.middleware(get_gateway())
+    return bot
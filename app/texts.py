@@ -153,6 +153,8 @@ TEXTS = {
         "statistics": "Статистика",
         "done_habits": "Сделано привычек",
         "skipped_habits": "Пропуски",
+        "current_streak": "Текущая серия",
+        "longest_streak": "Лучшая серия",
         "btn_statistics": "📊 Статистика",
         "btn_achievements": "🏆 Достижения",
         "achievements_title": "🏆 Достижения",
@@ -338,6 +340,8 @@ TEXTS = {
         "statistics": "Statistics",
         "done_habits": "Completed habits",
         "skipped_habits": "Skipped",
+        "current_streak": "Current streak",
+        "longest_streak": "Best streak",
         "btn_statistics": "📊 Statistics",
         "btn_achievements": "🏆 Achievements",
         "achievements_title": "🏆 Achievements",
@@ -524,6 +528,8 @@ TEXTS = {
         "statistics": "الإحصائيات",
         "done_habits": "العادات المنجزة",
         "skipped_habits": "تم التخطي",
+        "current_streak": "السلسلة الحالية",
+        "longest_streak": "أفضل سلسلة",
         "btn_statistics": "📊 الإحصائيات",
         "btn_achievements": "🏆 الإنجازات",
         "achievements_title": "🏆 الإنجازات",
@@ -91,34 +91,33 @@ EMOJI_RE = re.compile(
 
 MAX_EMOJI_RATIO = 0.7  # max 70% of text can be emoji
 
-
-def _is_in_pua(char: str) -> bool:
-    """Check if character is in Private Use Area."""
-    cp = ord(char)
-    return any(start <= cp <= end for start, end in PUA_RANGES)
-
-
-def _is_tag_char(char: str) -> bool:
-    """Check if character is a tag character."""
-    return ord(char) in TAG_RANGE
+# Everything strip_invisible removes, precomputed: BMP code points as a
+# str.translate deletion table, astral ranges (tags, supplementary variation
+# selectors, supplementary PUA) as one character class.
+_BMP_PUA = next((start, end) for start, end in PUA_RANGES if end <= 0xFFFF)
+_DELETE_TABLE = dict.fromkeys(
+    [ord(ch) for ch in INVISIBLE_CHARS | BIDI_OVERRIDES | VARIATION_SELECTORS]
+    + list(range(_BMP_PUA[0], _BMP_PUA[1] + 1)),
+)
+_ASTRAL_STRIP_RE = re.compile(
+    "["
+    + "".join(
+        f"{chr(start)}-{chr(end)}"
+        for start, end in [
+            (TAG_RANGE.start, TAG_RANGE.stop - 1),
+            (min(map(ord, VARIATION_SELECTORS_SUPPLEMENT)), max(map(ord, VARIATION_SELECTORS_SUPPLEMENT))),
+            *[(start, end) for start, end in PUA_RANGES if start > 0xFFFF],
+        ]
+    )
+    + "]+"
+)
 
 
 def strip_invisible(text: str) -> str:
     """Remove all invisible and zero-width characters."""
-    result = []
-    for ch in text:
-        if ch in INVISIBLE_CHARS:
-            continue
-        if ch in BIDI_OVERRIDES:
-            continue
-        if ch in VARIATION_SELECTORS or ch in VARIATION_SELECTORS_SUPPLEMENT:
-            continue
-        if _is_tag_char(ch):
-            continue
-        if _is_in_pua(ch):
-            continue
-        result.append(ch)
-    return "".join(result)
+    if text.isascii():
+        return text
+    return _ASTRAL_STRIP_RE.sub("", text.translate(_DELETE_TABLE))
 
 
 def normalize_unicode(text: str) -> str:
@@ -161,6 +160,9 @@ def sanitize_text(text: str, max_length: int = MAX_MESSAGE_LENGTH) -> str | None
     5. Strip bidirectional overrides
     6. Emoji bomb check
     7. Whitespace normalization
+
+    Pure-ASCII text (most messages) has nothing for steps 2-6 to change or
+    reject, so it skips straight to whitespace normalization.
     """
     if not text:
         return None
@@ -169,18 +171,19 @@ def sanitize_text(text: str, max_length: int = MAX_MESSAGE_LENGTH) -> str | None
     if len(text) > max_length:
         return None
 
-    # Normalize
-    text = normalize_unicode(text)
+    if not text.isascii():
+        # Normalize
+        text = normalize_unicode(text)
 
-    # Zalgo
-    text = strip_zalgo(text)
+        # Zalgo
+        text = strip_zalgo(text)
 
-    # Emoji bomb
-    if is_emoji_bomb(text):
-        return None
+        # Emoji bomb
+        if is_emoji_bomb(text):
+            return None
 
-    # Collapse multiple whitespace
-    text = re.sub(r"\s+", " ", text).strip()
+    # Collapse multiple whitespace (str.split() splits on the same set as \s)
+    text = " ".join(text.split())
 
     if not text:
         return None
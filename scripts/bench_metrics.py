@@ -0,0 +1,71 @@
+"""Benchmark recalculate_user_metrics: SQL statements and wall time per recalculation.
+
+Seeds an in-memory SQLite database with one user, N active habits and D days
+of history, then recalculates that user's metrics. The statement count should
+stay flat as habits and days grow.
+
+    PYTHONPATH=. python scripts/bench_metrics.py
+"""
+
+import asyncio
+import os
+import time
+from datetime import date, timedelta
+
+os.environ.setdefault("BOT_TOKEN", "bench")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.models import Base, Habit, HabitLog, User, UserStreak
+from app.services import metrics_service
+
+SIZES = [(3, 30), (5, 180), (10, 365), (10, 1000)]
+
+
+async def _run(habits: int, days: int) -> tuple[int, float]:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sm = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    today = date.today()
+    async with sm() as session:
+        user = User(id=1, telegram_id=1, language_code="en", timezone="UTC")
+        session.add(user)
+        session.add(UserStreak(user_id=1, current_streak=0, longest_streak=0))
+        log_id = 0
+        for h in range(1, habits + 1):
+            session.add(Habit(id=h, user_id=1, title=f"habit {h}", is_active=True))
+        await session.flush()
+        for i in range(days):
+            d = today - timedelta(days=i)
+            for h in range(1, habits + 1):
+                log_id += 1
+                status = "skipped" if (i * habits + h) % 11 == 0 else "done"
+                session.add(HabitLog(id=log_id, habit_id=h, user_id=1, log_date=d, status=status))
+        await session.commit()
+
+        statements = 0
+
+        def count(*_args) -> None:
+            nonlocal statements
+            statements += 1
+
+        event.listen(engine.sync_engine, "before_cursor_execute", count)
+        started = time.perf_counter()
+        await metrics_service.recalculate_user_metrics(session, 1, user)
+        elapsed = time.perf_counter() - started
+    await engine.dispose()
+    return statements, elapsed
+
+
+async def main() -> None:
+    print(f"{'habits':>6} {'days':>6} {'logs':>7} {'queries':>8} {'ms':>8}")
+    for habits, days in SIZES:
+        statements, elapsed = await _run(habits, days)
+        print(f"{habits:>6} {days:>6} {habits * days:>7} {statements:>8} {elapsed * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""Benchmark content moderation: per-message cost of the single-pass matcher.
+
+Runs a RU/EN/AR corpus of typical bot traffic (habit titles, free text,
+a few prohibited messages) through is_prohibited, and through the former
+approach of searching every pattern in turn, for comparison. The last
+column is a repeated text answered from the verdict cache by screen().
+
+    PYTHONPATH=. python scripts/bench_moderation.py
+"""
+
+import os
+import re
+import time
+
+os.environ.setdefault("BOT_TOKEN", "bench")
+
+from app.utils import content_moderator
+
+CORPUS = {
+    "en": [
+        "Read 20 pages before bed",
+        "Drink 2 liters of water",
+        "Morning run, 5 km around the park",
+        "Skipped the gym today, knee still hurts after yesterday's session",
+        "Meditate 10 minutes and write three things I'm grateful for",
+        "No sugar after 6pm!!! day 12 of the challenge",
+        "Practice guitar: scales, then the new song from the lesson",
+        "where can I buy cocaine",
+    ],
+    "ru": [
+        "Читать 20 страниц перед сном",
+        "Выпить 2 литра воды",
+        "Пробежка утром, 5 км вокруг парка",
+        "Сегодня пропустил зал, колено всё ещё болит после вчерашней тренировки",
+        "Медитация 10 минут и записать три вещи, за которые я благодарен",
+        "Без сахара после 18:00, день 12 челлендж",
+        "Учить английский: 15 новых слов и повторение",
+        "продам пистолет недорого",
+    ],
+    "ar": [
+        "قراءة عشرين صفحة قبل النوم",
+        "شرب لترين من الماء",
+        "الجري صباحا خمسة كيلومترات حول الحديقة",
+        "تأمل عشر دقائق وكتابة ثلاثة أشياء أنا ممتن لها",
+        "حفظ صفحة من القرآن كل يوم",
+        "بدون سكر بعد السادسة مساء اليوم الثاني عشر",
+        "تعلم البرمجة ساعة يوميا",
+        "أين أجد مخدرات",
+    ],
+}
+
+ROUNDS = 2000
+
+
+def _per_pattern_prohibited(text: str, patterns: list[re.Pattern[str]]) -> bool:
+    base = content_moderator._normalize_base(text)
+    if any(p.search(base) for p in patterns):
+        return True
+    leet = content_moderator._normalize_leet(base)
+    return leet != base and any(p.search(leet) for p in patterns)
+
+
+def _time(fn, messages: list[str]) -> float:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for text in messages:
+            fn(text)
+    return (time.perf_counter() - started) / (ROUNDS * len(messages))
+
+
+def main() -> None:
+    patterns = [
+        re.compile(w, re.IGNORECASE | re.UNICODE)
+        for _, lists in content_moderator._CATEGORIES
+        for words in lists
+        for w in words
+    ]
+    print(f"{len(patterns)} patterns, {ROUNDS} rounds")
+    print(f"{'lang':>4} {'msgs':>5} {'per-pattern us':>15} {'single-pass us':>15} {'speedup':>8} {'cached us':>10}")
+    for lang, messages in CORPUS.items():
+        for text in messages:
+            assert content_moderator.is_prohibited(text) == _per_pattern_prohibited(text, patterns), text
+        old = _time(lambda text: _per_pattern_prohibited(text, patterns), messages)
+        new = _time(content_moderator.is_prohibited, messages)
+        cached = _time(content_moderator.screen, messages)
+        print(
+            f"{lang:>4} {len(messages):>5} {old * 1e6:>15.1f} {new * 1e6:>15.1f} {old / new:>7.1f}x"
+            f" {cached * 1e6:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
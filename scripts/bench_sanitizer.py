@@ -0,0 +1,99 @@
+"""Benchmark sanitize_text against the former per-character pipeline.
+
+The former implementation is reproduced here as the reference: it walked the
+text one character at a time for strip_invisible and ran NFC, Zalgo, emoji
+and whitespace regexes on every message. Outputs must agree on the corpus
+and on the tests/test_input_sanitizer.py inputs.
+
+    PYTHONPATH=. python scripts/bench_sanitizer.py
+"""
+
+import os
+import re
+import time
+import unicodedata
+
+os.environ.setdefault("BOT_TOKEN", "bench")
+
+from app.utils import input_sanitizer as s
+
+CORPUS = {
+    "ascii": [
+        "Read 20 pages before bed",
+        "/start",
+        "Morning run, 5 km around the park   ",
+        "Skipped the gym today, knee still hurts after yesterday's session",
+        "07:30",
+    ],
+    "ru": [
+        "Читать 20 страниц перед сном",
+        "Пробежка утром, 5 км вокруг парка",
+        "Сегодня пропустил зал, колено всё ещё болит",
+    ],
+    "ar": [
+        "قراءة عشرين صفحة قبل النوم",
+        "حفظ صفحة من القرآن كل يوم",
+    ],
+    "emoji/hostile": [
+        "Drink water 💧💧",
+        "hello\u200Bworld\u202E",
+        "z\u0301\u0302\u0303\u0304a\u0305\u0306\u0307lgo",
+        "\U000E0041tag\U000F0001pua\uFE0F",
+    ],
+}
+
+SPEC_INPUTS = [
+    "hello\u200Bworld", "abc\u202Edef", "\uFEFFhello", "Hello World 123!",
+    "\u200B\u200C\u200Dhello\u2060\uFEFF", "e\u0301", "\u0301\u0302\u0303\u0304x",
+    "café", "😀" * 20, "😀😀", "", " " * 5, "a" * 1001, "a   b\n\tc", "\u200B\u200C",
+]
+
+ROUNDS = 5000
+
+
+def _legacy_strip_invisible(text: str) -> str:
+    result = []
+    for ch in text:
+        if ch in s.INVISIBLE_CHARS or ch in s.BIDI_OVERRIDES:
+            continue
+        if ch in s.VARIATION_SELECTORS or ch in s.VARIATION_SELECTORS_SUPPLEMENT:
+            continue
+        cp = ord(ch)
+        if cp in s.TAG_RANGE or any(start <= cp <= end for start, end in s.PUA_RANGES):
+            continue
+        result.append(ch)
+    return "".join(result)
+
+
+def _legacy_sanitize(text: str, max_length: int = s.MAX_MESSAGE_LENGTH) -> str | None:
+    if not text or len(text) > max_length:
+        return None
+    text = _legacy_strip_invisible(unicodedata.normalize("NFC", text))
+    text = s.ZALGO_RE.sub("", text)
+    if s.is_emoji_bomb(text):
+        return None
+    text = re.sub(r"\s+", " ", text).strip()
+    return text or None
+
+
+def _time(fn, messages: list[str]) -> float:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for text in messages:
+            fn(text)
+    return (time.perf_counter() - started) / (ROUNDS * len(messages))
+
+
+def main() -> None:
+    for text in SPEC_INPUTS + [t for messages in CORPUS.values() for t in messages]:
+        assert s.sanitize_text(text) == _legacy_sanitize(text), repr(text)
+    print(f"{ROUNDS} rounds")
+    print(f"{'corpus':>14} {'msgs':>5} {'legacy us':>10} {'new us':>8} {'speedup':>8}")
+    for name, messages in CORPUS.items():
+        old = _time(_legacy_sanitize, messages)
+        new = _time(s.sanitize_text, messages)
+        print(f"{name:>14} {len(messages):>5} {old * 1e6:>10.2f} {new * 1e6:>8.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Tests for the achievement check queue: leases, completion and retries."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.models import AchievementCheck, User
+from app.models.base import Base
+from app.services import achievement_check_service
+from app.services.achievement_check_service import LEASE, MAX_ATTEMPTS, Claim, merge_triggers, retry_delay
+
+NOW = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+def _with_queue(tmp_path, scenario):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'checks.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sm = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with sm() as session:
+            session.add(User(id=1, telegram_id=42, language_code="en", timezone="UTC"))
+            session.add(AchievementCheck(user_id=1, triggers="habit_done", created_at=NOW))
+            await session.commit()
+        try:
+            async with sm() as session:
+                return await scenario(session)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+async def _row(session) -> AchievementCheck | None:
+    return (
+        await session.execute(select(AchievementCheck).execution_options(populate_existing=True))
+    ).scalar_one_or_none()
+
+
+class TestMergeTriggers:
+    def test_union_is_sorted_and_deduplicated(self):
+        assert merge_triggers("habit_done") == "habit_done"
+        assert merge_triggers("b,a", "a") == "a,b"
+        assert merge_triggers("a,b", "b,c", "") == "a,b,c"
+
+    def test_enqueue_merges_as_a_set_in_sql(self):
+        statements = []
+
+        class _Session:
+            async def execute(self, stmt):
+                statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+
+        asyncio.run(achievement_check_service.enqueue(_Session(), 1, "b,a"))
+        [sql] = statements
+        assert "string_agg(DISTINCT t.name" in sql
+        assert "unnest(string_to_array(achievement_checks.triggers" in sql
+        assert "strpos" not in sql
+
+
+class TestEnqueueGuarded:
+    def test_failure_keeps_the_callers_work(self, tmp_path, monkeypatch):
+        async def broken(*args):
+            raise RuntimeError("queue unavailable")
+
+        monkeypatch.setattr(achievement_check_service, "enqueue", broken)
+
+        async def scenario(session):
+            user = await session.get(User, 1)
+            user.language_code = "ar"
+            await achievement_check_service.enqueue_guarded(session, 1, "subscription_purchased")
+            await session.commit()
+            return (await session.execute(select(User.language_code))).scalar_one()
+
+        assert _with_queue(tmp_path, scenario) == "ar"
+
+
+class TestRetryDelay:
+    def test_doubles_per_failure(self):
+        assert retry_delay(1) == timedelta(seconds=30)
+        assert retry_delay(2) == timedelta(seconds=60)
+        assert retry_delay(4) == timedelta(seconds=240)
+
+
+class TestLease:
+    def test_claim_leases_instead_of_deleting(self, tmp_path):
+        async def scenario(session):
+            first = await achievement_check_service.claim(session, NOW)
+            again = await achievement_check_service.claim(session, NOW + LEASE / 2)
+            row = await _row(session)
+            return first, again, row
+
+        first, again, row = _with_queue(tmp_path, scenario)
+        assert first == [Claim(1, "habit_done", 0, 0)]
+        assert again == []
+        assert row is not None
+
+    def test_expired_lease_is_handed_out_again(self, tmp_path):
+        async def scenario(session):
+            await achievement_check_service.claim(session, NOW)
+            return await achievement_check_service.claim(session, NOW + LEASE)
+
+        assert _with_queue(tmp_path, scenario) == [Claim(1, "habit_done", 0, 0)]
+
+    def test_complete_deletes(self, tmp_path):
+        async def scenario(session):
+            [check] = await achievement_check_service.claim(session, NOW)
+            await achievement_check_service.complete(session, check)
+            return await _row(session)
+
+        assert _with_queue(tmp_path, scenario) is None
+
+    def test_complete_keeps_triggers_queued_meanwhile(self, tmp_path):
+        async def scenario(session):
+            [check] = await achievement_check_service.claim(session, NOW)
+            row = await _row(session)
+            row.version += 1
+            row.triggers = "habit_done,streak"
+            await session.flush()
+            await achievement_check_service.complete(session, check)
+            return await _row(session)
+
+        row = _with_queue(tmp_path, scenario)
+        assert row.triggers == "habit_done,streak"
+        assert row.claimed_until is None
+
+
+class TestFail:
+    def test_backs_off(self, tmp_path):
+        async def scenario(session):
+            [check] = await achievement_check_service.claim(session, NOW)
+            dropped = await achievement_check_service.fail(session, check, NOW)
+            during = await achievement_check_service.claim(session, NOW + retry_delay(1) / 2)
+            after = await achievement_check_service.claim(session, NOW + retry_delay(1))
+            return dropped, during, after
+
+        dropped, during, after = _with_queue(tmp_path, scenario)
+        assert dropped is False
+        assert during == []
+        assert after == [Claim(1, "habit_done", 0, 1)]
+
+    def test_drops_after_max_attempts(self, tmp_path):
+        async def scenario(session):
+            [check] = await achievement_check_service.claim(session, NOW)
+            dropped = await achievement_check_service.fail(session, check._replace(attempts=MAX_ATTEMPTS - 1), NOW)
+            return dropped, await _row(session)
+
+        assert _with_queue(tmp_path, scenario) == (True, None)
+
+    def test_drop_keeps_triggers_queued_meanwhile(self, tmp_path):
+        async def scenario(session):
+            [check] = await achievement_check_service.claim(session, NOW)
+            row = await _row(session)
+            row.version += 1
+            row.triggers = "habit_done,streak"
+            await session.flush()
+            await achievement_check_service.fail(session, check._replace(attempts=MAX_ATTEMPTS - 1), NOW)
+            return await _row(session)
+
+        row = _with_queue(tmp_path, scenario)
+        assert row.triggers == "habit_done,streak"
+        assert (row.attempts, row.claimed_until) == (0, None)
@@ -0,0 +1,151 @@
+"""Tests for achievement evaluation — declared inputs, trigger filtering, unlocked bitmask, unlock message."""
+
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.models import Achievement, User, UserAchievement, UserMetrics
+from app.models.base import Base
+from app.services import achievement_service
+from app.services.achievement_service import (
+    CONDITIONS,
+    MASK_BITS,
+    TRIGGER_INPUTS,
+    conditions_for,
+    format_unlock_message,
+    mask_of,
+)
+from app.services.metrics_service import metrics_to_dict
+
+
+def _zero_metrics() -> UserMetrics:
+    return UserMetrics(
+        user_id=1,
+        **{c.name: c.default.arg for c in UserMetrics.__table__.columns if c.default is not None},
+    )
+
+
+class TestDeclaredInputs:
+    def test_inputs_are_metric_keys(self):
+        keys = set(metrics_to_dict(_zero_metrics()))
+        for code, (inputs, _fn) in CONDITIONS.items():
+            assert inputs and set(inputs) <= keys, code
+
+    def test_trigger_inputs_are_metric_keys(self):
+        keys = set(metrics_to_dict(_zero_metrics()))
+        for trigger, changed in TRIGGER_INPUTS.items():
+            assert changed is None or changed <= keys, trigger
+
+    def test_conditions_evaluate_on_zero_metrics(self):
+        metrics = metrics_to_dict(_zero_metrics())
+        assert not any(fn(metrics) for _inputs, fn in CONDITIONS.values())
+
+
+class TestConditionsFor:
+    def test_subscription_only_touches_subscription_conditions(self):
+        assert conditions_for("subscription_purchased") == ["SUPPORTER_1M", "CHOICE_3M", "PLAN_6M", "INVESTOR_12M"]
+
+    def test_habit_completed_skips_unrelated(self):
+        codes = conditions_for("habit_completed")
+        assert "STREAK_7" in codes and "MARK_50" in codes
+        assert "FIRST_FRIEND" not in codes and "SUPPORTER_1M" not in codes
+
+    def test_unknown_or_empty_trigger_evaluates_all(self):
+        assert conditions_for("") == list(CONDITIONS)
+        assert conditions_for("user_returns") == list(CONDITIONS)
+        assert conditions_for("something_new") == list(CONDITIONS)
+
+    def test_coalesced_triggers_union(self):
+        codes = conditions_for("habit_completed,subscription_purchased")
+        assert codes == [c for c in CONDITIONS if c in set(conditions_for("habit_completed")) | set(
+            conditions_for("subscription_purchased")
+        )]
+        assert conditions_for("habit_completed,user_returns") == list(CONDITIONS)
+
+
+class TestMask:
+    def test_mask_of_ids(self):
+        assert mask_of([]) == 0
+        assert mask_of([1, 3]) == 0b1010
+
+    def test_id_too_large(self):
+        assert mask_of([1, MASK_BITS]) is None
+
+
+def _unlocked_mask_with(tmp_path, stamp):
+    """Unlocked mask for a user whose stored mask 0b110 carries `stamp(fingerprint)`;
+    bit 2 is stale (its user_achievements row has been deleted)."""
+
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ach.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sm = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        achievement_service.invalidate_catalog()
+        try:
+            async with sm() as session:
+                session.add(User(id=1, telegram_id=42, language_code="en", timezone="UTC"))
+                session.add_all([_ach("FIRST_STEP"), _ach("AWARE_START")])
+                await session.flush()
+                session.add(UserAchievement(id=1, user_id=1, achievement_id=1))
+                await session.commit()
+            async with sm() as session:
+                catalog = await achievement_service.get_catalog(session)
+                m = UserMetrics(
+                    user_id=1,
+                    achievements_mask=0b110,
+                    achievements_catalog=stamp(achievement_service.catalog_fingerprint(catalog)),
+                )
+                session.add(m)
+                await session.flush()
+                mask = await achievement_service._unlocked_mask(session, 1, m)
+                return mask, m.achievements_mask, m.achievements_catalog == achievement_service.catalog_fingerprint(catalog)
+        finally:
+            achievement_service.invalidate_catalog()
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+class TestMaskFingerprint:
+    def test_mask_of_current_catalog_is_used(self, tmp_path):
+        assert _unlocked_mask_with(tmp_path, lambda fp: fp) == (0b110, 0b110, True)
+
+    def test_mask_of_another_catalog_is_rebuilt_from_rows(self, tmp_path):
+        assert _unlocked_mask_with(tmp_path, lambda fp: fp + 1) == (0b10, 0b10, True)
+
+    def test_unstamped_mask_is_rebuilt(self, tmp_path):
+        assert _unlocked_mask_with(tmp_path, lambda fp: None) == (0b10, 0b10, True)
+
+    def test_fingerprint_follows_ids_and_codes(self):
+        first, second = _ach("FIRST_STEP"), _ach("AWARE_START")
+        first.id, second.id = 1, 2
+        fp = achievement_service.catalog_fingerprint([first, second])
+        assert fp == achievement_service.catalog_fingerprint([first, second])
+        second.code = "DAY_ARCHITECT"
+        assert fp != achievement_service.catalog_fingerprint([first, second])
+
+
+def _ach(code: str) -> Achievement:
+    return Achievement(
+        code=code,
+        name_ru=f"{code} ru",
+        name_en=f"{code} en",
+        description_ru="",
+        description_en="",
+        unlock_msg_ru="поздравляем",
+        unlock_msg_en="congrats",
+    )
+
+
+class TestFormatUnlockMessage:
+    def test_single(self):
+        assert format_unlock_message([_ach("FIRST_MARK")], "en") == "🏆 FIRST_MARK en\n\ncongrats"
+
+    def test_combined_in_one_message(self):
+        text = format_unlock_message([_ach("FIRST_MARK"), _ach("FIRST_10")], "ru")
+        assert text.count("🏆") == 2
+        assert "FIRST_MARK ru" in text and "FIRST_10 ru" in text
+
+    def test_arabic_uses_english(self):
+        assert "FIRST_MARK en" in format_unlock_message([_ach("FIRST_MARK")], "ar")
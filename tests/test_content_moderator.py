@@ -1,8 +1,13 @@
 """Tests for content moderation — banned words, leetspeak, multilingual."""
 
+import re
+
 import pytest
 
+from app.utils import content_moderator
 from app.utils.content_moderator import (
+    _CATEGORIES,
+    _check_patterns,
     check_content,
     is_prohibited,
     is_safe_habit_title,
@@ -104,3 +109,81 @@ class TestIsSafeHabitTitle:
 
     def test_safe_russian_title(self):
         assert is_safe_habit_title("Пить воду каждый день") is True
+
+
+class TestSinglePassMatcher:
+    """The combined matcher agrees with searching every pattern one by one."""
+
+    @staticmethod
+    def _naive(text):
+        return any(
+            re.search(w, text, re.IGNORECASE)
+            for _, lists in _CATEGORIES for words in lists for w in words
+        )
+
+    def _samples(self):
+        samples = [
+            "morning run 5 km", "skill up every day", "killer workout", "kill time before the someone",
+            "методичка по бомбардировке", "надо бомбу сделать", "трава во дворе, курить бросил",
+            "cp  links", "methodology", "buy a gun", "buy fresh bread", "3d printing a gun holder",
+            "قراءة القرآن", "شراء سلاح", "پیاده‌روی", "",
+        ]
+        for _, lists in _CATEGORIES:
+            for words in lists:
+                for w in words:
+                    samples.append(w.replace(".*", " and "))
+                    samples.append("prefix " + w.replace(".*", "") + " suffix")
+                    samples.append(w.split(".*")[0])
+        return samples
+
+    def test_agrees_with_per_pattern_search(self):
+        for text in self._samples():
+            assert (_check_patterns(text) is not None) == self._naive(text), text
+
+    def test_reports_category_and_pattern(self):
+        rule = _check_patterns("how to buy a gun")
+        assert rule.category == "weapons"
+        assert rule.pattern == "buy.*gun"
+
+    def test_stem_prefix_of_longer_stem(self):
+        # "meth" is a prefix of "methamphetamine"; both must still match
+        assert _check_patterns("meth").pattern == "meth"
+        assert _check_patterns("methamphetamine") is not None
+
+
+class TestVerdictCache:
+    def setup_method(self):
+        content_moderator.clear_verdict_cache()
+
+    def test_repeated_text_hits(self):
+        first = content_moderator.screen("Read 20 pages")
+        second = content_moderator.screen("Read 20 pages")
+        assert first == second == ("Read 20 pages", False)
+        stats = content_moderator.verdict_cache_stats()
+        assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+    def test_verdicts(self):
+        assert content_moderator.screen("buy cocaine now").prohibited is True
+        assert content_moderator.screen("\u200b\u200c").text is None
+        # moderation sees the sanitized text, so invisible separators don't hide a word
+        assert content_moderator.screen("co\u200bcaine").prohibited is True
+
+    def test_bounded(self, monkeypatch):
+        monkeypatch.setattr(content_moderator, "VERDICT_CACHE_SIZE", 3)
+        for i in range(5):
+            content_moderator.screen(f"text {i}")
+        assert content_moderator.verdict_cache_stats()["size"] == 3
+        content_moderator.screen("text 4")
+        assert content_moderator.verdict_cache_stats()["hits"] == 1
+
+    def test_rebuild_after_word_list_change_drops_verdicts(self):
+        assert content_moderator.screen("zzqword here").prohibited is False
+        assert content_moderator.rebuild() is False
+        content_moderator._DRUGS_EN.append("zzqword")
+        try:
+            assert content_moderator.rebuild() is True
+            assert content_moderator.verdict_cache_stats()["size"] == 0
+            assert content_moderator.screen("zzqword here").prohibited is True
+        finally:
+            content_moderator._DRUGS_EN.remove("zzqword")
+            content_moderator.rebuild()
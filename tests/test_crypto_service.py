@@ -1,13 +1,17 @@
 """Tests for crypto service — signature verification and webhook processing."""
 
+import asyncio
 import hashlib
 import hmac
 import base64
 import json
+from datetime import datetime, timezone
 
 import pytest
 
-from app.services.crypto_service import _sign_body, verify_webhook_signature
+from sqlalchemy.dialects import postgresql
+
+from app.services.crypto_service import ExpiredPayment, _sign_body, expire_pending, verify_webhook_signature
 
 
 TEST_API_KEY = "test_api_key_12345"
@@ -74,3 +78,31 @@ class TestVerifyWebhookSignature:
         # This should fail because data was modified
         result = verify_webhook_signature(data2, TEST_API_KEY)
         assert result is False
+
+
+class _RecordingSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        rows = self.rows
+
+        class _Result:
+            def all(self):
+                return rows
+
+        return _Result()
+
+
+class TestExpirePending:
+    def test_single_update_returning_owner(self):
+        session = _RecordingSession([(100, "en", 55), (200, None, None)])
+        expired = asyncio.run(expire_pending(session, datetime(2026, 10, 18, tzinfo=timezone.utc)))
+        assert expired == [ExpiredPayment(100, "en", 55), ExpiredPayment(200, None, None)]
+        assert len(session.statements) == 1
+        sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+        assert sql.startswith("UPDATE payments SET status=")
+        assert "FROM users WHERE payments.user_id = users.id" in sql
+        assert "RETURNING users.telegram_id, users.language_code, payments.invoice_message_id" in sql
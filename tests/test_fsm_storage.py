@@ -0,0 +1,154 @@
+"""Tests for the Postgres FSM storage cache and row keys."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import timedelta
+
+from aiogram.fsm.storage.base import StorageKey
+
+from app import fsm_storage
+from app.fsm_storage import PostgresStorage, storage_key
+from app.services import fsm_service
+
+KEY = StorageKey(bot_id=1, chat_id=2, user_id=3)
+
+
+class _FakeRows:
+    """Stand-in for the fsm_states table behind fsm_service."""
+
+    def __init__(self):
+        self.rows = {}
+        self.loads = 0
+        self.saves = []
+
+    def install(self, monkeypatch):
+        async def load(session, key, ttl):
+            self.loads += 1
+            state, data = self.rows.get(key, (None, {}))
+            return state, dict(data)
+
+        async def save_many(session, rows):
+            self.saves.append(rows)
+            for k, s, d in rows:
+                self.rows[k] = (s, dict(d))
+
+        async def notify(session, origin, keys):
+            pass
+
+        class _Session:
+            async def commit(self):
+                pass
+
+        @asynccontextmanager
+        async def session():
+            yield _Session()
+
+        monkeypatch.setattr(fsm_service, "load", load)
+        monkeypatch.setattr(fsm_service, "save_many", save_many)
+        monkeypatch.setattr(fsm_service, "notify", notify)
+        monkeypatch.setattr(fsm_storage, "get_session_maker", lambda: session)
+
+
+def _storage(monkeypatch, rows):
+    storage = PostgresStorage(ttl=timedelta(hours=1))
+    # Pretend the listener is up so the cache outlives an update
+    storage._listen_conn = object()
+    rows.install(monkeypatch)
+    return storage
+
+
+class TestStorageKey:
+    def test_format(self):
+        assert storage_key(KEY) == "1:2:3:::default"
+
+    def test_thread_and_business_connection(self):
+        key = StorageKey(bot_id=1, chat_id=2, user_id=3, thread_id=4, business_connection_id="b", destiny="x")
+        assert storage_key(key) == "1:2:3:4:b:x"
+
+
+class TestNotification:
+    def test_round_trip(self):
+        assert fsm_service.parse_notification("abc|k1\nk2") == ("abc", ["k1", "k2"])
+
+    def test_no_keys(self):
+        assert fsm_service.parse_notification("abc|") == ("abc", [])
+
+
+class TestWriteBackCache:
+    def test_writes_of_one_update_become_one_save(self, monkeypatch):
+        rows = _FakeRows()
+        storage = _storage(monkeypatch, rows)
+
+        async def update():
+            await storage.get_state(KEY)
+            await storage.set_state(KEY, "CreateHabitStates:title")
+            await storage.update_data(KEY, {"page": 1})
+            await storage.update_data(KEY, {"times": ["08:00"]})
+            await storage.flush()
+
+        asyncio.run(update())
+        assert rows.loads == 1
+        assert rows.saves == [[("1:2:3:::default", "CreateHabitStates:title", {"page": 1, "times": ["08:00"]})]]
+
+    def test_reads_served_from_cache_across_updates(self, monkeypatch):
+        rows = _FakeRows()
+        storage = _storage(monkeypatch, rows)
+
+        async def updates():
+            await storage.set_state(KEY, "s")
+            await storage.flush()
+            assert await storage.get_state(KEY) == "s"
+            assert await storage.get_data(KEY) == {}
+
+        asyncio.run(updates())
+        assert rows.loads == 1
+
+    def test_without_listener_cache_lives_for_one_update(self, monkeypatch):
+        rows = _FakeRows()
+        storage = _storage(monkeypatch, rows)
+        storage._listen_conn = None
+        storage._next_listen_attempt = float("inf")
+
+        async def updates():
+            await storage.get_state(KEY)
+            await storage.flush()
+            rows.rows["1:2:3:::default"] = ("other", {})
+            assert await storage.get_state(KEY) == "other"
+
+        asyncio.run(updates())
+        assert rows.loads == 2
+
+    def test_notification_from_other_process_drops_entry(self, monkeypatch):
+        rows = _FakeRows()
+        storage = _storage(monkeypatch, rows)
+
+        async def updates():
+            await storage.get_state(KEY)
+            rows.rows["1:2:3:::default"] = ("other", {})
+            storage._on_notify(None, 0, fsm_service.NOTIFY_CHANNEL, "elsewhere|1:2:3:::default")
+            assert await storage.get_state(KEY) == "other"
+
+        asyncio.run(updates())
+
+    def test_notification_during_load_skips_the_cache(self, monkeypatch):
+        rows = _FakeRows()
+        storage = _storage(monkeypatch, rows)
+        load = fsm_service.load
+
+        async def racing_load(session, key, ttl):
+            result = await load(session, key, ttl)
+            # Another process writes and notifies while our read is in flight
+            rows.rows[key] = ("other", {})
+            storage._on_notify(None, 0, fsm_service.NOTIFY_CHANNEL, f"elsewhere|{key}")
+            return result
+
+        monkeypatch.setattr(fsm_service, "load", racing_load)
+
+        async def updates():
+            assert await storage.get_state(KEY) is None
+            monkeypatch.setattr(fsm_service, "load", load)
+            assert await storage.get_state(KEY) == "other"
+
+        asyncio.run(updates())
+        assert rows.loads == 2
+        assert storage._loads == {}
@@ -3,8 +3,14 @@
 import pytest
 
 from app.utils.input_sanitizer import (
+    BIDI_OVERRIDES,
+    INVISIBLE_CHARS,
     MAX_HABIT_TITLE_LENGTH,
     MAX_MESSAGE_LENGTH,
+    PUA_RANGES,
+    TAG_RANGE,
+    VARIATION_SELECTORS,
+    VARIATION_SELECTORS_SUPPLEMENT,
     is_emoji_bomb,
     normalize_unicode,
     sanitize_habit_title,
@@ -32,6 +38,24 @@ class TestStripInvisible:
         text = "\u200B\u200C\u200Dhello\u2060\uFEFF"
         assert strip_invisible(text) == "hello"
 
+    def test_removes_astral_tags_selectors_and_pua(self):
+        text = "a\U000E0041b\U000E0100c\U000F0001d\U0010FFFDe\uE000f\uFE0Fg"
+        assert strip_invisible(text) == "abcdefg"
+
+    def test_keeps_astral_emoji_and_arabic(self):
+        assert strip_invisible("مرحبا 😀\U0001F44D") == "مرحبا 😀\U0001F44D"
+
+    def test_removes_exactly_the_listed_characters(self):
+        removed = (
+            INVISIBLE_CHARS | BIDI_OVERRIDES | VARIATION_SELECTORS | VARIATION_SELECTORS_SUPPLEMENT
+            | {chr(c) for c in TAG_RANGE}
+            | {chr(c) for start, end in PUA_RANGES for c in (start, (start + end) // 2, end)}
+        )
+        kept = {chr(c) for c in range(0x20, 0x3000)} | {chr(c) for c in (0xF900, 0x1F600, 0xE0080, 0xE01F0)}
+        samples = removed | kept
+        for ch in samples:
+            assert strip_invisible("x" + ch) == ("x" if ch in removed else "x" + ch), hex(ord(ch))
+
 
 class TestNormalizeUnicode:
     def test_nfc_normalization(self):
@@ -88,6 +112,9 @@ class TestSanitizeText:
         text = "a" * MAX_MESSAGE_LENGTH
         assert sanitize_text(text) is not None
 
+    def test_ascii_fast_path_collapses_all_whitespace(self):
+        assert sanitize_text(" a\t\tb\n\x0bc\x1f d ") == "a b c d"
+
     def test_collapses_whitespace(self):
         assert sanitize_text("hello   world") == "hello world"
 
@@ -0,0 +1,109 @@
+"""Tests for scheduler leader election and leader-only jobs."""
+
+import asyncio
+
+from app import leader as leader_module
+from app import scheduler
+from app.leader import SchedulerLeader
+
+
+class _FakeConn:
+    def __init__(self, locks: set):
+        self.locks = locks
+        self.closed = False
+        self.invalidated = False
+        self.alive = True
+
+    async def execution_options(self, **_kwargs):
+        return self
+
+    async def scalar(self, _stmt, params):
+        if params["key"] in self.locks:
+            return False
+        self.locks.add(params["key"])
+        return True
+
+    async def execute(self, stmt, params=None):
+        if not self.alive:
+            raise ConnectionError("server closed the connection")
+        if "unlock" in str(stmt):
+            self.locks.discard(params["key"])
+
+    async def invalidate(self):
+        self.invalidated = True
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeEngine:
+    def __init__(self):
+        self.locks = set()
+        self.conns = []
+
+    async def connect(self):
+        conn = _FakeConn(self.locks)
+        self.conns.append(conn)
+        return conn
+
+
+class TestSchedulerLeader:
+    def _run(self, monkeypatch, scenario):
+        engine = _FakeEngine()
+        monkeypatch.setattr(leader_module, "get_engine", lambda: engine)
+        return asyncio.run(scenario(engine))
+
+    def test_only_one_leader(self, monkeypatch):
+        async def scenario(_engine):
+            a, b = SchedulerLeader(key=1), SchedulerLeader(key=1)
+            await a._tick()
+            await b._tick()
+            return a.is_leader, b.is_leader
+
+        assert self._run(monkeypatch, scenario) == (True, False)
+
+    def test_follower_takes_over_after_stop(self, monkeypatch):
+        async def scenario(_engine):
+            a, b = SchedulerLeader(key=1), SchedulerLeader(key=1)
+            await a._tick()
+            await b._tick()
+            await a.stop()
+            await b._tick()
+            return a.is_leader, b.is_leader
+
+        assert self._run(monkeypatch, scenario) == (False, True)
+
+    def test_steps_down_when_connection_dies(self, monkeypatch):
+        async def scenario(engine):
+            a = SchedulerLeader(key=1)
+            await a._tick()
+            engine.conns[0].alive = False
+            engine.locks.clear()  # the server released the dead session's lock
+            await a._tick()
+            return engine.conns[0].invalidated, a.is_leader
+
+        invalidated, is_leader = self._run(monkeypatch, scenario)
+        assert invalidated is True
+        assert is_leader is True  # re-acquired on a fresh connection
+
+
+class TestLeaderOnly:
+    def test_job_skipped_on_followers(self, monkeypatch):
+        calls = []
+
+        async def job(bot):
+            calls.append(bot)
+
+        class _Follower:
+            is_leader = False
+
+        class _Leader:
+            is_leader = True
+
+        wrapped = scheduler._leader_only(job)
+        monkeypatch.setattr(scheduler, "get_leader", lambda: _Follower())
+        asyncio.run(wrapped("bot"))
+        monkeypatch.setattr(scheduler, "get_leader", lambda: _Leader())
+        asyncio.run(wrapped("bot"))
+        assert calls == ["bot"]
+        assert wrapped.__name__ == "job"
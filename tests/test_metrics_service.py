@@ -0,0 +1,157 @@
+"""Tests for the in-memory metrics engine — per-day stats, archive folding, bulk rows, subscription months."""
+
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app.services.metrics_service import (
+    _subscription_months,
+    build_metrics_row,
+    compute_log_metrics,
+    fold_archive,
+    user_today,
+)
+
+TODAY = date(2026, 3, 18)  # Wednesday
+EMPTY_ARCHIVE = (None, 0, 0, None, 0)
+
+
+def _perfect(habits: int = 2) -> tuple[int, int, int, bool]:
+    return (habits, habits, habits, False)
+
+
+def _history(n_days: int, habits: int = 2) -> dict:
+    return {TODAY - timedelta(days=i): _perfect(habits) for i in range(n_days)}
+
+
+class TestComputeLogMetrics:
+    def test_empty_history(self):
+        m = compute_log_metrics({}, 2, TODAY, EMPTY_ARCHIVE)
+        assert m["total_completions"] == 0
+        assert m["perfect_days_streak"] == 0
+        assert m["all_habits_completed_7_days"] is False
+        assert m["habits_completed_daily"] == 0
+
+    def test_completion_windows(self):
+        days = {TODAY: (2, 2, 2, False), TODAY - timedelta(days=7): (3, 2, 2, False),
+                TODAY - timedelta(days=8): (1, 1, 1, False), TODAY - timedelta(days=31): (5, 2, 2, False)}
+        m = compute_log_metrics(days, 2, TODAY, EMPTY_ARCHIVE)
+        assert m["completions_today"] == 2
+        assert m["completions_last_7_days"] == 5
+        assert m["completions_last_30_days"] == 6
+        assert m["total_completions"] == 11
+
+    def test_perfect_requires_every_active_habit(self):
+        days = {TODAY: (3, 3, 1, False)}
+        assert compute_log_metrics(days, 2, TODAY, EMPTY_ARCHIVE)["all_habits_completed_today"] is False
+        assert compute_log_metrics(days, 1, TODAY, EMPTY_ARCHIVE)["all_habits_completed_today"] is True
+
+    def test_no_habits_never_perfect(self):
+        m = compute_log_metrics({TODAY: (1, 1, 0, False)}, 0, TODAY, EMPTY_ARCHIVE)
+        assert m["all_habits_completed_today"] is False
+        assert m["perfect_days_total"] == 0
+
+    def test_perfect_streak_ends_at_latest_perfect_day(self):
+        days = _history(3)
+        days[TODAY - timedelta(days=3)] = (1, 1, 1, False)
+        days.update({TODAY - timedelta(days=i): _perfect() for i in (4, 5, 6, 7, 8)})
+        m = compute_log_metrics(days, 2, TODAY, EMPTY_ARCHIVE)
+        assert m["perfect_days_streak"] == 3
+        assert m["perfect_days_total"] == 8
+
+    def test_no_misses_stops_at_skip(self):
+        days = _history(10)
+        days[TODAY - timedelta(days=4)] = (1, 1, 1, True)
+        assert compute_log_metrics(days, 2, TODAY, EMPTY_ARCHIVE)["streak_no_misses"] == 4
+
+    def test_multi_focus_needs_five_every_day(self):
+        days = _history(14, habits=5)
+        assert compute_log_metrics(days, 5, TODAY, EMPTY_ARCHIVE)["habits_completed_daily"] == 5
+        days[TODAY - timedelta(days=13)] = (4, 4, 4, False)
+        assert compute_log_metrics(days, 5, TODAY, EMPTY_ARCHIVE)["habits_completed_daily"] == 0
+
+    def test_perfect_weeks_in_month(self):
+        # March 2026: week blocks from the 1st; 29-31 do not form a full week
+        today = date(2026, 3, 31)
+        days = {date(2026, 3, d): _perfect() for d in range(1, 32)}
+        assert compute_log_metrics(days, 2, today, EMPTY_ARCHIVE)["perfect_weeks_in_month"] == 4
+        days[date(2026, 3, 9)] = (1, 1, 1, False)
+        assert compute_log_metrics(days, 2, today, EMPTY_ARCHIVE)["perfect_weeks_in_month"] == 3
+
+
+class TestFoldArchive:
+    def test_fold_preserves_results(self):
+        days = _history(60)
+        days[TODAY - timedelta(days=30)] = (1, 1, 1, True)
+        full = compute_log_metrics(dict(days), 2, TODAY, EMPTY_ARCHIVE)
+        window = dict(days)
+        archive = fold_archive(EMPTY_ARCHIVE, window, TODAY - timedelta(days=40), 2)
+        assert min(window) == TODAY - timedelta(days=39)
+        assert compute_log_metrics(window, 2, TODAY, archive) == full
+
+    def test_perfect_run_chains_across_cutoff(self):
+        window = _history(20)
+        archive = fold_archive(EMPTY_ARCHIVE, window, TODAY - timedelta(days=10), 2)
+        assert archive == (TODAY - timedelta(days=10), 20, 10, TODAY - timedelta(days=10), 10)
+        assert compute_log_metrics(window, 2, TODAY, archive)["perfect_days_streak"] == 20
+
+    def test_archived_streak_survives_empty_window(self):
+        archive = fold_archive(EMPTY_ARCHIVE, _history(5), TODAY, 2)
+        assert compute_log_metrics({}, 2, TODAY + timedelta(days=500), archive)["perfect_days_streak"] == 5
+
+    def test_cutoff_not_moving_back(self):
+        archive = (TODAY, 7, 1, None, 0)
+        days = _history(3)
+        assert fold_archive(archive, days, TODAY - timedelta(days=5), 2) == archive
+        assert len(days) == 3
+
+
+class TestBuildMetricsRow:
+    def test_uses_materialized_streak(self):
+        row = build_metrics_row(7, TODAY, 2, 3, 1, _history(4), EMPTY_ARCHIVE, (9, TODAY, None), 0)
+        assert row["user_id"] == 7
+        assert row["streak_days"] == 9
+        assert row["invited_friends"] == 3
+        assert row["metrics_date"] == TODAY
+        assert row["perfect_days_total"] == 4
+
+    def test_streak_from_window_when_not_materialized(self):
+        days = _history(4)
+        days[TODAY - timedelta(days=10)] = (1, 1, 1, True)
+        row = build_metrics_row(7, TODAY, 2, 0, 0, days, EMPTY_ARCHIVE, None, 0)
+        assert row["streak_days"] == 4
+        assert row["returned_after_miss_days"] == 10
+
+    def test_folds_old_days_into_archive(self):
+        days = {TODAY - timedelta(days=500): (2, 2, 2, False), TODAY: (1, 1, 1, False)}
+        row = build_metrics_row(7, TODAY, 2, 0, 0, days, EMPTY_ARCHIVE, (1, TODAY, None), 0)
+        assert row["archived_completions"] == 2
+        assert row["archived_perfect_days"] == 1
+        assert row["total_completions"] == 3
+
+
+class TestSubscriptionMonths:
+    def test_no_premium(self, sample_user):
+        sample_user.premium_until = None
+        assert _subscription_months(sample_user) == 0
+        assert _subscription_months(None) == 0
+
+    def test_active_premium_at_least_one_month(self, sample_user):
+        sample_user.premium_until = datetime.now(timezone.utc) + timedelta(days=5)
+        assert _subscription_months(sample_user) == 1
+        sample_user.premium_until = datetime.now(timezone.utc) + timedelta(days=95)
+        assert _subscription_months(sample_user) == 3
+
+    def test_expired_premium(self, sample_user):
+        sample_user.premium_until = (datetime.now(timezone.utc) - timedelta(days=1)).replace(tzinfo=None)
+        assert _subscription_months(sample_user) == 0
+
+
+class TestUserToday:
+    def test_follows_the_users_timezone(self, sample_user):
+        for tz_name in ("Pacific/Kiritimati", "Pacific/Pago_Pago"):
+            sample_user.timezone = tz_name
+            assert user_today(sample_user) == datetime.now(ZoneInfo(tz_name)).date()
+
+    def test_unknown_timezone_falls_back_to_utc(self, sample_user):
+        sample_user.timezone = "Not/AZone"
+        assert user_today(sample_user) == datetime.now(timezone.utc).date()
@@ -0,0 +1,47 @@
+"""Tests for premium expiry warning windows and the candidate query."""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.premium_expiry_service import candidates_query, windows
+
+NOW = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+DAY = timedelta(days=1)
+
+
+class TestWindows:
+    def test_regular_tick_covers_interval_per_kind(self):
+        result = windows(NOW - timedelta(minutes=15), NOW)
+        assert result == [
+            ("3d", NOW - timedelta(minutes=15) + 3 * DAY, NOW + 3 * DAY),
+            ("1d", NOW - timedelta(minutes=15) + DAY, NOW + DAY),
+        ]
+
+    def test_consecutive_windows_are_contiguous(self):
+        first = windows(NOW - timedelta(minutes=15), NOW)
+        second = windows(NOW, NOW + timedelta(minutes=15))
+        assert [w[2] for w in first] == [w[1] for w in second]
+
+    def test_downtime_skips_stale_longer_warning(self):
+        # Down for two days: 3d warnings are only sent for users still more than 1 day out
+        result = dict((kind, (lo, hi)) for kind, lo, hi in windows(NOW - 2 * DAY, NOW))
+        assert result["3d"] == (NOW + DAY, NOW + 3 * DAY)
+        assert result["1d"] == (NOW, NOW + DAY)
+
+    def test_no_window_when_watermark_is_current(self):
+        assert windows(NOW, NOW) == []
+
+
+class TestCandidatesQuery:
+    def test_keyset_page_excludes_notified(self):
+        stmt = candidates_query("1d", NOW, NOW + DAY, (NOW, 7), 200)
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "(users.premium_until, users.id) >" in sql
+        assert "NOT (EXISTS" in sql
+        assert "ORDER BY users.premium_until, users.id" in sql
+        assert "LIMIT" in sql
+
+    def test_selects_slim_columns(self):
+        stmt = candidates_query("3d", NOW, NOW + DAY, None, 200)
+        assert [c.name for c in stmt.selected_columns] == ["id", "telegram_id", "language_code", "premium_until"]
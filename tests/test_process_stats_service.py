@@ -0,0 +1,46 @@
+"""Tests for publishing per-process stats to /health."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.models import Base, ProcessStats
+from app.services import process_stats_service
+
+NOW = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+class TestCollect:
+    def test_reports_user_cache(self):
+        stats = process_stats_service.collect()
+        assert "hit_rate" in stats["user_cache"]
+
+    def test_reports_moderation_cache(self):
+        stats = process_stats_service.collect()
+        assert "rules_version" in stats["moderation_cache"]
+
+    def test_reports_gateway_queues(self):
+        stats = process_stats_service.collect()
+        assert set(stats["telegram_gateway"]["classes"]) == {"interactive", "reminder", "bulk"}
+
+
+class TestRecent:
+    def test_only_fresh_rows(self):
+        async def run():
+            engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            sm = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+            async with sm() as session:
+                session.add(ProcessStats(key="a:1", role="bot", stats={"x": 1}, updated_at=NOW))
+                session.add(ProcessStats(key="b:2", role="web", stats={}, updated_at=NOW - timedelta(hours=1)))
+                await session.commit()
+                result = await process_stats_service.recent(session, NOW)
+            await engine.dispose()
+            return result
+
+        result = asyncio.run(run())
+        assert list(result) == ["a:1"]
+        assert result["a:1"]["role"] == "bot"
+        assert result["a:1"]["x"] == 1
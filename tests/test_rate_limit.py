@@ -0,0 +1,61 @@
+"""Tests for token-bucket rate limiting."""
+
+from app.middlewares.rate_limit import MemoryBuckets, ROUTE_KEYS, ROUTE_LIMITS, _max_idle
+from app.services.rate_limit_service import take
+
+
+class TestTake:
+    def test_takes_one_token(self):
+        assert take(5.0, 0.0, 0.0, 10, 1.0) == (True, 4.0)
+
+    def test_denied_when_empty(self):
+        allowed, tokens = take(0.5, 0.0, 0.0, 10, 1.0)
+        assert allowed is False
+        assert tokens == 0.5
+
+    def test_refills_with_elapsed_time(self):
+        allowed, tokens = take(0.0, 0.0, 2.5, 10, 1.0)
+        assert allowed is True
+        assert tokens == 1.5
+
+    def test_refill_capped_at_capacity(self):
+        assert take(0.0, 0.0, 1000.0, 10, 1.0) == (True, 9.0)
+
+    def test_clock_going_back_does_not_drain(self):
+        assert take(3.0, 10.0, 5.0, 10, 1.0) == (True, 2.0)
+
+
+class TestMemoryBuckets:
+    def test_burst_then_deny(self):
+        buckets = MemoryBuckets(max_idle=10)
+        results = [buckets.take_at("1:default", 3, 1.0, 0.0) for _ in range(4)]
+        assert results == [True, True, True, False]
+
+    def test_keys_are_independent(self):
+        buckets = MemoryBuckets(max_idle=10)
+        assert buckets.take_at("1:export", 1, 0.01, 0.0) is True
+        assert buckets.take_at("1:export", 1, 0.01, 0.0) is False
+        assert buckets.take_at("1:default", 1, 0.01, 0.0) is True
+        assert buckets.take_at("2:export", 1, 0.01, 0.0) is True
+
+    def test_idle_buckets_are_evicted(self):
+        buckets = MemoryBuckets(max_idle=10)
+        for uid in range(100):
+            buckets.take_at(f"{uid}:default", 5, 1.0, 0.0)
+        assert len(buckets) == 100
+        buckets.take_at("active:default", 5, 1.0, 1000.0)
+        assert len(buckets) == 1
+
+    def test_recent_buckets_survive_eviction(self):
+        buckets = MemoryBuckets(max_idle=10)
+        buckets.take_at("1:default", 5, 1.0, 0.0)
+        assert buckets.evict(5.0) == 0
+        assert len(buckets) == 1
+
+
+class TestRoutes:
+    def test_every_route_key_has_limits(self):
+        assert set(ROUTE_KEYS.values()) <= set(ROUTE_LIMITS)
+
+    def test_max_idle_covers_slowest_refill(self):
+        assert _max_idle({"a": (10, 2.0), "b": (2, 1 / 60)}) == 120
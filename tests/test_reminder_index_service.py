@@ -0,0 +1,67 @@
+"""Tests for reminder index — next UTC fire time per weekday/time slot, DST handling."""
+
+from datetime import datetime, time, timezone
+
+import pytest
+
+from app.services.reminder_index_service import local_date_of, next_fire_at
+
+
+class TestNextFireAt:
+    def test_later_same_day(self):
+        # Monday 2026-03-02 05:00 UTC = 08:00 Moscow
+        after = datetime(2026, 3, 2, 4, 0, tzinfo=timezone.utc)
+        fire = next_fire_at(0, time(8, 0), "Europe/Moscow", after)
+        assert fire == datetime(2026, 3, 2, 5, 0, tzinfo=timezone.utc)
+
+    def test_strictly_after(self):
+        after = datetime(2026, 3, 2, 5, 0, tzinfo=timezone.utc)
+        fire = next_fire_at(0, time(8, 0), "Europe/Moscow", after)
+        assert fire == datetime(2026, 3, 9, 5, 0, tzinfo=timezone.utc)
+
+    def test_other_weekday(self):
+        after = datetime(2026, 3, 2, 12, 0, tzinfo=timezone.utc)  # Monday
+        fire = next_fire_at(4, time(21, 30), "UTC", after)
+        assert fire == datetime(2026, 3, 6, 21, 30, tzinfo=timezone.utc)
+
+    def test_local_weekday_differs_from_utc(self):
+        # Tuesday 07:00 Tokyo is Monday 22:00 UTC
+        after = datetime(2026, 3, 2, 12, 0, tzinfo=timezone.utc)
+        fire = next_fire_at(1, time(7, 0), "Asia/Tokyo", after)
+        assert fire == datetime(2026, 3, 2, 22, 0, tzinfo=timezone.utc)
+
+    def test_dst_offset_follows_transition(self):
+        # New York: EST (UTC-5) before 2026-03-08, EDT (UTC-4) after
+        before = next_fire_at(0, time(9, 0), "America/New_York", datetime(2026, 3, 1, tzinfo=timezone.utc))
+        after = next_fire_at(0, time(9, 0), "America/New_York", before)
+        assert before == datetime(2026, 3, 2, 14, 0, tzinfo=timezone.utc)
+        assert after == datetime(2026, 3, 9, 13, 0, tzinfo=timezone.utc)
+
+    def test_spring_forward_gap_still_fires(self):
+        # 02:30 does not exist in New York on 2026-03-08 (Sunday)
+        fire = next_fire_at(6, time(2, 30), "America/New_York", datetime(2026, 3, 7, tzinfo=timezone.utc))
+        assert fire.date().isoformat() == "2026-03-08"
+
+    def test_invalid_timezone_falls_back(self):
+        after = datetime(2026, 3, 2, 4, 0, tzinfo=timezone.utc)
+        assert next_fire_at(0, time(8, 0), "Invalid/Zone", after) == next_fire_at(
+            0, time(8, 0), "Europe/Moscow", after
+        )
+
+    def test_naive_after_treated_as_utc(self):
+        naive = datetime(2026, 3, 2, 4, 0)
+        aware = naive.replace(tzinfo=timezone.utc)
+        assert next_fire_at(0, time(8, 0), "UTC", naive) == next_fire_at(0, time(8, 0), "UTC", aware)
+
+    @pytest.mark.parametrize("weekday", range(7))
+    def test_always_within_a_week(self, weekday):
+        after = datetime(2026, 10, 25, 0, 30, tzinfo=timezone.utc)
+        fire = next_fire_at(weekday, time(0, 0), "Europe/London", after)
+        assert 0 < (fire - after).total_seconds() <= 7 * 86400
+
+
+class TestLocalDateOf:
+    def test_local_date_crosses_midnight(self):
+        fire = datetime(2026, 3, 2, 22, 0, tzinfo=timezone.utc)
+        assert local_date_of(fire, "Asia/Tokyo").isoformat() == "2026-03-03"
+        assert local_date_of(fire, "UTC").isoformat() == "2026-03-02"
@@ -0,0 +1,58 @@
+"""Tests for reminder preparation — phrase rotation, text building, streak helper."""
+
+from datetime import date, time, timedelta
+
+from app.services.habit_log_service import _streak_from_dates
+from app.services.reminders import MOTIVATION_EN, build_reminder_text, next_phrase
+
+
+class TestStreakFromDates:
+    def test_empty(self):
+        assert _streak_from_dates([]) == 0
+
+    def test_consecutive(self):
+        d = date(2026, 3, 10)
+        assert _streak_from_dates([d, d - timedelta(days=1), d - timedelta(days=2)]) == 3
+
+    def test_gap_stops_streak(self):
+        d = date(2026, 3, 10)
+        assert _streak_from_dates([d, d - timedelta(days=1), d - timedelta(days=3)]) == 2
+
+
+class TestBuildReminderText:
+    def test_no_streak_no_phrase(self):
+        text = build_reminder_text("en", "Run", time(8, 0), 0, "")
+        assert text == "Habit: Run\nTime: 08:00"
+
+    def test_streak_bar_and_phrase(self):
+        text = build_reminder_text("en", "Run", time(8, 5), 3, "Keep it up!")
+        assert "🔥🔥🔥⬜⬜⬜⬜⬜⬜⬜ 3 days" in text
+        assert text.endswith("💬 Keep it up!")
+
+    def test_streak_bar_capped(self):
+        text = build_reminder_text("ru", "Бег", time(8, 0), 42, "")
+        assert "🔥" * 10 + " 42 days" in text
+
+
+class TestNextPhrase:
+    def test_full_cycle_covers_every_phrase_once(self, sample_user):
+        seen = [next_phrase(sample_user, "en")[1] for _ in range(len(MOTIVATION_EN))]
+        assert sorted(seen) == list(range(len(MOTIVATION_EN)))
+
+    def test_state_on_user_row(self, sample_user):
+        phrase, idx = next_phrase(sample_user, "en")
+        assert phrase == MOTIVATION_EN[idx]
+        assert sample_user.motivation_seed is not None
+        assert sample_user.motivation_cursor == 1
+
+    def test_new_cycle_after_exhaustion(self, sample_user):
+        sample_user.motivation_seed = 42
+        sample_user.motivation_cursor = len(MOTIVATION_EN)
+        next_phrase(sample_user, "en")
+        assert sample_user.motivation_cursor == 1
+
+    def test_same_seed_same_order(self, sample_user, premium_user):
+        sample_user.motivation_seed, sample_user.motivation_cursor = 7, 3
+        a = next_phrase(sample_user, "en")[1]
+        sample_user.motivation_seed, sample_user.motivation_cursor = 7, 3
+        assert next_phrase(sample_user, "en")[1] == a
@@ -0,0 +1,55 @@
+"""Tests for materialized streak state — full computation and incremental advance."""
+
+from datetime import date, timedelta
+
+from app.services.habit_log_service import _streak_from_dates
+from app.services.streak_service import advance_streak, streak_state
+
+D = date(2026, 3, 10)
+
+
+def _days(*offsets: int) -> list[date]:
+    return [D + timedelta(days=o) for o in offsets]
+
+
+class TestStreakState:
+    def test_empty(self):
+        assert streak_state([]) == (0, 0, None)
+
+    def test_current_ends_at_last_done(self):
+        assert streak_state(_days(0, 1, 2, 5, 6)) == (2, 3, D + timedelta(days=6))
+
+    def test_duplicates_and_order_ignored(self):
+        assert streak_state(_days(2, 0, 1, 1, 2)) == (3, 3, D + timedelta(days=2))
+
+    def test_matches_history_walk(self):
+        dates = _days(0, 1, 3, 4, 5, 9, 10)
+        current, _, _ = streak_state(dates)
+        assert current == _streak_from_dates(sorted(set(dates), reverse=True))
+
+
+class TestAdvanceStreak:
+    def test_first_done(self):
+        assert advance_streak(0, 0, None, D) == (1, 1, D)
+
+    def test_next_day_extends(self):
+        assert advance_streak(4, 6, D, D + timedelta(days=1)) == (5, 6, D + timedelta(days=1))
+
+    def test_new_longest(self):
+        assert advance_streak(6, 6, D, D + timedelta(days=1)) == (7, 7, D + timedelta(days=1))
+
+    def test_gap_resets(self):
+        assert advance_streak(4, 6, D, D + timedelta(days=2)) == (1, 6, D + timedelta(days=2))
+
+    def test_same_day_no_change(self):
+        assert advance_streak(4, 6, D, D) == (4, 6, D)
+
+    def test_backdated_needs_rebuild(self):
+        assert advance_streak(4, 6, D, D - timedelta(days=1)) is None
+
+    def test_incremental_equals_full(self):
+        dates = _days(0, 1, 2, 4, 5, 6, 7, 12, 13)
+        state = (0, 0, None)
+        for d in dates:
+            state = advance_streak(*state, d)
+        assert state == streak_state(dates)
@@ -0,0 +1,115 @@
+"""Tests for the outbound Telegram gateway."""
+
+import asyncio
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetMe, SendMessage
+
+from app.telegram_gateway import BULK, INTERACTIVE, REMINDER, TelegramGateway, _Bucket, priority
+
+
+def _send(chat_id: int, text: str = "x") -> SendMessage:
+    return SendMessage(chat_id=chat_id, text=text)
+
+
+class TestBucket:
+    def test_full_bucket_is_ready(self):
+        assert _Bucket(3, 1.0, 0.0).wait(0.0) == 0.0
+
+    def test_wait_after_burst(self):
+        bucket = _Bucket(2, 1.0, 0.0)
+        bucket.take(0.0)
+        bucket.take(0.0)
+        assert bucket.wait(0.0) == 1.0
+        assert bucket.wait(0.5) == 0.5
+        assert bucket.wait(1.0) == 0.0
+
+    def test_blocked_until_wins(self):
+        bucket = _Bucket(3, 1.0, 0.0)
+        bucket.blocked_until = 7.0
+        assert bucket.wait(2.0) == 5.0
+
+    def test_idle_only_when_full_and_unblocked(self):
+        bucket = _Bucket(2, 1.0, 0.0)
+        bucket.take(0.0)
+        assert bucket.idle(0.5) is False
+        assert bucket.idle(1.0) is True
+
+
+class TestGateway:
+    def test_interactive_overtakes_queued_bulk(self):
+        order = []
+
+        async def make_request(_bot, method):
+            order.append(method.text)
+            return True
+
+        async def run():
+            gateway = TelegramGateway(rate=1000.0, chat_rate=1000.0, chat_burst=10)
+
+            async def send(cls, chat_id, text):
+                with priority(cls):
+                    await gateway(make_request, None, _send(chat_id, text))
+
+            await asyncio.gather(
+                send(BULK, 1, "bulk"),
+                send(REMINDER, 2, "reminder"),
+                send(INTERACTIVE, 3, "interactive"),
+            )
+            return gateway.stats()
+
+        stats = asyncio.run(run())
+        assert order == ["interactive", "reminder", "bulk"]
+        assert stats["classes"]["bulk"]["sent"] == 1
+        assert stats["classes"]["interactive"]["queued"] == 0
+
+    def test_busy_chat_does_not_block_others(self):
+        order = []
+
+        async def make_request(_bot, method):
+            order.append(method.chat_id)
+            return True
+
+        async def run():
+            gateway = TelegramGateway(rate=1000.0, chat_rate=0.5, chat_burst=1)
+            await gateway(make_request, None, _send(1))
+            # Chat 1 is out of tokens for ~2s; chat 2 queued behind it goes first
+            first = asyncio.ensure_future(gateway(make_request, None, _send(1)))
+            await asyncio.sleep(0)
+            await gateway(make_request, None, _send(2))
+            first.cancel()
+
+        asyncio.run(run())
+        assert order == [1, 2]
+
+    def test_retry_after_retries_and_counts(self):
+        calls = []
+
+        async def make_request(_bot, method):
+            calls.append(method)
+            if len(calls) == 1:
+                raise TelegramRetryAfter(method=method, message="flood", retry_after=0)
+            return "ok"
+
+        async def run():
+            gateway = TelegramGateway(rate=1000.0, chat_rate=1000.0, chat_burst=10)
+            result = await gateway(make_request, None, _send(1))
+            return result, gateway.stats()
+
+        result, stats = asyncio.run(run())
+        assert result == "ok"
+        assert len(calls) == 2
+        assert stats["retry_after"] == 1
+
+    def test_non_sending_methods_pass_through(self):
+        async def make_request(_bot, method):
+            return "me"
+
+        async def run():
+            gateway = TelegramGateway(rate=1.0, chat_rate=1.0, chat_burst=1)
+            results = [await gateway(make_request, None, GetMe()) for _ in range(5)]
+            return results, gateway.stats()
+
+        results, stats = asyncio.run(run())
+        assert results == ["me"] * 5
+        assert all(c["sent"] == 0 for c in stats["classes"].values())
@@ -0,0 +1,41 @@
+"""Tests for per-update user context resolution."""
+
+from aiogram.dispatcher.event.handler import HandlerObject
+
+from app.middlewares.i18n import _resolve_lang
+from app.middlewares.user_context import _wants_user
+from app.services.user_service import snapshot_of
+
+
+async def _needs_row(cb, user, lang):
+    pass
+
+
+async def _snapshot_only(cb, user_snapshot, lang):
+    pass
+
+
+async def _any(cb, **kwargs):
+    pass
+
+
+class TestWantsUser:
+    def test_handler_declaring_user_gets_row(self):
+        assert _wants_user({"handler": HandlerObject(_needs_row)}) is True
+
+    def test_snapshot_handler_skips_row(self):
+        assert _wants_user({"handler": HandlerObject(_snapshot_only)}) is False
+
+    def test_varkw_handler_gets_row(self):
+        assert _wants_user({"handler": HandlerObject(_any)}) is True
+
+    def test_unknown_handler_gets_row(self):
+        assert _wants_user({}) is True
+
+
+class TestLanguageFromSnapshot:
+    def test_snapshot_language(self, sample_user):
+        assert _resolve_lang(snapshot_of(sample_user)) == "en"
+
+    def test_unknown_user_defaults_to_ru(self):
+        assert _resolve_lang(None) == "ru"
@@ -1,9 +1,15 @@
 """Tests for user service."""
 
+import asyncio
+import time
 from datetime import datetime, timedelta, timezone
 
 import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
+from app.models import Base, User
+
+from app.services import user_service
 from app.services.user_service import (
     ALLOWED_TIMEZONES,
     _validate_iana_timezone,
@@ -62,3 +68,112 @@ class TestValidateTimezone:
 
     def test_utc_allowed(self):
         assert _validate_iana_timezone("UTC") == "UTC"
+
+
+class TestSnapshotCache:
+    @pytest.fixture(autouse=True)
+    def _clean_cache(self):
+        user_service.clear_cache()
+        yield
+        user_service.clear_cache()
+
+    def test_hit_after_load(self, sample_user):
+        user_service.cache_user(sample_user)
+        snap = user_service._cached(sample_user.telegram_id)
+        assert snap.id == 1 and snap.language_code == "en"
+        assert user_service.cache_stats()["hits"] == 1
+
+    def test_invalidate(self, sample_user):
+        user_service.cache_user(sample_user)
+        user_service.invalidate(sample_user.telegram_id)
+        assert user_service._cached(sample_user.telegram_id) is None
+        assert user_service.cache_stats()["misses"] == 1
+
+    def test_expired_entry_is_a_miss(self, sample_user, monkeypatch):
+        monkeypatch.setattr(user_service, "SNAPSHOT_TTL", -1.0)
+        user_service.cache_user(sample_user)
+        assert user_service._cached(sample_user.telegram_id) is None
+        assert user_service.cache_stats()["size"] == 0
+
+    def test_evicts_least_recently_used(self, sample_user, monkeypatch):
+        monkeypatch.setattr(user_service, "SNAPSHOT_MAX_SIZE", 2)
+        for tid in (1, 2):
+            sample_user.telegram_id = tid
+            user_service.cache_user(sample_user)
+        user_service._cached(1)
+        sample_user.telegram_id = 3
+        user_service.cache_user(sample_user)
+        assert user_service._cached(2) is None
+        assert user_service._cached(1) is not None
+
+    def test_read_older_than_invalidation_not_cached(self, sample_user):
+        read_at = time.monotonic()
+        user_service.invalidate(sample_user.telegram_id)
+        user_service.cache_user(sample_user, read_at)
+        assert user_service._cached(sample_user.telegram_id) is None
+        user_service.cache_user(sample_user, time.monotonic())
+        assert user_service._cached(sample_user.telegram_id) is not None
+
+    def test_snapshot_premium(self, premium_user):
+        assert is_premium(user_service.snapshot_of(premium_user)) is True
+
+
+def _with_db(tmp_path, scenario):
+    async def run():
+        # A file, not :memory:, so two sessions use separate connections
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sm = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with sm() as session:
+            session.add(User(id=1, telegram_id=42, language_code="en", timezone="UTC"))
+            await session.commit()
+        try:
+            return await scenario(sm)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+class TestCacheInvalidationOnCommit:
+    @pytest.fixture(autouse=True)
+    def _clean_cache(self):
+        user_service.clear_cache()
+        yield
+        user_service.clear_cache()
+
+    def test_write_invalidates_again_after_commit(self, tmp_path):
+        async def scenario(sm):
+            async with sm() as writer, sm() as reader:
+                user = await user_service.get_by_telegram_id(writer, 42)
+                await user_service.update_language(writer, user, "ar")
+                # A concurrent reader in the gap re-caches the committed (old) row
+                await user_service.get_by_telegram_id(reader, 42)
+                assert user_service._cached(42).language_code == "en"
+                await writer.commit()
+            return user_service._cached(42)
+
+        assert _with_db(tmp_path, scenario) is None
+
+    def test_session_with_writes_does_not_cache(self, tmp_path):
+        async def scenario(sm):
+            async with sm() as session:
+                user = await user_service.get_by_telegram_id(session, 42)
+                user.language_code = "ar"
+                await session.flush()
+                user_service.clear_cache()
+                await user_service.get_by_telegram_id(session, 42)
+                cached = user_service._cached(42)
+                await session.rollback()
+            return cached
+
+        assert _with_db(tmp_path, scenario) is None
+
+    def test_clean_read_is_cached(self, tmp_path):
+        async def scenario(sm):
+            async with sm() as session:
+                await user_service.get_by_telegram_id(session, 42)
+            return user_service._cached(42)
+
+        assert _with_db(tmp_path, scenario).language_code == "en"
@@ -0,0 +1,50 @@
+"""Tests for the weekly report aggregate and scheduling helpers."""
+
+from datetime import date, datetime, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.weekly_report_service import activity_query, due_at, render, week_of
+
+
+def _utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class TestWeekOf:
+    def test_due_monday_at_report_hour(self):
+        # 2026-10-19 is a Monday: the report covers 12..18 October
+        assert week_of(_utc(2026, 10, 19, 9, 0)) == date(2026, 10, 12)
+
+    def test_before_report_hour_is_previous_week(self):
+        assert week_of(_utc(2026, 10, 19, 8, 59)) == date(2026, 10, 5)
+
+    def test_stable_through_the_week(self):
+        assert week_of(_utc(2026, 10, 25, 23, 0)) == date(2026, 10, 12)
+
+    def test_due_at_round_trip(self):
+        week = date(2026, 10, 12)
+        assert due_at(week) == _utc(2026, 10, 19, 9, 0)
+        assert week_of(due_at(week)) == week
+
+
+class TestActivityQuery:
+    def test_single_grouped_aggregate_with_filters(self):
+        sql = str(activity_query(date(2026, 10, 12), 42).compile(dialect=postgresql.dialect()))
+        assert sql.count("GROUP BY") == 1
+        assert sql.count("FILTER (WHERE") == 2
+        assert "habit_logs.user_id >" in sql
+        assert "ORDER BY" in sql
+
+    def test_counts_skipped_status(self):
+        compiled = activity_query(date(2026, 10, 12)).compile(dialect=postgresql.dialect())
+        assert "skipped" in compiled.params.values()
+        assert "skip" not in compiled.params.values()
+
+
+class TestRender:
+    def test_percentage_and_bar(self):
+        text = render("en", 3, 1)
+        assert "Completed: 3" in text
+        assert "Skipped: 1" in text
+        assert "🟩" * 7 + "⬜" * 3 + " 75%" in text